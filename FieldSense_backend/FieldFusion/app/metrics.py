@@ -0,0 +1,74 @@
+import time
+from fastapi.routing import APIRoute
+from ..core.config import settings
+from ..core.guards import CLOSED, HALF_OPEN, OPEN
+from ..core.http import providers
+from ..core.metrics import Collected, http_seconds, register, server_timing, start_timings
+from ..core.singleflight import flight_stats
+from ..providers.weather_cache import power_cache
+from ..providers.raster_cache import tile_cache
+from ..providers.images import image_cache
+from ..pipeline.tiles import risk_tiles
+
+# FieldFusion routes time themselves: endpoint latency goes to the histogram
+# and, with settings.server_timing on, the per-stage timings recorded during
+# the request are returned as a Server-Timing header (streaming responses
+# only cover the time until headers).
+
+class TimedRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def timed_handler(request):
+            timings = start_timings()
+            t0 = time.perf_counter()
+            status = "500"
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+            finally:
+                total = time.perf_counter() - t0
+                http_seconds.observe(total, request.method, route, status)
+            if settings.server_timing:
+                response.headers["Server-Timing"] = server_timing(timings, total)
+            return response
+
+        return timed_handler
+
+def _cache_stats():
+    return {
+        "weather": power_cache.stats(),
+        "raster": tile_cache().stats(),
+        "map_tiles": risk_tiles().stats(),
+        "image": image_cache.stats(),
+    }
+
+def _cache_lookups():
+    for cache, s in _cache_stats().items():
+        yield {"cache": cache, "result": "hit"}, s["hits"]
+        if "partial_hits" in s:
+            yield {"cache": cache, "result": "partial"}, s["partial_hits"]
+        yield {"cache": cache, "result": "miss"}, s["misses"]
+
+def _cache_hit_ratio():
+    for cache, s in _cache_stats().items():
+        yield {"cache": cache}, s["hit_ratio"]
+
+def _flight(key):
+    def samples():
+        for name, s in flight_stats().items():
+            yield {"flight": name}, s[key]
+    return samples
+
+_CIRCUIT_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+def _circuit_state():
+    for name in providers.specs:
+        yield {"provider": name}, _CIRCUIT_STATES[providers.breaker(name).state]
+
+register(Collected("fieldfusion_cache_lookups", "counter", "Cache lookups by result.", _cache_lookups))
+register(Collected("fieldfusion_cache_hit_ratio", "gauge", "Cache hit ratio since start.", _cache_hit_ratio))
+register(Collected("fieldfusion_singleflight_calls", "counter", "Single-flight calls.", _flight("calls")))
+register(Collected("fieldfusion_singleflight_coalesced", "counter", "Single-flight calls that joined an in-flight fetch.", _flight("coalesced")))
+register(Collected("fieldfusion_circuit_state", "gauge", "Upstream circuit breaker state (0 closed, 1 half-open, 2 open).", _circuit_state))
@@ -1,8 +1,26 @@
-from fastapi import APIRouter, UploadFile, File, Depends
+import asyncio
+import json
+import httpx
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from ..pipeline.run_analysis import analyze_aoi
-from .schemas import AnalyzeRequest, AnalyzeResponse
+from ..pipeline.batch import analyze_many
+from ..pipeline.timeseries import stream_timeseries
+from ..pipeline.tiles import TILE_LAYERS, risk_tiles
+from ..pipeline.jobs import job_queue
+from ..core.config import settings
+from ..core.executor import run_cpu
+from ..core.singleflight import flight_stats
+from ..core.http import providers
+from ..providers.weather_cache import power_cache
+from ..providers.raster_cache import tile_cache
+from ..providers.images import ImageRejected, image_cache
+from ..models.pest_classifier import pest_classifier
+from .schemas import AnalyzeRequest, AnalyzeResponse, JobStatus, TimeseriesRequest
+from .metrics import TimedRoute
 
-router = APIRouter(prefix="/fusion", tags=["FieldFusion"])
+router = APIRouter(prefix="/fusion", tags=["FieldFusion"], route_class=TimedRoute)
 
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def analyze(body: AnalyzeRequest) -> AnalyzeResponse:
@@ -10,4 +28,100 @@ async def analyze(body: AnalyzeRequest) -> AnalyzeResponse:
 
 @router.post("/analyze-with-image", response_model=AnalyzeResponse)
 async def analyze_with_image(body: AnalyzeRequest = Depends(), image: UploadFile = File(...)) -> AnalyzeResponse:
-    return await analyze_aoi(body, user_image=image)
+    try:
+        return await analyze_aoi(body, user_image=image)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(body: AnalyzeRequest, response: Response) -> JobStatus:
+    # Returns at once; poll GET /fusion/jobs/{id} or follow /fusion/jobs/{id}/events
+    try:
+        status = await job_queue().submit(body)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full", headers={"Retry-After": "5"})
+    response.headers["Location"] = f"/fusion/jobs/{status.job_id}"
+    return status
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str) -> JobStatus:
+    status = await job_queue().get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return status
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    # Server-sent events: one event per status change, ending with done/failed
+    queue = job_queue()
+    if await queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+
+    async def events():
+        async for status in queue.watch(job_id):
+            if status is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {status.status}\ndata: {status.model_dump_json()}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/analyze-batch")
+async def analyze_batch(bodies: List[AnalyzeRequest]):
+    # NDJSON stream, one line per field in completion order: {"index", "result"} or {"index", "error"}
+    if len(bodies) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.batch_max_items} fields per batch")
+
+    async def lines():
+        async for i, resp, err in analyze_many(bodies):
+            if err is None:
+                yield f'{{"index":{i},"result":{resp.model_dump_json()}}}\n'
+            else:
+                yield json.dumps({"index": i, "error": err}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/timeseries")
+async def timeseries(body: TimeseriesRequest):
+    # NDJSON stream of per-acquisition index stats: stored points first, then newly fetched ones;
+    # a catalog failure ends it with an {"error"} line
+    if body.end < body.start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    async def lines():
+        try:
+            async for point in stream_timeseries(
+                body.lat, body.lon, body.aoi_radius_m, body.start, body.end, settings.s2_max_cloud_pct
+            ):
+                yield json.dumps(point) + "\n"
+        except httpx.HTTPError as e:
+            # Headers are already sent: end the stream with an error line, as /analyze-batch does
+            yield json.dumps({"error": f"{type(e).__name__}: {e}"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}")
+async def tile(layer: str, z: int, x: int, y: int, if_none_match: Optional[str] = Header(None)):
+    # PNG map tile from precomputed grid scans; never calls a provider
+    if layer not in TILE_LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer; one of {sorted(TILE_LAYERS)}")
+    if not (0 <= z <= settings.tiles_max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    etag, png = await run_cpu(risk_tiles().render, layer, z, x, y)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={int(settings.tiles_refresh_s)}"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+@router.get("/stats")
+async def stats():
+    return {
+        "http": providers.stats(),
+        "singleflight": flight_stats(),
+        "weather_cache": power_cache.stats(),
+        "raster_cache": tile_cache().stats(),
+        "map_tiles": risk_tiles().stats(),
+        "image_cache": image_cache.stats(),
+        "pest_classifier": pest_classifier().stats(),
+        "jobs": job_queue().stats(),
+    }
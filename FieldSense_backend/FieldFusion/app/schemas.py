@@ -1,4 +1,5 @@
-from typing import Optional, List
+from datetime import date
+from typing import Optional, List, Dict
 from pydantic import BaseModel, Field, confloat
 
 class AnalyzeRequest(BaseModel):
@@ -8,11 +9,27 @@ class AnalyzeRequest(BaseModel):
     include_forecast_days: int = Field(7, description="Days of forecast aggregates")
     notes: Optional[str] = None
 
+class TimeseriesRequest(BaseModel):
+    lat: confloat(ge=-90, le=90) = Field(..., description="Latitude in decimal degrees")
+    lon: confloat(ge=-180, le=180) = Field(..., description="Longitude in decimal degrees")
+    aoi_radius_m: int = Field(200, description="AOI buffer radius in meters")
+    start: date = Field(..., description="First acquisition date (inclusive)")
+    end: date = Field(..., description="Last acquisition date (inclusive)")
+
 class RiskSection(BaseModel):
     level: str
     drivers: List[str]
     confidence: float
 
+class IndexStats(BaseModel):
+    mean: float
+    median: float
+    p10: float
+    p25: float
+    p75: float
+    p90: float
+    valid_fraction: float
+
 class IndicesSnapshot(BaseModel):
     ndvi: Optional[float] = None
     gndvi: Optional[float] = None
@@ -21,6 +38,8 @@ class IndicesSnapshot(BaseModel):
     savi: Optional[float] = None
     data_date: Optional[str] = None
     cloud_percent: Optional[float] = None
+    # Per-index AOI distribution; None for an index without valid pixels
+    index_stats: Optional[Dict[str, Optional[IndexStats]]] = None
 
 class WeatherSummary(BaseModel):
     t2m_c: Optional[float] = None
@@ -28,6 +47,9 @@ class WeatherSummary(BaseModel):
     rain_mm: Optional[float] = None
     soil_moisture_proxy: Optional[float] = None
     vpd_proxy: Optional[float] = None
+    gdd_c_days: Optional[float] = None
+    max_rain_3d_mm: Optional[float] = None
+    hot_streak_days: Optional[int] = None
     window_days: int
 
 class AnalyzeResponse(BaseModel):
@@ -36,3 +58,17 @@ class AnalyzeResponse(BaseModel):
     soil: RiskSection
     crop: RiskSection
     pest: RiskSection
+    # Stages that missed their deadline and were served from fallback values
+    degraded: List[str] = []
+    # Sources served from expired cache entries because the provider was unavailable
+    stale: List[str] = []
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    created_at: float
+    updated_at: float
+    # True when the submit joined an identical job already queued or running
+    coalesced: bool = False
+    result: Optional[AnalyzeResponse] = None
+    error: Optional[str] = None
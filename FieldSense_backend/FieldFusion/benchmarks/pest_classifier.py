@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+from ..core.config import settings
+from ..features.image import IMAGE_FEATURES
+from ..models.pest_classifier import PestClassifier, load_model
+
+# Pest classifier throughput in images per second:
+#   direct  - model.predict on ready-made batches, per batch size
+#   batched - concurrent single-image requests through the micro-batcher
+#
+#   python -m FieldFusion.benchmarks.pest_classifier [--model PATH] [--images 20000]
+
+# Hand-set 4-3-1 MLP over the leaf features: exercises the backends and the
+# batcher in tests and benchmarks; it is not a trained model
+FIXTURE_MODEL = os.path.join(os.path.dirname(__file__), "fixtures", "pest_mlp.npz")
+
+def _features(n: int, rng) -> np.ndarray:
+    return rng.random((n, len(IMAGE_FEATURES)), dtype=np.float32)
+
+def bench_direct(model, batch_sizes, images: int, rng):
+    cols = [IMAGE_FEATURES.index(f) for f in model.features]
+    rows = []
+    for bs in batch_sizes:
+        x = _features(bs, rng)[:, cols]
+        model.predict(x)  # warm up
+        n_batches = max(1, images // bs)
+        t0 = time.perf_counter()
+        for _ in range(n_batches):
+            model.predict(x)
+        dt = time.perf_counter() - t0
+        rows.append({"mode": "direct", "batch_size": bs, "images_per_s": round(n_batches * bs / dt, 1)})
+    return rows
+
+def bench_batched(model, concurrency: int, images: int, max_batch: int, max_wait_ms: float, rng):
+    feats = [dict(zip(IMAGE_FEATURES, map(float, row))) for row in _features(concurrency, rng)]
+    clf = PestClassifier(model, max_batch=max_batch, max_wait_s=max_wait_ms / 1000.0)
+
+    async def main():
+        rounds = max(1, images // concurrency)
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*[clf.predict(f) for f in feats])
+        return rounds * concurrency / (time.perf_counter() - t0)
+
+    rate = asyncio.run(main())
+    return {
+        "mode": "batched", "concurrency": concurrency, "max_batch": max_batch, "max_wait_ms": max_wait_ms,
+        "mean_batch": round(clf.items / clf.batches, 1), "images_per_s": round(rate, 1),
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Pest classifier throughput (images/s).")
+    ap.add_argument("--model", default=None, help="model path (.onnx or .npz); default: configured, else the fixture model")
+    ap.add_argument("--images", type=int, default=20000)
+    ap.add_argument("--batch-sizes", default="1,4,16,64,256")
+    ap.add_argument("--concurrency", default="1,16,64")
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    model = load_model(args.model or settings.pest_model_path or FIXTURE_MODEL)
+    rows = bench_direct(model, [int(b) for b in args.batch_sizes.split(",")], args.images, rng)
+    for c in args.concurrency.split(","):
+        rows.append(bench_batched(model, int(c), args.images // 4, settings.pest_batch_max, settings.pest_batch_wait_ms, rng))
+    print(json.dumps({"backend": model.backend, "features": list(model.features), "results": rows}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from ..core.config import settings
+from ..core.constants import GDD_BASE_C, GDD_CAP_C, HOT_DAY_C, POWER_PARS, RAIN_WINDOW_DAYS
+from ..core.http import providers
+from ..features.image import IMAGE_FEATURES
+from ..features.indices import index_stack, index_stats
+from ..features.masks import apply_mask, scl_mask
+from ..features.vector import FEATURE_NAMES
+from ..features.weather_agg import day_rows_arrays, growing_degree_days, longest_run, nan_mean, rolling_sum
+from ..models.batch import score_batch
+from ..models.crop_health import infer_crop_health
+from ..models.pest_classifier import load_model
+from ..models.pest_cnn import infer_pest_risk
+from ..models.soil_health import infer_soil_health
+from ..providers import weather
+from ..providers.raster_cache import RasterTileCache, mosaic, set_tile_cache, tiles_for_bbox
+from ..providers.satellite import TILE_BANDS, _aoi_stats, _bbox_around_point, _decode_tiff
+from ..providers.weather_cache import PowerDayCache
+from .pest_classifier import FIXTURE_MODEL
+from .standin import StandInServer
+
+# Offline pipeline benchmark against the recorded-fixture stand-in (standin.py):
+#   analyze - end-to-end POST /fusion/analyze over ASGI, per concurrency level,
+#             cold (fresh caches, every field in its own tile and POWER cell)
+#             and warm (the same fields again); latency percentiles, req/s and
+#             upstream calls
+#   micro   - per-call time of the hot CPU steps: TIFF decode, mask + indices,
+#             index stats, weather aggregation and model scoring
+#
+# Results are JSON (with commit and environment) so runs can be compared:
+#   python -m FieldFusion.benchmarks.pipeline --out new.json --compare base.json
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+def _environment() -> Dict:
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def _ms(samples: List[float], q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000.0, 2)
+
+def _fields(n: int, offset: int = 0) -> List[Dict]:
+    # One field per POWER cell (0.5 x 0.625 deg), so cold runs share no cached work
+    out = []
+    for i in range(offset, offset + n):
+        lat = 8.0 + (i // 40) * 0.5 + 0.1
+        lon = 68.0 + (i % 40) * 0.625 + 0.1
+        out.append({"lat": round(lat, 5), "lon": round(lon, 5), "aoi_radius_m": 200, "include_forecast_days": 30})
+    return out
+
+def _app():
+    from fastapi import FastAPI
+    from ..app.router import router
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+async def _run_level(client, fields: List[Dict], concurrency: int) -> Dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(body):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            r = await client.post("/fusion/analyze", json=body)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200 or r.json().get("degraded"):
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(b) for b in fields])
+    wall = time.perf_counter() - t0
+    return {
+        "requests": len(fields),
+        "errors": errors,
+        "req_per_s": round(len(fields) / wall, 1),
+        "p50_ms": _ms(latencies, 50),
+        "p95_ms": _ms(latencies, 95),
+        "p99_ms": _ms(latencies, 99),
+    }
+
+def bench_analyze(server: StandInServer, levels: List[int], requests: int) -> List[Dict]:
+    import httpx
+    app = _app()
+    rows = []
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for i, c in enumerate(levels):
+                fields = _fields(requests, offset=i * requests)
+                with tempfile.TemporaryDirectory() as tiles:
+                    set_tile_cache(RasterTileCache(tiles, settings.s2_tile_cache_max_bytes))
+                    weather.power_cache = PowerDayCache(max_entries=settings.power_cache_max_entries)
+                    for phase in ("cold", "warm"):
+                        before = dict(server.counts)
+                        row = await _run_level(client, fields, c)
+                        row.update({
+                            "phase": phase, "concurrency": c,
+                            "upstream": {k: server.counts[k] - before[k] for k in before},
+                        })
+                        rows.append(row)
+                    set_tile_cache(None)
+        await providers.aclose()
+
+    asyncio.run(main())
+    return rows
+
+def _time_call(fn: Callable, min_time_s: float) -> Dict:
+    fn()  # warm up
+    n, elapsed = 0, 0.0
+    samples = []
+    while elapsed < min_time_s or n < 5:
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        samples.append(dt)
+        elapsed += dt
+        n += 1
+    return {"calls": n, "median_us": round(float(np.median(samples)) * 1e6, 1), "min_us": round(min(samples) * 1e6, 1)}
+
+def bench_micro(server: StandInServer, min_time_s: float) -> Dict[str, Dict]:
+    fx = server.fixtures
+    px = settings.s2_tile_px
+    tiff = fx.s2_tiff(px, px)
+    tile = _decode_tiff(tiff)
+    reflectance = apply_mask(tile[:len(TILE_BANDS) - 1], scl_mask(tile[-1])[0])
+    stack = index_stack(reflectance)
+    bbox = _bbox_around_point(18.5204, 73.8567, 500)
+    tiles = [(t, tile) for t in tiles_for_bbox(bbox)]
+
+    days = [f"2024{mmdd}" for mmdd in sorted(fx.power["T2M"])]
+    rows = {d: {par: fx.power[par][d[4:]] for par in POWER_PARS} for d in days}
+    arr = day_rows_arrays(rows, days, POWER_PARS)
+
+    rng = np.random.default_rng(0)
+    n_fields = 10_000
+    matrix = rng.random((n_fields, len(FEATURE_NAMES)))
+    matrix[:, FEATURE_NAMES.index("t2m_c")] *= 40.0
+    matrix[:, FEATURE_NAMES.index("rh2m_pct")] *= 100.0
+    matrix[:, FEATURE_NAMES.index("rain_mm")] *= 80.0
+    fv = dict(zip(FEATURE_NAMES, map(float, matrix[0])))
+    pest = load_model(FIXTURE_MODEL)
+    cols = [IMAGE_FEATURES.index(f) for f in pest.features]
+    images = rng.random((32, len(IMAGE_FEATURES)), dtype=np.float32)[:, cols]
+
+    cases = {
+        f"s2.decode_tiff_{px}px": lambda: _decode_tiff(tiff),
+        f"s2.scl_mask_{px}px": lambda: apply_mask(tile[:len(TILE_BANDS) - 1], scl_mask(tile[-1])[0]),
+        f"s2.index_stack_{px}px": lambda: index_stack(reflectance),
+        f"s2.index_stats_{px}px": lambda: index_stats(stack),
+        f"s2.mosaic_{len(tiles)}tiles": lambda: mosaic(tiles, bbox, len(TILE_BANDS)),
+        "s2.aoi_stats_500m": lambda: _aoi_stats(tiles, bbox, settings.s2_max_cloud_pct),
+        f"weather.day_rows_{len(days)}d": lambda: day_rows_arrays(rows, days, POWER_PARS),
+        f"weather.reductions_{len(days)}d": lambda: (
+            nan_mean(arr["T2M"]), rolling_sum(arr["PRECTOTCORR"], RAIN_WINDOW_DAYS),
+            growing_degree_days(arr["T2M_MAX"], arr["T2M_MIN"], GDD_BASE_C, GDD_CAP_C),
+            longest_run(arr["T2M_MAX"] > HOT_DAY_C),
+        ),
+        "models.infer_single": lambda: (infer_soil_health(fv), infer_crop_health(fv), infer_pest_risk(fv)),
+        f"models.score_batch_{n_fields}": lambda: score_batch(matrix),
+        f"models.pest_{pest.backend}_batch32": lambda: pest.predict(images),
+    }
+    return {name: _time_call(fn, min_time_s) for name, fn in cases.items()}
+
+def compare(base: Dict, new: Dict) -> List[str]:
+    # Relative change per metric; for latencies and times negative is better, for req/s positive
+    lines = [f"base {base['env'].get('commit')} -> new {new['env'].get('commit')}"]
+    old_rows = {(r["phase"], r["concurrency"]): r for r in base.get("analyze", [])}
+    for r in new.get("analyze", []):
+        o = old_rows.get((r["phase"], r["concurrency"]))
+        if o:
+            d = {k: (r[k] - o[k]) / o[k] * 100.0 for k in ("p50_ms", "p95_ms", "req_per_s") if o[k]}
+            lines.append(f"analyze {r['phase']:4} c={r['concurrency']:<3} " + "  ".join(f"{k} {v:+.1f}%" for k, v in d.items()))
+    for name, r in new.get("micro", {}).items():
+        o = base.get("micro", {}).get(name)
+        if o and o["median_us"]:
+            lines.append(f"micro {name:32} median {(r['median_us'] - o['median_us']) / o['median_us'] * 100.0:+.1f}%")
+    return lines
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline /fusion/analyze and hot-path benchmarks.")
+    ap.add_argument("--concurrency", default="1,8,32")
+    ap.add_argument("--requests", type=int, default=64, help="fields per concurrency level")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="stand-in upstream delay per request")
+    ap.add_argument("--rate-limit", action="store_true", help="keep the providers' fair-use rate limits")
+    ap.add_argument("--min-time", type=float, default=0.5, help="seconds per micro-benchmark")
+    ap.add_argument("--skip", choices=("analyze", "micro"), action="append", default=[])
+    ap.add_argument("--out", default=None, help="write results JSON here (default: stdout)")
+    ap.add_argument("--compare", default=None, help="baseline results JSON to diff against")
+    args = ap.parse_args(argv)
+
+    server = StandInServer(delay_ms=args.latency_ms).start()
+    saved = {k: getattr(settings, k) for k in server.urls()}
+    power_cache = weather.power_cache
+    for k, v in server.urls().items():
+        setattr(settings, k, v)
+    # The stand-in has no quota; by default measure the pipeline, not the token buckets
+    rates = {name: spec.rate_per_s for name, spec in providers.specs.items()}
+    if not args.rate_limit:
+        for spec in providers.specs.values():
+            spec.rate_per_s = 0.0
+    providers.reset_guards()
+    try:
+        result = {"env": _environment(), "params": vars(args)}
+        if "analyze" not in args.skip:
+            levels = [int(c) for c in args.concurrency.split(",")]
+            result["analyze"] = bench_analyze(server, levels, args.requests)
+        if "micro" not in args.skip:
+            result["micro"] = bench_micro(server, args.min_time)
+    finally:
+        for k, v in saved.items():
+            setattr(settings, k, v)
+        weather.power_cache = power_cache
+        for name, rate in rates.items():
+            providers.specs[name].rate_per_s = rate
+        providers.reset_guards()
+        server.stop()
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(json.load(f), result)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+
+# Local stand-in for NASA POWER (daily point API) and the Copernicus Process
+# API, replaying the fixtures in benchmarks/fixtures/ so the pipeline can be
+# tested and benchmarked offline. POWER days are served by calendar day from
+# a one-year recording, so any requested window gets plausible seasonal
+# values; every Process request gets the recorded tile, resampled to the
+# requested size and returned as an uncompressed FLOAT32 TIFF like the real
+# service. An optional per-request delay models upstream latency.
+#
+# Refresh the fixtures from the live services (needs network):
+#   python -m FieldFusion.benchmarks.standin --record
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+POWER_FIXTURE = os.path.join(FIXTURES, "power_daily_pune_2024.json")
+S2_FIXTURE = os.path.join(FIXTURES, "s2_l2a_tile.tif")
+RECORD_POINT = (18.5204, 73.8567)  # Pune
+RECORD_YEAR = 2024
+
+class Fixtures:
+    def __init__(self, power_path: str = POWER_FIXTURE, s2_path: str = S2_FIXTURE):
+        import tifffile
+        with open(power_path) as f:
+            parameter = json.load(f)["properties"]["parameter"]
+        # {par: {MMDD: value}}
+        self.power = {par: {day[4:]: v for day, v in days.items()} for par, days in parameter.items()}
+        self.tile = np.asarray(tifffile.imread(s2_path), dtype=np.float32)  # (H, W, bands)
+        self._tiffs: Dict[Tuple[int, int], bytes] = {}
+        self._lock = threading.Lock()
+
+    def power_json(self, start: str, end: str, pars) -> dict:
+        d0 = datetime.strptime(start, "%Y%m%d")
+        n = (datetime.strptime(end, "%Y%m%d") - d0).days + 1
+        days = [(d0 + timedelta(days=i)).strftime("%Y%m%d") for i in range(n)]
+        return {
+            "type": "Feature",
+            "properties": {"parameter": {
+                par: {d: self.power.get(par, {}).get(d[4:], -999.0) for d in days} for par in pars
+            }},
+            "header": {"fill_value": -999.0, "start": start, "end": end},
+        }
+
+    def s2_tiff(self, width: int, height: int) -> bytes:
+        with self._lock:
+            hit = self._tiffs.get((width, height))
+        if hit is not None:
+            return hit
+        import tifffile
+        h, w = self.tile.shape[:2]
+        rows = np.arange(height) * h // height
+        cols = np.arange(width) * w // width
+        buf = io.BytesIO()
+        tifffile.imwrite(buf, np.ascontiguousarray(self.tile[rows][:, cols]), photometric="minisblack")
+        data = buf.getvalue()
+        with self._lock:
+            self._tiffs[(width, height)] = data
+        return data
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real upstreams
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        if self.server.delay_s:
+            time.sleep(self.server.delay_s)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/power":
+            return self._send(404, b"{}", "application/json")
+        self.server.counts["power"] += 1
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self._delay()
+        body = self.server.fixtures.power_json(q["start"], q["end"], q["parameters"].split(","))
+        self._send(200, json.dumps(body).encode(), "application/json")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != "/process":
+            return self._send(404, b"{}", "application/json")
+        self.server.counts["process"] += 1
+        self._delay()
+        out = body.get("output", {})
+        tiff = self.server.fixtures.s2_tiff(int(out.get("width", 256)), int(out.get("height", 256)))
+        self._send(200, tiff, "image/tiff")
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures: Optional[Fixtures] = None, delay_ms: float = 0.0, port: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.fixtures = fixtures or Fixtures()
+        self.delay_s = delay_ms / 1000.0
+        self.counts = {"power": 0, "process": 0}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def urls(self) -> Dict[str, str]:
+        # settings fields to point at the stand-in
+        return {"nasa_power_base": f"{self.base_url}/power", "s2_process_url": f"{self.base_url}/process"}
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def record():
+    """Capture fresh fixtures from the live POWER and Copernicus endpoints."""
+    import httpx
+    from ..core.config import settings
+    from ..core.constants import POWER_PARS
+    from ..providers.raster_cache import tile_bbox, tiles_for_bbox
+    from ..providers.satellite import _bbox_around_point, _process_body
+
+    lat, lon = RECORD_POINT
+    r = httpx.get(settings.nasa_power_base, timeout=120, params={
+        "parameters": ",".join(POWER_PARS), "community": settings.community, "latitude": lat, "longitude": lon,
+        "start": f"{RECORD_YEAR}0101", "end": f"{RECORD_YEAR}1231", "format": "JSON",
+    })
+    r.raise_for_status()
+    with open(POWER_FIXTURE, "w") as f:
+        json.dump(r.json(), f, separators=(",", ":"))
+
+    end = datetime.utcnow().date()
+    tile = tiles_for_bbox(_bbox_around_point(lat, lon, 200))[0]
+    body = _process_body(tile_bbox(tile), end - timedelta(days=settings.s2_lookback_days), end, 128, settings.s2_max_cloud_pct)
+    r = httpx.post(settings.s2_process_url, json=body, timeout=120)
+    r.raise_for_status()
+    import tifffile
+    arr = tifffile.imread(io.BytesIO(r.content))
+    tifffile.imwrite(S2_FIXTURE, arr, photometric="minisblack", compression="zlib")
+    print(f"recorded {POWER_FIXTURE} and {S2_FIXTURE} ({arr.shape})")
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Serve (or --record) the POWER / Sentinel-2 fixtures.")
+    ap.add_argument("--record", action="store_true", help="refresh fixtures from the live services")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay-ms", type=float, default=0.0)
+    args = ap.parse_args(argv)
+    if args.record:
+        return record()
+    server = StandInServer(delay_ms=args.delay_ms, port=args.port)
+    print(json.dumps(server.urls()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
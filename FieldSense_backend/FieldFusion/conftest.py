@@ -6,3 +6,79 @@ pkg_root = Path(__file__).resolve().parent
 backend_root = pkg_root.parent
 if str(backend_root) not in sys.path:
     sys.path.insert(0, str(backend_root))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_stores(tmp_path):
+    # Each test gets its own on-disk Sentinel-2 tile cache, series store and grid scan root,
+    # and fresh provider rate limiters / circuit breakers
+    from FieldFusion.core.http import providers
+    from FieldFusion.providers.raster_cache import RasterTileCache, set_tile_cache
+    from FieldFusion.pipeline.timeseries import SeriesStore, set_series_store
+    from FieldFusion.pipeline.tiles import RiskTiles, set_risk_tiles
+    set_tile_cache(RasterTileCache(str(tmp_path / "tiles"), max_bytes=64 * 1024 * 1024))
+    set_series_store(SeriesStore(str(tmp_path / "series")))
+    set_risk_tiles(RiskTiles(str(tmp_path / "grids"), max_bytes=1024 * 1024, refresh_s=0.0))
+    providers.reset_guards()
+    yield
+    set_tile_cache(None)
+    set_series_store(None)
+    set_risk_tiles(None)
+
+
+@pytest.fixture
+def s2_tiff():
+    # Encodes a (B03, B04, B08, B11, SCL) tile whose clear pixels have NDVI `ndvi`;
+    # `scl` is a scalar class or a (px, px) array of classes (4 = vegetation)
+    tifffile = pytest.importorskip("tifffile")
+    import io
+    import numpy as np
+
+    def make(ndvi=0.5, px=256, scl=4):
+        red = 0.1
+        nir = red * (1 + ndvi) / (1 - ndvi)
+        bands = np.empty((px, px, 5), dtype=np.float32)
+        bands[..., 0], bands[..., 1], bands[..., 2], bands[..., 3] = 0.08, red, nir, 0.2
+        bands[..., 4] = scl
+        buf = io.BytesIO()
+        tifffile.imwrite(buf, bands, photometric="minisblack")
+        return buf.getvalue()
+    return make
+
+
+@pytest.fixture
+def power_handler():
+    # httpx.MockTransport handler for NASA POWER: every requested day at 26 °C (T2M*) / 1.0
+    # (everything else); requests are appended to `calls`
+    import httpx
+    from datetime import datetime, timedelta
+
+    def make(calls):
+        def handler(request):
+            calls.append(request)
+            q = request.url.params
+            d0 = datetime.strptime(q["start"], "%Y%m%d")
+            n = (datetime.strptime(q["end"], "%Y%m%d") - d0).days + 1
+            days = [(d0 + timedelta(days=i)).strftime("%Y%m%d") for i in range(n)]
+            par = {k: {d: 26.0 if k.startswith("T2M") else 1.0 for d in days} for k in q["parameters"].split(",")}
+            return httpx.Response(200, json={"properties": {"parameter": par}})
+        return handler
+    return make
+
+
+@pytest.fixture
+def copernicus_handler():
+    # httpx.MockTransport handler for the Process API: answers every tile with `payload`
+    # after 10 ms (so concurrent callers overlap); requests are appended to `calls`
+    import asyncio
+    import httpx
+
+    def make(calls, payload):
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, content=payload)
+        return handler
+    return make
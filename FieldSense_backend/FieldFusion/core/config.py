@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pydantic import BaseModel
 
 class Settings(BaseModel):
@@ -8,5 +9,91 @@ class Settings(BaseModel):
     use_openweather_agro: bool = False
     s2_max_cloud_pct: int = 40
     s2_lookback_days: int = 20
+    # Per-stage deadlines (seconds) for analyze_aoi; a late stage degrades to a partial result
+    weather_deadline_s: float = 30.0
+    s2_deadline_s: float = 60.0
+    image_deadline_s: float = 10.0
+    # /fusion/analyze-batch: max fields per call and fields analysed at once
+    batch_max_items: int = 1000
+    batch_concurrency: int = 16
+    s2_process_url: str = "https://sh.dataspace.copernicus.eu/api/v1/process"
+    s2_catalog_url: str = "https://sh.dataspace.copernicus.eu/api/v1/catalog/1.0.0/search"
+    s2_timeout_s: float = 60.0
+    power_timeout_s: float = 30.0
+    # Sentinel-2 tile cache: fixed grid of s2_tile_px tiles at s2_tile_res_m, stored as .npy
+    s2_tile_res_m: int = 10
+    s2_tile_px: int = 256
+    s2_tile_cache_dir: str = os.getenv(
+        "FIELDFUSION_TILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fieldfusion_tiles")
+    )
+    s2_tile_cache_max_bytes: int = 512 * 1024 * 1024
+    # Per-field index time series (append-only record files) for /fusion/timeseries
+    timeseries_dir: str = os.getenv(
+        "FIELDFUSION_SERIES_DIR", os.path.join(tempfile.gettempdir(), "fieldfusion_series")
+    )
+    timeseries_concurrency: int = 4
+    # L2A products reach the catalog up to a few days after acquisition; the
+    # most recent days are never marked as scanned, so later queries re-check them
+    timeseries_publish_lag_days: int = 5
+    # Provider HTTP pools (per host) and retry/backoff, plus CPU executor sizing
+    http_max_connections: int = 20
+    http_max_keepalive: int = 10
+    http_keepalive_expiry_s: float = 60.0
+    http_retries: int = 2
+    http_backoff_base_s: float = 0.25
+    http_backoff_max_s: float = 4.0
+    http_connect_timeout_s: float = 5.0
+    # Per-provider token bucket (requests/s, burst) and the longest a request waits for a token
+    power_rate_per_s: float = 5.0
+    power_burst: int = 10
+    s2_rate_per_s: float = 5.0
+    s2_burst: int = 10
+    http_rate_max_wait_s: float = 2.0
+    # Circuit breaker: open after this many consecutive failed attempts, probe again after reset_s
+    breaker_failures: int = 5
+    breaker_reset_s: float = 30.0
+    cpu_workers: int = min(4, os.cpu_count() or 1)
+    # Regional grid scan: cells per chunk side and worker processes for the per-cell reduction
+    grid_chunk_cells: int = 64
+    grid_workers: int = min(4, os.cpu_count() or 1)
+    # /fusion/tiles: map tiles rendered from the grid scans under grid_dir (one scan per subdirectory)
+    grid_dir: str = os.getenv(
+        "FIELDFUSION_GRID_DIR", os.path.join(tempfile.gettempdir(), "fieldfusion_grids")
+    )
+    tiles_max_zoom: int = 18
+    tiles_cache_max_bytes: int = 64 * 1024 * 1024
+    tiles_refresh_s: float = 30.0
+    tiles_grids_max_bytes: int = 256 * 1024 * 1024
+    # /fusion/jobs: background analyses; finished results kept in the app database for jobs_ttl_s
+    jobs_workers: int = 8
+    jobs_max_queued: int = 1000
+    jobs_ttl_s: float = 24 * 3600.0
+    jobs_purge_interval_s: float = 600.0
+    jobs_sse_keepalive_s: float = 15.0
+    # Uploaded leaf photos: size limits, model input size and feature cache (by content hash)
+    image_max_bytes: int = 25 * 1024 * 1024
+    image_max_pixels: int = 50_000_000
+    image_input_px: int = 224
+    image_cache_entries: int = 512
+    # Pest image classifier: .onnx (needs onnxruntime) or .npz NumPy weights; empty = no image pest term
+    pest_model_path: str = os.getenv("FIELDFUSION_PEST_MODEL", "")
+    pest_batch_max: int = 32
+    pest_batch_wait_ms: float = 4.0
+    pest_intra_op_threads: int = 1
+    pest_inter_op_threads: int = 1
+    # Add a Server-Timing header (per-stage durations) to FieldFusion responses
+    server_timing: bool = os.getenv("FIELDFUSION_SERVER_TIMING", "0") == "1"
+    # NASA POWER cache: snap to the POWER grid, per-day TTL by data finality
+    power_grid_lat_deg: float = 0.5
+    power_grid_lon_deg: float = 0.625
+    power_cache_max_entries: int = 4096
+    power_cache_sqlite: str = os.getenv("FIELDFUSION_POWER_CACHE_DB", "")
+    power_final_after_days: int = 60
+    power_cache_final_ttl_s: float = 30 * 86400.0
+    power_cache_provisional_ttl_s: float = 6 * 3600.0
+    power_cache_missing_ttl_s: float = 3600.0
+    # Expired days (and older S2 windows) kept to serve, flagged stale, while a provider is down
+    power_cache_stale_s: float = 7 * 86400.0
+    s2_stale_max_days: int = 30
 
 settings = Settings()
@@ -12,5 +12,19 @@ RH_HIGH = 70.0  # %
 TEMP_WARM_C = 28.0
 RAIN_RECENT_MM = 10.0
 
-# NASA POWER parameter names (daily ag)
-POWER_PARS = ["T2M", "RH2M", "PRECTOTCORR"]
+# Risk level codes shared by the models' vectorized paths (index = code)
+RISK_LEVELS = ("unknown", "low", "medium", "high")
+LEVEL_UNKNOWN, LEVEL_LOW, LEVEL_MEDIUM, LEVEL_HIGH = range(4)
+
+# NASA POWER parameter names (daily ag) and the value it returns for missing data
+POWER_PARS = ["T2M", "T2M_MAX", "T2M_MIN", "RH2M", "PRECTOTCORR"]
+POWER_FILL = -999.0
+
+# Rolling-window weather features for the risk models
+GDD_BASE_C = 10.0
+GDD_CAP_C = 30.0
+HOT_DAY_C = 35.0  # T2M_MAX above this counts towards a heat streak
+RAIN_WINDOW_DAYS = 3
+
+# Pest image classifier probability at which a leaf photo counts as a pest signal
+IMG_PEST_PROB = 0.5
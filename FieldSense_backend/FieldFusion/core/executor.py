@@ -0,0 +1,26 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from .config import settings
+
+# Bounded pool for CPU-bound work (TIFF decode, NumPy reductions) so it
+# never runs on the event loop thread. NumPy and tifffile release the GIL
+# for the heavy parts, so threads are enough here.
+_pool: Optional[ThreadPoolExecutor] = None
+
+def cpu_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=settings.cpu_workers, thread_name_prefix="fieldfusion-cpu")
+    return _pool
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_pool(), functools.partial(fn, *args, **kwargs))
+
+def shutdown_cpu_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from typing import Optional
+
+# Per-provider upstream guards used by core.http. A token bucket keeps us
+# under the providers' fair-use rate, and a circuit breaker stops sending
+# requests to a provider that keeps failing. While the breaker is open,
+# callers fail fast and serve cached data instead of waiting on dead
+# connections. After reset_s, one probe request is let through (half-open).
+# The circuit closes if the probe succeeds and re-opens if it fails. Both
+# guards are used from the event loop only, so they need no locks.
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, burst: int, clock=time.monotonic):
+        self.rate = rate_per_s
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._at = clock()
+        self.waited = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._at) * self.rate)
+        self._at = now
+
+    def reserve(self, max_wait_s: float) -> Optional[float]:
+        """Take a token; returns the seconds to wait for it, or None if that exceeds max_wait_s."""
+        if self.rate <= 0:
+            return 0.0  # unlimited
+        self._refill()
+        # Tokens may go negative: each waiter holds a reservation, so waiters are served in order
+        wait = max(0.0, (1.0 - self._tokens) / self.rate)
+        if wait > max_wait_s:
+            self.rejected += 1
+            return None
+        self._tokens -= 1.0
+        if wait:
+            self.waited += 1
+        return wait
+
+    async def acquire(self, max_wait_s: float) -> bool:
+        wait = self.reserve(max_wait_s)
+        if wait is None:
+            return False
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._tokens += 1.0  # hand the reservation back
+                raise
+        return True
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_s: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0  # consecutive
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_s:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def success(self):
+        self._state = CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def failure(self):
+        self._failures += 1
+        if self._state == OPEN:
+            return  # late answers from before the trip don't extend the open window
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self.opened += 1
+            self._state = OPEN
+            self._opened_at = self._clock()
+            self._probing = False
+
+    def abandon(self):
+        # The attempt ended without an answer (cancelled); let another request probe
+        self._probing = False
+
+    def retry_after_s(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_s - (self._clock() - self._opened_at))
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,227 @@
+import asyncio
+import importlib.util
+import math
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import httpx
+from .config import settings
+from .guards import CircuitBreaker, TokenBucket
+from .metrics import upstream_rejected, upstream_responses, upstream_seconds
+
+# App-lifetime registry of pooled AsyncClients, one per upstream provider.
+# Keeping a client per host gives each provider its own connection limits,
+# and keep-alive (plus HTTP/2 when `h2` is installed) means repeat analyses
+# skip the TCP/TLS handshake. Opened and closed by the FastAPI lifespan in
+# main.py; get() opens lazily so scripts and tests work without it. Every
+# attempt passes the provider's rate limiter and circuit breaker (guards.py);
+# when either refuses, request() raises ProviderUnavailable at once.
+# Interactive requests only wait settings.http_rate_max_wait_s for a token;
+# batch, grid and job work calls queue_for_tokens() to queue instead.
+
+RETRY_STATUSES = {429, 502, 503, 504}
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Longest wait for a rate-limit token in the current task; None = settings.http_rate_max_wait_s
+_rate_wait: ContextVar[Optional[float]] = ContextVar("fieldfusion_rate_wait", default=None)
+
+def queue_for_tokens(max_wait_s: float = math.inf):
+    """Provider requests from the current task (and tasks it spawns) wait for a token instead of failing fast.
+
+    Call it at the top of a task's coroutine: the setting lives in that task's context.
+    """
+    _rate_wait.set(max_wait_s)
+
+class ProviderUnavailable(httpx.TransportError):
+    """Refused locally (circuit open or rate limit) without contacting the provider."""
+
+    def __init__(self, provider: str, reason: str, retry_after_s: float = 0.0):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+@dataclass
+class ProviderSpec:
+    timeout_s: float
+    max_connections: int = settings.http_max_connections
+    max_keepalive: int = settings.http_max_keepalive
+    http2: bool = True
+    rate_per_s: float = 0.0  # 0 = unlimited
+    burst: int = 1
+
+@dataclass
+class ProviderStats:
+    requests: int = 0
+    new_connections: int = 0
+    tls_handshakes: int = 0
+    retries: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    circuit_rejected: int = 0
+
+    def as_dict(self):
+        reused = max(0, self.requests - self.new_connections)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_connections": reused,
+            "reuse_ratio": (reused / self.requests) if self.requests else None,
+            "retries": self.retries,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "circuit_rejected": self.circuit_rejected,
+        }
+
+@dataclass
+class ProviderClients:
+    specs: Dict[str, ProviderSpec]
+    _clients: Dict[str, httpx.AsyncClient] = field(default_factory=dict)
+    _stats: Dict[str, ProviderStats] = field(default_factory=dict)
+    _buckets: Dict[str, TokenBucket] = field(default_factory=dict)
+    _breakers: Dict[str, CircuitBreaker] = field(default_factory=dict)
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        spec = self.specs[name]
+        stats = self._stats.setdefault(name, ProviderStats())
+
+        # httpcore trace events tell us when a request had to open a new connection
+        async def trace(event: str, info):
+            if event == "connection.connect_tcp.complete":
+                stats.new_connections += 1
+            elif event == "connection.start_tls.complete":
+                stats.tls_handshakes += 1
+
+        async def on_request(request: httpx.Request):
+            stats.requests += 1
+            request.extensions["trace"] = trace
+
+        return httpx.AsyncClient(
+            # Connect fails fast on a dead host; reads may take the full provider timeout
+            timeout=httpx.Timeout(spec.timeout_s, connect=min(spec.timeout_s, settings.http_connect_timeout_s)),
+            http2=spec.http2 and _HTTP2,
+            limits=httpx.Limits(
+                max_connections=spec.max_connections,
+                max_keepalive_connections=spec.max_keepalive,
+                keepalive_expiry=settings.http_keepalive_expiry_s,
+            ),
+            event_hooks={"request": [on_request]},
+        )
+
+    def bucket(self, name: str) -> TokenBucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            spec = self.specs.get(name) or ProviderSpec(timeout_s=0)
+            bucket = self._buckets[name] = TokenBucket(spec.rate_per_s, spec.burst)
+        return bucket
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(settings.breaker_failures, settings.breaker_reset_s)
+        return breaker
+
+    def reset_guards(self):
+        # Fresh rate limiters and breakers, built from the current settings (tests)
+        self._buckets.clear()
+        self._breakers.clear()
+
+    async def open(self):
+        for name in self.specs:
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    def set_client(self, name: str, client: Optional[httpx.AsyncClient]):
+        # Swap a provider's client (tests inject one backed by httpx.MockTransport)
+        self._stats.setdefault(name, ProviderStats())
+        if client is None:
+            self._clients.pop(name, None)
+        else:
+            self._clients[name] = client
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send with bounded retries and full-jitter exponential backoff.
+
+        Retries connection failures and 429/5xx gateway statuses; the last
+        response (or error) is returned to the caller unchanged. Raises
+        ProviderUnavailable when the circuit is open or no rate-limit token
+        frees up within settings.http_rate_max_wait_s.
+        """
+        stats = self._stats.setdefault(name, ProviderStats())
+        bucket, breaker = self.bucket(name), self.breaker(name)
+        attempts = settings.http_retries + 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            if not breaker.allow():
+                stats.circuit_rejected += 1
+                upstream_rejected.inc(name, "circuit_open")
+                raise ProviderUnavailable(name, "circuit_open", breaker.retry_after_s())
+            max_wait = _rate_wait.get()
+            try:
+                ok = await bucket.acquire(settings.http_rate_max_wait_s if max_wait is None else max_wait)
+            except BaseException:
+                breaker.abandon()
+                raise
+            if not ok:
+                breaker.abandon()
+                stats.rate_limited += 1
+                upstream_rejected.inc(name, "rate_limited")
+                raise ProviderUnavailable(name, "rate_limited", 1.0 / bucket.rate)
+            t0 = time.perf_counter()
+            try:
+                r = await self.get(name).request(method, url, **kwargs)
+            except RETRY_ERRORS:
+                stats.errors += 1
+                breaker.failure()
+                upstream_seconds.observe(time.perf_counter() - t0, name)
+                upstream_responses.inc(name, "error")
+                if last:
+                    raise
+            except httpx.HTTPError:
+                breaker.failure()
+                upstream_seconds.observe(time.perf_counter() - t0, name)
+                upstream_responses.inc(name, "error")
+                raise
+            except BaseException:
+                breaker.abandon()
+                raise
+            else:
+                upstream_seconds.observe(time.perf_counter() - t0, name)
+                upstream_responses.inc(name, str(r.status_code))
+                # 4xx means the provider is up and answering; only gateway errors count against it
+                if r.status_code in RETRY_STATUSES or r.status_code >= 500:
+                    breaker.failure()
+                else:
+                    breaker.success()
+                if r.status_code not in RETRY_STATUSES or last:
+                    return r
+                await r.aclose()
+            stats.retries += 1
+            cap = min(settings.http_backoff_max_s, settings.http_backoff_base_s * (2 ** attempt))
+            await asyncio.sleep(random.uniform(0, cap))
+
+    def stats(self):
+        out = {name: s.as_dict() for name, s in self._stats.items()}
+        for name, breaker in self._breakers.items():
+            out.setdefault(name, ProviderStats().as_dict())["circuit"] = breaker.stats()
+        return out
+
+providers = ProviderClients(specs={
+    "power": ProviderSpec(timeout_s=settings.power_timeout_s, rate_per_s=settings.power_rate_per_s, burst=settings.power_burst),
+    "copernicus": ProviderSpec(timeout_s=settings.s2_timeout_s, rate_per_s=settings.s2_rate_per_s, burst=settings.s2_burst),
+})
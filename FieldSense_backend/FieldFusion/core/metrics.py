@@ -0,0 +1,167 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Process-local metrics in the Prometheus text format, without the client
+# library. Recording is a dict lookup and a couple of adds under a lock, so
+# it stays on in production. Counters and fixed-bucket histograms are keyed
+# by label values; existing stats() dicts are exported through collectors
+# evaluated only when /metrics is scraped. Per-request timings for the
+# Server-Timing header live in a ContextVar (stage tasks inherit it).
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *label_values: str, n: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + n
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        if not self.labels and not items:
+            items = [((), 0.0)]  # unlabelled counters are exported from zero
+        for lv, v in items:
+            yield f"{self.name}_total", dict(zip(self.labels, lv)), v
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # per label tuple: [per-bucket counts (+Inf last)..., sum, count]
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(label_values)
+            if row is None:
+                row = self._values[label_values] = [0.0] * (len(self.buckets) + 3)
+            row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, *label_values: str) -> float:
+        row = self._values.get(label_values)
+        return row[-1] if row else 0.0
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = [(lv, list(row)) for lv, row in self._values.items()]
+        for lv, row in items:
+            labels = dict(zip(self.labels, lv))
+            cumulative = 0.0
+            for le, n in zip(self.buckets + (float("inf"),), row):
+                cumulative += n
+                yield f"{self.name}_bucket", {**labels, "le": _fmt_value(le)}, cumulative
+            yield f"{self.name}_sum", labels, row[-2]
+            yield f"{self.name}_count", labels, row[-1]
+
+class Collected:
+    """Metric whose samples come from a callback at scrape time (gauges over stats() dicts)."""
+
+    def __init__(self, name: str, kind: str, help: str, fn: Callable[[], Iterable[Tuple[Dict[str, str], Optional[float]]]]):
+        self.name, self.kind, self.help, self._fn = name, kind, help, fn
+
+    def samples(self) -> Iterable[Sample]:
+        suffix = "_total" if self.kind == "counter" else ""
+        for labels, v in self._fn():
+            if v is not None:
+                yield f"{self.name}{suffix}", labels, v
+
+_registry: List = []
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+def render() -> str:
+    lines = []
+    for m in _registry:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        for name, labels, v in m.samples():
+            lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(v)}")
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+stage_seconds = register(Histogram(
+    "fieldfusion_stage_seconds", "Latency of analysis stages and hot-path steps.", ("stage",)))
+stage_outcomes = register(Counter(
+    "fieldfusion_stage_outcomes", "Analysis stage completions by outcome (ok, deadline, error).", ("stage", "outcome")))
+upstream_seconds = register(Histogram(
+    "fieldfusion_upstream_request_seconds", "Upstream provider request latency, per attempt.", ("provider",)))
+upstream_responses = register(Counter(
+    "fieldfusion_upstream_responses", "Upstream provider responses by HTTP status (or 'error').", ("provider", "status")))
+upstream_rejected = register(Counter(
+    "fieldfusion_upstream_rejected", "Upstream requests refused locally (circuit_open, rate_limited).", ("provider", "reason")))
+stale_served = register(Counter(
+    "fieldfusion_stale_served", "Values served from expired cache entries while a provider was unavailable.", ("source",)))
+fallbacks = register(Counter(
+    "fieldfusion_fallbacks", "Values replaced by a fallback, by source and reason.", ("source", "reason")))
+degraded_responses = register(Counter(
+    "fieldfusion_degraded_responses", "Analyses returned with at least one fallback value.", ()))
+http_seconds = register(Histogram(
+    "fieldfusion_http_request_seconds", "FieldFusion endpoint latency until response headers.", ("method", "route", "status")))
+
+# Server-Timing: {name: seconds} for the current request, when one is being timed
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("fieldfusion_timings", default=None)
+
+def start_timings() -> Dict[str, float]:
+    d: Dict[str, float] = {}
+    _timings.set(d)
+    return d
+
+def observe_stage(name: str, seconds: float):
+    stage_seconds.observe(seconds, name)
+    d = _timings.get()
+    if d is not None:
+        # concurrent steps with one name (e.g. tile decodes) add up
+        d[name] = d.get(name, 0.0) + seconds
+
+@contextmanager
+def timed(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0)
+
+def server_timing(timings: Dict[str, float], total_s: Optional[float] = None) -> str:
+    parts = [f"{name};dur={s * 1000.0:.1f}" for name, s in timings.items()]
+    if total_s is not None:
+        parts.append(f"total;dur={total_s * 1000.0:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+# Single-flight: concurrent callers asking for the same provider data (same
+# normalized key) share one in-flight task instead of each hitting upstream.
+# Only in-flight work is shared; finished results are the caches' job. Each
+# caller gets a shielded view of the task, so one caller hitting its stage
+# deadline never cancels the fetch the others are waiting on.
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.peak_waiters = 0
+        self._waiters: Dict[Hashable, int] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Awaitable:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda t, key=key: self._done(key, t))
+        else:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            self.peak_waiters = max(self.peak_waiters, self._waiters[key])
+        return asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        # Mark the outcome retrieved even if every caller gave up waiting
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": (self.coalesced / self.calls) if self.calls else None,
+            "in_flight": len(self._inflight),
+            "peak_waiters": self.peak_waiters,
+        }
+
+_flights: Dict[str, SingleFlight] = {}
+
+def flight(name: str) -> SingleFlight:
+    if name not in _flights:
+        _flights[name] = SingleFlight(name)
+    return _flights[name]
+
+def flight_stats():
+    return {name: f.stats() for name, f in _flights.items()}
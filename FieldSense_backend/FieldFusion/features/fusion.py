@@ -1,16 +1,12 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from .vector import FeatureVector
 
-def build_feature_vector(s2: Dict[str, Any], wx: Dict[str, Any], img_feats=None):
-    fv = {
-        "ndvi": s2.get("ndvi"),
-        "gndvi": s2.get("gndvi"),
-        "ndwi": s2.get("ndwi"),
-        "ndmi": s2.get("ndmi"),
-        "savi": s2.get("savi"),
-        "t2m_c": wx.get("t2m_c"),
-        "rh2m_pct": wx.get("rh2m_pct"),
-        "rain_mm": wx.get("rain_mm"),
-    }
-    if img_feats is not None:
-        fv["img_bytes"] = img_feats.get("bytes")
+def build_feature_vector(s2: Dict[str, Any], wx: Dict[str, Any], img_feats=None, out: Optional[FeatureVector] = None) -> FeatureVector:
+    # Pass `out` (e.g. FeatureBlock.vector(i)) to fill a batch matrix row in place
+    fv = out if out is not None else FeatureVector()
+    for name in ("ndvi", "gndvi", "ndwi", "ndmi", "savi"):
+        fv.set(name, s2.get(name))
+    for name in ("t2m_c", "rh2m_pct", "rain_mm"):
+        fv.set(name, wx.get(name))
+    fv.set("img_pest_prob", img_feats.get("pest_prob") if img_feats is not None else None)
     return fv
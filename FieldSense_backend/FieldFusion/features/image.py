@@ -0,0 +1,66 @@
+import numpy as np
+
+# Compact colour/texture descriptor of a downscaled leaf photo. Plant pixels
+# are split into green (excess-green index and green hue) and lesion-like
+# (yellow/brown, saturated); texture comes from grayscale gradients.
+
+IMAGE_FEATURES = (
+    "mean_r", "mean_g", "mean_b", "std_r", "std_g", "std_b",
+    "exg", "green_frac", "lesion_frac", "edge_density", "sharpness",
+)
+
+EXG_GREEN = 0.05  # chromatic excess green above this (with a green hue) = healthy leaf
+LESION_HUE = (15.0, 60.0)  # degrees: yellow through brown
+LESION_MIN_SAT = 0.3
+LESION_VAL = (0.15, 0.95)
+EDGE_GRAD = 0.1
+
+def _hue_sat_val(rgb: np.ndarray):
+    mx = rgb.max(axis=-1)
+    mn = rgb.min(axis=-1)
+    delta = mx - mn
+    safe = np.where(delta > 0, delta, 1.0)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    hue = np.select(
+        [mx == r, mx == g],
+        [((g - b) / safe) % 6.0, (b - r) / safe + 2.0],
+        default=(r - g) / safe + 4.0,
+    ) * 60.0
+    hue = np.where(delta > 0, hue, 0.0)
+    sat = np.where(mx > 0, delta / np.where(mx > 0, mx, 1.0), 0.0)
+    return hue, sat, mx
+
+def image_features(rgb: np.ndarray) -> np.ndarray:
+    """(H, W, 3) uint8 RGB -> float32 vector in IMAGE_FEATURES order."""
+    x = rgb.astype(np.float32) / 255.0
+    flat = x.reshape(-1, 3)
+    mean = flat.mean(axis=0)
+    std = flat.std(axis=0)
+
+    total = x.sum(axis=-1)
+    chroma = x / np.where(total > 0, total, 1.0)[..., None]
+    exg = 2.0 * chroma[..., 1] - chroma[..., 0] - chroma[..., 2]
+    hue, sat, val = _hue_sat_val(x)
+    # Yellow-brown also has positive excess green, so green needs a green hue too
+    green = (exg > EXG_GREEN) & (hue > LESION_HUE[1])
+    lesion = (
+        (hue >= LESION_HUE[0]) & (hue <= LESION_HUE[1])
+        & (sat >= LESION_MIN_SAT)
+        & (val >= LESION_VAL[0]) & (val <= LESION_VAL[1])
+    )
+    plant = int(np.count_nonzero(green | lesion))
+
+    gray = x @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gx = np.diff(gray, axis=1)[:-1]
+    gy = np.diff(gray, axis=0)[:, :-1]
+    grad = np.hypot(gx, gy)
+    lap = gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1] - 4.0 * gray[1:-1, 1:-1]
+
+    return np.array([
+        *mean, *std,
+        float(exg.mean()),
+        float(green.mean()),
+        (np.count_nonzero(lesion) / plant) if plant else 0.0,
+        float((grad > EDGE_GRAD).mean()) if grad.size else 0.0,
+        float(lap.var()) if lap.size else 0.0,
+    ], dtype=np.float32)
@@ -1,3 +1,4 @@
+import numpy as np
 from ..core.utils import safe_div
 
 def ndvi(B8, B4): 
@@ -14,3 +15,63 @@ def ndmi(B8, B11):
 
 def savi(B8, B4, L=0.5):
     return safe_div((1 + L) * (B8 - B4), (B8 + B4 + L))
+
+# Vectorized path over a Sentinel-2 band stack (B, H, W) in STACK_BANDS order.
+# All five indices land in one preallocated (5, H, W) float32 array; one (H, W)
+# denominator buffer and one mask buffer are reused for every index. Pixels
+# with a zero or non-finite denominator become NaN.
+
+STACK_BANDS = ("B03", "B04", "B08", "B11")
+INDEX_NAMES = ("ndvi", "gndvi", "ndwi", "ndmi", "savi")
+INDEX_PERCENTILES = (10, 25, 50, 75, 90)
+
+def _masked_divide(out, den, mask):
+    # out /= den in place; NaN where den is zero or non-finite (mask is scratch)
+    np.isfinite(den, out=mask)
+    np.logical_and(mask, den != 0, out=mask)
+    np.divide(out, den, out=out, where=mask)
+    np.logical_not(mask, out=mask)
+    np.copyto(out, np.nan, where=mask)
+
+def _normalized_diff(a, b, out, den, mask):
+    np.subtract(a, b, out=out)
+    np.add(a, b, out=den)
+    _masked_divide(out, den, mask)
+
+def index_stack(bands: np.ndarray, L: float = 0.5) -> np.ndarray:
+    B3, B4, B8, B11 = bands[0], bands[1], bands[2], bands[3]
+    out = np.empty((len(INDEX_NAMES),) + B3.shape, dtype=np.float32)
+    den = np.empty(B3.shape, dtype=np.float32)
+    mask = np.empty(B3.shape, dtype=bool)
+    _normalized_diff(B8, B4, out[0], den, mask)
+    _normalized_diff(B8, B3, out[1], den, mask)
+    _normalized_diff(B3, B11, out[2], den, mask)
+    _normalized_diff(B8, B11, out[3], den, mask)
+    # SAVI = (1 + L) * (B8 - B4) / (B8 + B4 + L)
+    np.subtract(B8, B4, out=out[4])
+    out[4] *= (1 + L)
+    np.add(B8, B4, out=den)
+    den += L
+    _masked_divide(out[4], den, mask)
+    return out
+
+def index_stats(stack: np.ndarray):
+    # Per-index mean/median/percentiles and valid-pixel fraction; None when no valid pixels
+    stats = {}
+    n = stack[0].size
+    for name, layer in zip(INDEX_NAMES, stack):
+        valid = layer[np.isfinite(layer)]
+        if valid.size == 0:
+            stats[name] = None
+            continue
+        pct = np.percentile(valid, INDEX_PERCENTILES)
+        stats[name] = {
+            "mean": float(valid.mean(dtype=np.float64)),
+            "median": float(pct[2]),
+            "p10": float(pct[0]),
+            "p25": float(pct[1]),
+            "p75": float(pct[3]),
+            "p90": float(pct[4]),
+            "valid_fraction": valid.size / n if n else 0.0,
+        }
+    return stats
@@ -0,0 +1,34 @@
+import numpy as np
+
+# Sentinel-2 L2A scene classification (SCL) classes
+SCL_NO_DATA = 0
+SCL_SATURATED = 1
+SCL_CLOUD_SHADOW = 3
+SCL_CLOUD_MEDIUM = 8
+SCL_CLOUD_HIGH = 9
+SCL_THIN_CIRRUS = 10
+SCL_SNOW = 11
+
+SCL_CLOUDY = (SCL_CLOUD_SHADOW, SCL_CLOUD_MEDIUM, SCL_CLOUD_HIGH, SCL_THIN_CIRRUS)
+SCL_DROPPED = (SCL_NO_DATA, SCL_SATURATED, SCL_SNOW) + SCL_CLOUDY
+
+def scl_mask(scl: np.ndarray):
+    """Return (dropped, cloud_percent) for an SCL layer.
+
+    `dropped` marks pixels to exclude from reductions (cloud, shadow, cirrus,
+    snow, saturated, no data). cloud_percent is cloud + shadow pixels over
+    pixels that carry data; None when the AOI has no data at all.
+    """
+    finite = np.isfinite(scl)
+    codes = np.where(finite, scl, SCL_NO_DATA).astype(np.uint8)
+    dropped = np.isin(codes, SCL_DROPPED)
+    with_data = int(np.count_nonzero(codes != SCL_NO_DATA))
+    if with_data == 0:
+        return dropped, None
+    cloudy = int(np.count_nonzero(np.isin(codes, SCL_CLOUDY)))
+    return dropped, 100.0 * cloudy / with_data
+
+def apply_mask(stack: np.ndarray, dropped: np.ndarray):
+    # In place: NaN out dropped pixels across every band of a (B, H, W) stack
+    np.copyto(stack, np.nan, where=dropped[np.newaxis])
+    return stack
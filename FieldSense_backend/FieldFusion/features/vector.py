@@ -0,0 +1,95 @@
+import struct
+from typing import Iterable, Optional
+import numpy as np
+
+# Fixed-schema feature vector for the fusion stage. Values live in one
+# float64 array laid out by FEATURE_NAMES, with NaN marking a missing
+# feature. A FeatureBlock preallocates an (n, F) matrix whose rows are handed
+# out as FeatureVectors, so filling vectors fills the batch-scoring matrix
+# in place with no stacking copy. Bump FEATURE_LAYOUT_VERSION whenever
+# FEATURE_NAMES changes; serialized vectors carry it.
+
+FEATURE_LAYOUT_VERSION = 3
+FEATURE_NAMES = ("ndvi", "gndvi", "ndwi", "ndmi", "savi", "t2m_c", "rh2m_pct", "rain_mm", "img_pest_prob")
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+N_FEATURES = len(FEATURE_NAMES)
+
+_HEADER = struct.Struct("<BB")  # layout version, feature count
+_MASK_BYTES = (N_FEATURES + 7) // 8
+
+class FeatureVector:
+    __slots__ = ("values",)
+
+    def __init__(self, values: Optional[np.ndarray] = None):
+        if values is None:
+            values = np.full(N_FEATURES, np.nan)
+        elif values.shape != (N_FEATURES,) or values.dtype != np.float64:
+            raise ValueError(f"expected float64[{N_FEATURES}], got {values.dtype}{list(values.shape)}")
+        self.values = values
+
+    def set(self, name: str, value):
+        self.values[FEATURE_INDEX[name]] = np.nan if value is None else value
+
+    def get(self, name: str, default=None):
+        # dict-style access for the models: missing (NaN) reads as `default`
+        v = self.values[FEATURE_INDEX[name]]
+        return default if v != v else float(v)
+
+    def __getitem__(self, name: str):
+        return self.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in FEATURE_INDEX
+
+    @property
+    def missing(self) -> np.ndarray:
+        return np.isnan(self.values)
+
+    def to_dict(self):
+        return {name: self.get(name) for name in FEATURE_NAMES}
+
+    def to_bytes(self) -> bytes:
+        # header + presence bitmask + present values only
+        present = ~self.missing
+        mask = np.packbits(present, bitorder="little")
+        return _HEADER.pack(FEATURE_LAYOUT_VERSION, N_FEATURES) + mask.tobytes() + self.values[present].tobytes()
+
+    @classmethod
+    def from_bytes(cls, buf: bytes) -> "FeatureVector":
+        version, n = _HEADER.unpack_from(buf)
+        if version != FEATURE_LAYOUT_VERSION or n != N_FEATURES:
+            raise ValueError(f"feature layout v{version}/{n} does not match v{FEATURE_LAYOUT_VERSION}/{N_FEATURES}")
+        mask = np.frombuffer(buf, dtype=np.uint8, count=_MASK_BYTES, offset=_HEADER.size)
+        present = np.unpackbits(mask, count=N_FEATURES, bitorder="little").astype(bool)
+        fv = cls()
+        fv.values[present] = np.frombuffer(buf, dtype=np.float64, offset=_HEADER.size + _MASK_BYTES)
+        return fv
+
+    def __repr__(self):
+        return f"FeatureVector({self.to_dict()})"
+
+class FeatureBlock:
+    """(n, F) float64 matrix whose rows are FeatureVector views."""
+    __slots__ = ("matrix",)
+
+    def __init__(self, n: int):
+        self.matrix = np.full((n, N_FEATURES), np.nan)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def vector(self, i: int) -> FeatureVector:
+        return FeatureVector(self.matrix[i])
+
+    def column(self, name: str) -> np.ndarray:
+        # Strided view, no copy
+        return self.matrix[:, FEATURE_INDEX[name]]
+
+    @classmethod
+    def stack(cls, vectors: Iterable[FeatureVector]) -> "FeatureBlock":
+        # For vectors built standalone; prefer filling block.vector(i) to avoid this copy
+        vectors = list(vectors)
+        block = cls(len(vectors))
+        for i, fv in enumerate(vectors):
+            block.matrix[i] = fv.values
+        return block
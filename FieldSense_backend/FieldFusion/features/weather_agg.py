@@ -0,0 +1,75 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..core.constants import POWER_FILL
+
+# Vectorized NASA POWER aggregation. Each parameter becomes one float64 array
+# over the requested days, with POWER's -999 fill (and anything missing or
+# outside the plausible range) mapped to NaN, so every reduction is a single
+# nan-aware NumPy call instead of a per-value Python loop.
+
+# Plausible physical range per parameter; values outside count as missing
+VALID_RANGES: Dict[str, Tuple[float, float]] = {
+    "T2M": (-60.0, 60.0),
+    "T2M_MAX": (-60.0, 70.0),
+    "T2M_MIN": (-70.0, 60.0),
+    "RH2M": (0.0, 100.0),
+    "PRECTOTCORR": (0.0, math.inf),
+}
+
+def _num(v):
+    return np.nan if v is None else v
+
+def _to_nan(arr: np.ndarray, par: str) -> np.ndarray:
+    lo, hi = VALID_RANGES.get(par, (-math.inf, math.inf))
+    # NaN compares False, so existing gaps stay NaN; the fill value is masked explicitly
+    arr[(arr == POWER_FILL) | ~((arr >= lo) & (arr <= hi))] = np.nan
+    return arr
+
+def parameter_arrays(parameter: Dict[str, Dict[str, float]], days: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """POWER `properties.parameter` dict -> {par: float64 array in day order}."""
+    out = {}
+    for par, series in parameter.items():
+        keys = days if days is not None else sorted(series)
+        vals = np.fromiter((_num(series.get(d)) for d in keys), dtype=np.float64, count=len(keys))
+        out[par] = _to_nan(vals, par)
+    return out
+
+def day_rows_arrays(rows: Dict[str, Dict[str, float]], days: List[str], pars: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Per-day rows ({day: {par: value}}, as cached) -> {par: float64 array over `days`}."""
+    empty: Dict[str, float] = {}
+    out = {}
+    for par in pars:
+        vals = np.fromiter(
+            (_num((rows.get(d) or empty).get(par)) for d in days), dtype=np.float64, count=len(days)
+        )
+        out[par] = _to_nan(vals, par)
+    return out
+
+def nan_mean(arr: np.ndarray) -> Optional[float]:
+    n = np.count_nonzero(~np.isnan(arr))
+    return float(np.nansum(arr) / n) if n else None
+
+def nan_sum(arr: np.ndarray) -> Optional[float]:
+    return float(np.nansum(arr)) if np.any(~np.isnan(arr)) else None
+
+def rolling_sum(arr: np.ndarray, window: int) -> np.ndarray:
+    # Sum over each full `window`-day span (missing days count as 0); empty if too short
+    if window <= 0 or arr.size < window:
+        return np.empty(0, dtype=np.float64)
+    c = np.concatenate(([0.0], np.cumsum(np.nan_to_num(arr, nan=0.0))))
+    return c[window:] - c[:-window]
+
+def longest_run(mask: np.ndarray) -> int:
+    # Length of the longest run of consecutive True values
+    if mask.size == 0:
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return int((ends - starts).max()) if starts.size else 0
+
+def growing_degree_days(t_max: np.ndarray, t_min: np.ndarray, base_c: float, cap_c: float) -> Optional[float]:
+    # Capped-average method: daily GDD = max(0, (min(Tmax, cap) + max(Tmin, base)) / 2 - base)
+    daily = (np.minimum(t_max, cap_c) + np.maximum(t_min, base_c)) / 2.0 - base_c
+    return nan_sum(np.maximum(daily, 0.0))
@@ -0,0 +1,95 @@
+from typing import Dict, List, Mapping
+import numpy as np
+from ..core.constants import RISK_LEVELS
+from ..features.vector import FEATURE_NAMES, FeatureBlock
+from .crop_health import crop_health_batch, crop_drivers
+from .soil_health import soil_health_batch, soil_drivers
+from .pest_cnn import pest_risk_batch, pest_drivers
+
+# Columnar scoring for many fields at once. Levels and confidences are
+# computed as whole-column NumPy operations; driver strings are only built
+# for the rows that actually get serialized (BatchScores.row).
+
+FEATURE_COLUMNS = FEATURE_NAMES
+MODELS = ("soil", "crop", "pest")
+
+def _column(data, name: str):
+    if hasattr(data, "columns"):  # pandas DataFrame
+        return data[name].to_numpy(dtype=np.float64, na_value=np.nan) if name in data.columns else None
+    if isinstance(data, np.ndarray):
+        return data[name].astype(np.float64, copy=False) if name in data.dtype.names else None
+    if name not in data:
+        return None
+    return np.array([np.nan if v is None else v for v in data[name]], dtype=np.float64)
+
+def feature_columns(data) -> Dict[str, np.ndarray]:
+    """Normalize a FeatureBlock, (n, F) float64 matrix in FEATURE_NAMES order,
+    pandas DataFrame, NumPy structured array or mapping of sequences into
+    {feature: float64 column}; absent features are all-NaN."""
+    if isinstance(data, FeatureBlock):
+        data = data.matrix
+    if isinstance(data, np.ndarray) and not data.dtype.names:
+        if data.ndim != 2 or data.shape[1] != len(FEATURE_COLUMNS):
+            raise TypeError(f"plain ndarrays must be (n, {len(FEATURE_COLUMNS)}) in FEATURE_NAMES order")
+        # Column views into the matrix, no copy
+        m = data.astype(np.float64, copy=False)
+        return {c: m[:, j] for j, c in enumerate(FEATURE_COLUMNS)}
+    if not (hasattr(data, "columns") or isinstance(data, (np.ndarray, Mapping))):
+        raise TypeError(f"unsupported feature container: {type(data).__name__}")
+    cols = {c: _column(data, c) for c in FEATURE_COLUMNS}
+    lengths = {len(v) for v in cols.values() if v is not None}
+    if len(lengths) > 1:
+        raise ValueError("feature columns must have equal length")
+    n = lengths.pop() if lengths else len(data) if not isinstance(data, Mapping) else 0
+    return {c: (np.full(n, np.nan) if v is None else v) for c, v in cols.items()}
+
+class BatchScores:
+    __slots__ = ("n", "cols", "level", "confidence")
+
+    def __init__(self, cols: Dict[str, np.ndarray]):
+        self.cols = cols
+        self.n = len(cols["ndvi"])
+        self.level: Dict[str, np.ndarray] = {}
+        self.confidence: Dict[str, np.ndarray] = {}
+        self.level["soil"], self.confidence["soil"] = soil_health_batch(cols["ndmi"], cols["rain_mm"])
+        self.level["crop"], self.confidence["crop"] = crop_health_batch(cols["ndvi"])
+        self.level["pest"], self.confidence["pest"] = pest_risk_batch(cols["rh2m_pct"], cols["t2m_c"], cols["img_pest_prob"])
+
+    def __len__(self):
+        return self.n
+
+    def levels(self, model: str) -> np.ndarray:
+        return np.asarray(RISK_LEVELS, dtype=object)[self.level[model]]
+
+    def row(self, i: int) -> Dict[str, Dict]:
+        # Full per-field result, identical to the per-dict infer_* functions
+        c = {k: float(v[i]) for k, v in self.cols.items()}
+        rain = 0.0 if np.isnan(c["rain_mm"]) else c["rain_mm"]
+        drivers = {
+            "soil": soil_drivers(int(self.level["soil"][i]), c["ndmi"], rain),
+            "crop": crop_drivers(int(self.level["crop"][i]), c["ndvi"]),
+            "pest": pest_drivers(c["rh2m_pct"], c["t2m_c"], c["img_pest_prob"]),
+        }
+        return {
+            m: {
+                "level": RISK_LEVELS[int(self.level[m][i])],
+                "drivers": drivers[m],
+                "confidence": float(self.confidence[m][i]),
+            }
+            for m in MODELS
+        }
+
+    def rows(self, indices=None) -> List[Dict[str, Dict]]:
+        return [self.row(i) for i in (range(self.n) if indices is None else indices)]
+
+    def to_frame(self):
+        # Levels and confidences only; drivers stay unbuilt
+        import pandas as pd
+        data = {}
+        for m in MODELS:
+            data[f"{m}_level"] = pd.Categorical.from_codes(self.level[m], RISK_LEVELS)
+            data[f"{m}_confidence"] = self.confidence[m]
+        return pd.DataFrame(data)
+
+def score_batch(data) -> BatchScores:
+    return BatchScores(feature_columns(data))
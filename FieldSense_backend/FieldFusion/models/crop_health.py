@@ -1,21 +1,34 @@
 from typing import Dict, List
-from ..core.constants import NDVI_STRESS_LOW, NDVI_STRESS_HIGH
+import numpy as np
+from ..core.constants import (
+    NDVI_STRESS_LOW, NDVI_STRESS_HIGH, RISK_LEVELS,
+    LEVEL_UNKNOWN, LEVEL_LOW, LEVEL_MEDIUM, LEVEL_HIGH,
+)
+
+# Confidence per level code (unknown, low, medium, high)
+_CONFIDENCE = np.array([0.3, 0.7, 0.6, 0.8])
+
+def crop_health_batch(ndvi: np.ndarray):
+    """Level codes (int8) and confidences for an NDVI column; NaN means no NDVI."""
+    level = np.select(
+        [np.isnan(ndvi), ndvi < NDVI_STRESS_LOW, ndvi < NDVI_STRESS_HIGH],
+        [LEVEL_UNKNOWN, LEVEL_HIGH, LEVEL_MEDIUM],
+        default=LEVEL_LOW,
+    ).astype(np.int8)
+    return level, _CONFIDENCE[level]
+
+def crop_drivers(level: int, ndvi: float) -> List[str]:
+    if level == LEVEL_UNKNOWN:
+        return ["no_ndvi"]
+    if level == LEVEL_HIGH:
+        return [f"low_ndvi={ndvi:.2f}<{NDVI_STRESS_LOW}"]
+    if level == LEVEL_MEDIUM:
+        return [f"moderate_ndvi={ndvi:.2f}"]
+    return [f"healthy_ndvi={ndvi:.2f}"]
 
 def infer_crop_health(fv: Dict) -> Dict:
     ndvi = fv.get("ndvi")
-    drivers: List[str] = []
-    if ndvi is None:
-        return {"level": "unknown", "drivers": ["no_ndvi"], "confidence": 0.3}
-    if ndvi < NDVI_STRESS_LOW:
-        level = "high"
-        drivers.append(f"low_ndvi={ndvi:.2f}<{NDVI_STRESS_LOW}")
-        conf = 0.8
-    elif ndvi < NDVI_STRESS_HIGH:
-        level = "medium"
-        drivers.append(f"moderate_ndvi={ndvi:.2f}")
-        conf = 0.6
-    else:
-        level = "low"
-        drivers.append(f"healthy_ndvi={ndvi:.2f}")
-        conf = 0.7
-    return {"level": level, "drivers": drivers, "confidence": conf}
+    ndvi = np.nan if ndvi is None else float(ndvi)
+    level, conf = crop_health_batch(np.array([ndvi]))
+    code = int(level[0])
+    return {"level": RISK_LEVELS[code], "drivers": crop_drivers(code, ndvi), "confidence": float(conf[0])}
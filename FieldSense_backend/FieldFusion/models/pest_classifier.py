@@ -0,0 +1,166 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from ..core.config import settings
+from ..core.executor import run_cpu
+from ..features.image import IMAGE_FEATURES
+
+# CPU pest classifier over the leaf photo feature vector (features/image.py).
+# Backends are pluggable: an ONNX Runtime session when the model path ends in
+# .onnx and onnxruntime is installed, otherwise a small NumPy MLP from an
+# .npz. Either way the model is loaded once and shared; concurrent requests
+# are grouped into micro-batches (up to pest_batch_max rows, waiting at most
+# pest_batch_wait_ms for the batch to fill) and run on the CPU executor.
+# No model is shipped: without pest_model_path, photos add no pest term.
+
+class NumpyMLP:
+    """Dense ReLU layers w0/b0..wN/bN with a sigmoid output, plus input mean/std."""
+    backend = "numpy"
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as w:
+            self.features = tuple(str(f) for f in w["features"])
+            self.mean = w["mean"].astype(np.float32)
+            self.std = w["std"].astype(np.float32)
+            n = sum(1 for k in w.files if k.startswith("w"))
+            self.layers = [(w[f"w{i}"].astype(np.float32), w[f"b{i}"].astype(np.float32)) for i in range(n)]
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        h = (x - self.mean) / self.std
+        for i, (w, b) in enumerate(self.layers):
+            h = h @ w + b
+            if i < len(self.layers) - 1:
+                np.maximum(h, 0.0, out=h)
+        return 1.0 / (1.0 + np.exp(-h[:, -1]))
+
+class OnnxModel:
+    """ONNX graph taking (N, F) float32 features and returning (N,) or (N, k) probabilities
+    (the last column is the pest class). Feature names come from the model's
+    `features` metadata entry (comma-separated), defaulting to IMAGE_FEATURES."""
+    backend = "onnx"
+
+    def __init__(self, path: str, intra_op_threads: int, inter_op_threads: int):
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = intra_op_threads
+        so.inter_op_num_threads = inter_op_threads
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        self.session = ort.InferenceSession(path, so, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0].name
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.features = tuple(meta["features"].split(",")) if meta.get("features") else IMAGE_FEATURES
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        out = np.asarray(self.session.run(None, {self.input: x})[0], dtype=np.float32)
+        return out.reshape(len(x), -1)[:, -1]
+
+def load_model(path: Optional[str] = None):
+    """The model at path (default settings.pest_model_path), or None when none is usable."""
+    path = path or settings.pest_model_path
+    if not path:
+        return None
+    if path.endswith(".onnx"):
+        try:
+            model = OnnxModel(path, settings.pest_intra_op_threads, settings.pest_inter_op_threads)
+        except ImportError:
+            print(f"onnxruntime not installed; pest image model {path} disabled")
+            return None
+    else:
+        model = NumpyMLP(path)
+    unknown = set(model.features) - set(IMAGE_FEATURES)
+    if unknown:
+        raise ValueError(f"pest model expects unknown features: {sorted(unknown)}")
+    return model
+
+class PestClassifier:
+    def __init__(self, model=None, max_batch: Optional[int] = None, max_wait_s: Optional[float] = None):
+        self._model = model
+        self._loaded = model is not None
+        self.max_batch = max_batch or settings.pest_batch_max
+        self.max_wait_s = settings.pest_batch_wait_ms / 1000.0 if max_wait_s is None else max_wait_s
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # running batches; the loop only keeps weak references
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def model(self):
+        if not self._loaded:
+            self._model, self._loaded = load_model(), True
+        return self._model
+
+    def load(self):
+        # Called at startup so the first request does not pay for it
+        return self.model
+
+    def _row(self, feats: Dict) -> np.ndarray:
+        return np.array([feats[name] for name in self.model.features], dtype=np.float32)
+
+    async def predict(self, feats: Dict) -> float:
+        """Pest probability for one image's feature dict, batched with concurrent callers."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._pending, self._timer, self._tasks = loop, [], None, set()
+        fut = loop.create_future()
+        self._pending.append((self._row(feats), fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if self._pending:
+            self._timer = self._loop.call_later(self.max_wait_s, self._flush)
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            probs = await run_cpu(self.model.predict, np.stack([row for row, _ in batch]))
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), p in zip(batch, probs):
+            if not fut.done():
+                fut.set_result(float(p))
+
+    def stats(self):
+        return {
+            "backend": self._model.backend if self._model is not None else None,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": (self.items / self.batches) if self.batches else None,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+        }
+
+_classifier: Optional[PestClassifier] = None
+
+def pest_classifier() -> PestClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = PestClassifier()
+    return _classifier
+
+def set_pest_classifier(classifier: Optional[PestClassifier]):
+    global _classifier
+    _classifier = classifier
+
+async def classify_image(img_feats: Optional[Dict]) -> Optional[float]:
+    clf = pest_classifier()
+    if img_feats is None or clf.model is None:
+        return None
+    return await clf.predict(img_feats)
@@ -1,21 +1,39 @@
 from typing import Dict, List
+import numpy as np
+from ..core.constants import IMG_PEST_PROB, RH_HIGH, RISK_LEVELS, LEVEL_LOW, LEVEL_MEDIUM, LEVEL_HIGH
 
-def infer_pest_risk(fv: Dict) -> Dict:
-    rh = fv.get("rh2m_pct")
-    t = fv.get("t2m_c")
-    img_bytes = fv.get("img_bytes")
+def pest_risk_batch(rh2m_pct: np.ndarray, t2m_c: np.ndarray, img_pest_prob: np.ndarray):
+    """Level codes (int8) and confidences; NaN inputs contribute no signal."""
+    humid = rh2m_pct > RH_HIGH
+    warm = (t2m_c >= 20) & (t2m_c <= 32)
+    # A photo only counts when the image classifier flags it, not merely for existing
+    image = img_pest_prob >= IMG_PEST_PROB
+    # Same accumulation order as the scalar rules so scores match bit for bit
+    base = np.full(rh2m_pct.shape, 0.2)
+    base += np.where(humid, 0.3, 0.0)
+    base += np.where(warm, 0.2, 0.0)
+    base += np.where(image, 0.2, 0.0)
+    level = np.select([base >= 0.8, base >= 0.6], [LEVEL_HIGH, LEVEL_MEDIUM], default=LEVEL_LOW).astype(np.int8)
+    return level, np.minimum(0.9, base)
+
+def pest_drivers(rh2m_pct: float, t2m_c: float, img_pest_prob: float) -> List[str]:
     drivers: List[str] = []
-    base = 0.2
-    if rh is not None and rh > 70: 
-        base += 0.3
-        drivers.append(f"high_humidity={rh:.0f}%")
-    if t is not None and 20 <= t <= 32:
-        base += 0.2
-        drivers.append(f"favorable_temp={t:.1f}C")
-    if img_bytes:
-        base += 0.2
-        drivers.append("image_signals_present")
-    level = "low"
-    if base >= 0.6: level = "medium"
-    if base >= 0.8: level = "high"
-    return {"level": level, "drivers": drivers or ["insufficient_signals"], "confidence": min(0.9, base)}
+    if rh2m_pct > RH_HIGH:
+        drivers.append(f"high_humidity={rh2m_pct:.0f}%")
+    if 20 <= t2m_c <= 32:
+        drivers.append(f"favorable_temp={t2m_c:.1f}C")
+    if img_pest_prob >= IMG_PEST_PROB:
+        drivers.append(f"image_pest_prob={img_pest_prob:.2f}")
+    return drivers or ["insufficient_signals"]
+
+def _f(v):
+    return np.nan if v is None else float(v)
+
+def infer_pest_risk(fv: Dict) -> Dict:
+    rh, t, img = _f(fv.get("rh2m_pct")), _f(fv.get("t2m_c")), _f(fv.get("img_pest_prob"))
+    level, conf = pest_risk_batch(np.array([rh]), np.array([t]), np.array([img]))
+    return {
+        "level": RISK_LEVELS[int(level[0])],
+        "drivers": pest_drivers(rh, t, img),
+        "confidence": float(conf[0]),
+    }
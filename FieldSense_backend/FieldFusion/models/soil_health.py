@@ -1,23 +1,38 @@
 from typing import Dict, List
-from ..core.constants import RAIN_RECENT_MM
+import numpy as np
+from ..core.constants import (
+    RAIN_RECENT_MM, RISK_LEVELS,
+    LEVEL_UNKNOWN, LEVEL_LOW, LEVEL_MEDIUM, LEVEL_HIGH,
+)
+
+# Confidence per level code (unknown, low, medium, high)
+_CONFIDENCE = np.array([0.3, 0.7, 0.6, 0.75])
+
+def soil_health_batch(ndmi: np.ndarray, rain_mm: np.ndarray):
+    """Level codes (int8) and confidences; NaN NDMI means unknown, NaN rain counts as 0 mm."""
+    rain = np.nan_to_num(rain_mm, nan=0.0)
+    # Simple heuristic: very low NDMI and low recent rain => dryness risk
+    level = np.select(
+        [np.isnan(ndmi), (ndmi < 0.1) & (rain < RAIN_RECENT_MM), ndmi < 0.25],
+        [LEVEL_UNKNOWN, LEVEL_HIGH, LEVEL_MEDIUM],
+        default=LEVEL_LOW,
+    ).astype(np.int8)
+    return level, _CONFIDENCE[level]
+
+def soil_drivers(level: int, ndmi: float, rain_mm: float) -> List[str]:
+    if level == LEVEL_UNKNOWN:
+        return ["no_ndmi"]
+    if level == LEVEL_HIGH:
+        rain = 0.0 if rain_mm != rain_mm else rain_mm
+        return [f"low_ndmi={ndmi:.2f}", f"low_rain={rain:.1f}mm"]
+    if level == LEVEL_MEDIUM:
+        return [f"moderate_ndmi={ndmi:.2f}"]
+    return [f"adequate_ndmi={ndmi:.2f}"]
 
 def infer_soil_health(fv: Dict) -> Dict:
     ndmi = fv.get("ndmi")
-    rain = fv.get("rain_mm") or 0.0
-    drivers: List[str] = []
-    if ndmi is None:
-        return {"level": "unknown", "drivers": ["no_ndmi"], "confidence": 0.3}
-    # Simple heuristic: very low NDMI and low recent rain => dryness risk
-    if ndmi < 0.1 and rain < RAIN_RECENT_MM:
-        level = "high"
-        drivers += [f"low_ndmi={ndmi:.2f}", f"low_rain={rain:.1f}mm"]
-        conf = 0.75
-    elif ndmi < 0.25:
-        level = "medium"
-        drivers += [f"moderate_ndmi={ndmi:.2f}"]
-        conf = 0.6
-    else:
-        level = "low"
-        drivers += [f"adequate_ndmi={ndmi:.2f}"]
-        conf = 0.7
-    return {"level": level, "drivers": drivers, "confidence": conf}
+    ndmi = np.nan if ndmi is None else float(ndmi)
+    rain = float(fv.get("rain_mm") or 0.0)
+    level, conf = soil_health_batch(np.array([ndmi]), np.array([rain]))
+    code = int(level[0])
+    return {"level": RISK_LEVELS[code], "drivers": soil_drivers(code, ndmi, rain), "confidence": float(conf[0])}
@@ -0,0 +1,36 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+from ..core.config import settings
+from ..core.http import queue_for_tokens
+from ..app.schemas import AnalyzeRequest, AnalyzeResponse
+from .run_analysis import analyze_aoi
+
+BatchItem = Tuple[int, Optional[AnalyzeResponse], Optional[str]]
+
+async def analyze_many(bodies: List[AnalyzeRequest]) -> AsyncIterator[BatchItem]:
+    """Analyse many AOIs, yielding (index, response, error) as each one finishes.
+
+    Provider work is shared through the single-flight layer and the caches:
+    one weather fetch per POWER grid cell and window, one Sentinel-2 fetch
+    per tile. At most settings.batch_concurrency fields are in flight at once,
+    and their provider requests queue for rate-limit tokens rather than
+    falling back.
+    """
+    sem = asyncio.Semaphore(settings.batch_concurrency)
+
+    async def one(i: int, body: AnalyzeRequest) -> BatchItem:
+        queue_for_tokens()
+        async with sem:
+            try:
+                resp = await analyze_aoi(body)
+            except Exception as e:
+                return i, None, f"{type(e).__name__}: {e}"
+            return i, resp, None
+
+    tasks = [asyncio.ensure_future(one(i, b)) for i, b in enumerate(bodies)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
@@ -0,0 +1,386 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+from ..core.http import providers, queue_for_tokens
+from ..features.indices import INDEX_NAMES, STACK_BANDS, index_stack
+from ..features.masks import SCL_CLOUDY, SCL_NO_DATA, apply_mask, scl_mask
+from ..features.vector import FeatureBlock
+from ..models.batch import MODELS, score_batch
+from ..providers.raster_cache import mosaic, pixel_deg, tile_cache, tiles_for_bbox
+from ..providers.satellite import TILE_BANDS, _fetch_tile, _tile_key
+from ..providers.weather import fetch_power_weather
+from ..providers.weather_cache import power_cache, snap_to_power_grid
+
+# Regional grid scan: indices, weather aggregates and the three risk levels
+# for every cell of a polygon. The grid is split into square chunks; each
+# chunk pulls the cached Sentinel-2 tiles it overlaps (fetched once per tile,
+# shared with neighbouring chunks), and a worker process mosaics them and
+# reduces pixels to cells in one pass. Weather is fetched once per POWER grid
+# cell. Each finished chunk is one .npy file next to a manifest describing
+# the grid, so an interrupted scan resumes by skipping chunks already on disk.
+
+GRID_LAYOUT_VERSION = 1
+WEATHER_FIELDS = ("t2m_c", "rh2m_pct", "rain_mm")
+GRID_DTYPE = np.dtype(
+    [(name, "<f4") for name in INDEX_NAMES]
+    + [("cloud_percent", "<f4")]
+    + [(name, "<f4") for name in WEATHER_FIELDS]
+    + [(f"{m}_level", "i1") for m in MODELS]
+)
+OUTSIDE = -1  # level code for cells outside the polygon
+
+Ring = List[Tuple[float, float]]  # outer ring as (lon, lat)
+
+def load_polygon(obj) -> Ring:
+    """Outer ring of a GeoJSON Polygon / Feature / FeatureCollection, or a bare ring."""
+    if isinstance(obj, dict):
+        if obj.get("type") == "FeatureCollection":
+            obj = obj["features"][0]
+        if obj.get("type") == "Feature":
+            obj = obj["geometry"]
+        if obj.get("type") != "Polygon":
+            raise ValueError(f"expected a Polygon, got {obj.get('type')}")
+        obj = obj["coordinates"][0]
+    ring = [(float(p[0]), float(p[1])) for p in obj]
+    if len(ring) < 3:
+        raise ValueError("polygon needs at least 3 vertices")
+    return ring
+
+def points_in_polygon(lon: np.ndarray, lat: np.ndarray, ring: Ring) -> np.ndarray:
+    # Even-odd ray casting, vectorized over points
+    inside = np.zeros(np.shape(lon), dtype=bool)
+    pts = np.asarray(ring, dtype=np.float64)
+    nxt = np.roll(pts, -1, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for (x0, y0), (x1, y1) in zip(pts, nxt):
+            if y0 == y1:
+                continue
+            x_at = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= ((y0 > lat) != (y1 > lat)) & (lon < x_at)
+    return inside
+
+@dataclass
+class GridSpec:
+    ring: Ring
+    cell_m: float
+    west: float
+    north: float
+    cell_deg: float
+    nx: int
+    ny: int
+    chunk: int
+    window: Tuple[str, str]
+    max_cloud_pct: int
+    weather_days: int
+    version: int = GRID_LAYOUT_VERSION
+
+    @classmethod
+    def create(cls, ring: Ring, cell_m: float, max_cloud_pct: int, weather_days: int, chunk: Optional[int] = None):
+        lons, lats = [p[0] for p in ring], [p[1] for p in ring]
+        cell_deg = cell_m / 111320.0
+        end = datetime.utcnow().date()
+        start = end - timedelta(days=settings.s2_lookback_days)
+        return cls(
+            ring=ring, cell_m=cell_m, west=min(lons), north=max(lats), cell_deg=cell_deg,
+            nx=max(1, math.ceil((max(lons) - min(lons)) / cell_deg)),
+            ny=max(1, math.ceil((max(lats) - min(lats)) / cell_deg)),
+            chunk=chunk or settings.grid_chunk_cells,
+            window=(start.isoformat(), end.isoformat()),
+            max_cloud_pct=max_cloud_pct, weather_days=weather_days,
+        )
+
+    @property
+    def chunks_shape(self) -> Tuple[int, int]:
+        return math.ceil(self.ny / self.chunk), math.ceil(self.nx / self.chunk)
+
+    def chunk_cells(self, cy: int, cx: int) -> Tuple[int, int, int, int]:
+        # (row0, col0, rows, cols) of a chunk; edge chunks are clipped to the grid
+        r0, c0 = cy * self.chunk, cx * self.chunk
+        return r0, c0, min(self.chunk, self.ny - r0), min(self.chunk, self.nx - c0)
+
+    def chunk_bbox(self, cy: int, cx: int) -> List[float]:
+        r0, c0, h, w = self.chunk_cells(cy, cx)
+        d = self.cell_deg
+        return [self.west + c0 * d, self.north - (r0 + h) * d, self.west + (c0 + w) * d, self.north - r0 * d]
+
+    def cell_centers(self, cy: int, cx: int) -> Tuple[np.ndarray, np.ndarray]:
+        # (lat, lon) of each cell centre, rows running north->south
+        r0, c0, h, w = self.chunk_cells(cy, cx)
+        lat = self.north - (r0 + np.arange(h) + 0.5) * self.cell_deg
+        lon = self.west + (c0 + np.arange(w) + 0.5) * self.cell_deg
+        return np.broadcast_to(lat[:, None], (h, w)), np.broadcast_to(lon[None, :], (h, w))
+
+    def inside(self, cy: int, cx: int) -> np.ndarray:
+        lat, lon = self.cell_centers(cy, cx)
+        return points_in_polygon(lon, lat, self.ring)
+
+def _manifest_path(out_dir: str) -> str:
+    return os.path.join(out_dir, "manifest.json")
+
+def chunk_path(out_dir: str, cy: int, cx: int) -> str:
+    return os.path.join(out_dir, "chunks", f"{cy}_{cx}.npy")
+
+def _write_json(path: str, obj):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+def read_manifest(out_dir: str) -> Optional[GridSpec]:
+    try:
+        with open(_manifest_path(out_dir)) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if meta.get("version") != GRID_LAYOUT_VERSION:
+        raise ValueError(f"grid layout v{meta.get('version')} is not v{GRID_LAYOUT_VERSION}")
+    meta.pop("complete", None)
+    meta["ring"] = [tuple(p) for p in meta["ring"]]
+    meta["window"] = tuple(meta["window"])
+    return GridSpec(**meta)
+
+def _write_manifest(out_dir: str, spec: GridSpec, complete: bool):
+    _write_json(_manifest_path(out_dir), {**asdict(spec), "complete": complete})
+
+def open_chunk(out_dir: str, cy: int, cx: int) -> Optional[np.ndarray]:
+    try:
+        return np.load(chunk_path(out_dir, cy, cx), mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+def load_grid(out_dir: str) -> np.ndarray:
+    """Assemble the (ny, nx) GRID_DTYPE array; cells in missing chunks read as outside."""
+    spec = read_manifest(out_dir)
+    if spec is None:
+        raise FileNotFoundError(_manifest_path(out_dir))
+    grid = _empty((spec.ny, spec.nx))
+    ncy, ncx = spec.chunks_shape
+    for cy in range(ncy):
+        for cx in range(ncx):
+            arr = open_chunk(out_dir, cy, cx)
+            if arr is not None:
+                r0, c0, h, w = spec.chunk_cells(cy, cx)
+                grid[r0:r0 + h, c0:c0 + w] = arr
+    return grid
+
+def _empty(shape) -> np.ndarray:
+    out = np.zeros(shape, dtype=GRID_DTYPE)
+    for name in GRID_DTYPE.names:
+        out[name] = OUTSIDE if name.endswith("_level") else np.nan
+    return out
+
+def _init_worker(tile_px: int, res_m: int):
+    # Spawned workers start from default settings; the tile grid must match the parent's
+    settings.s2_tile_px = tile_px
+    settings.s2_tile_res_m = res_m
+
+def reduce_chunk(tile_paths, bbox: List[float], shape: Tuple[int, int], max_cloud_pct: int):
+    """Per-cell index means (K, h, w) and cloud percent (h, w) for one chunk.
+
+    Reads the cached tiles memory-mapped, builds one mosaic over the chunk and
+    bins every pixel into its cell with np.bincount. Cells above
+    max_cloud_pct keep their cloud cover but no indices, as for point AOIs.
+    """
+    tiles = [(tile, np.load(path, mmap_mode="r")) for tile, path in tile_paths]
+    stack = mosaic(tiles, bbox, len(TILE_BANDS))
+    h, w = shape
+    n = h * w
+    p = pixel_deg()
+    rows, cols = stack.shape[1:]
+    lon = (math.floor(bbox[0] / p) + np.arange(cols) + 0.5) * p
+    lat = (math.ceil(bbox[3] / p) - np.arange(rows) - 0.5) * p
+    col = np.floor((lon - bbox[0]) / ((bbox[2] - bbox[0]) / w)).astype(np.int64)
+    row = np.floor((bbox[3] - lat) / ((bbox[3] - bbox[1]) / h)).astype(np.int64)
+    in_chunk = ((row >= 0) & (row < h))[:, None] & ((col >= 0) & (col < w))[None, :]
+    cell = (row[:, None] * w + col[None, :])[in_chunk]
+
+    scl = stack[-1]
+    codes = np.where(np.isfinite(scl), scl, SCL_NO_DATA).astype(np.uint8)[in_chunk]
+    with_data = np.bincount(cell, weights=codes != SCL_NO_DATA, minlength=n)
+    cloudy = np.bincount(cell, weights=np.isin(codes, SCL_CLOUDY), minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cloud = np.where(with_data > 0, 100.0 * cloudy / with_data, np.nan)
+
+    dropped, _ = scl_mask(scl)
+    indices = index_stack(apply_mask(stack[:len(STACK_BANDS)], dropped))
+    means = np.full((len(INDEX_NAMES), n), np.nan)
+    for k in range(len(INDEX_NAMES)):
+        v = indices[k][in_chunk]
+        ok = ~np.isnan(v)
+        sums = np.bincount(cell[ok], weights=v[ok], minlength=n)
+        counts = np.bincount(cell[ok], minlength=n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means[k] = np.where(counts > 0, sums / counts, np.nan)
+    means[:, ~(cloud <= max_cloud_pct)] = np.nan
+    return means.reshape(-1, h, w), cloud.reshape(h, w)
+
+def _chunk_records(spec: GridSpec, inside: np.ndarray, means, cloud, wx: Dict[str, np.ndarray]) -> np.ndarray:
+    h, w = inside.shape
+    block = FeatureBlock(h * w)
+    for k, name in enumerate(INDEX_NAMES):
+        block.column(name)[:] = means[k].ravel()
+    for name in WEATHER_FIELDS:
+        block.column(name)[:] = wx[name].ravel()
+    scores = score_batch(block)
+
+    out = _empty((h, w))
+    for name in INDEX_NAMES + WEATHER_FIELDS:
+        out[name] = block.column(name).reshape(h, w)
+    out["cloud_percent"] = cloud
+    for m in MODELS:
+        out[f"{m}_level"] = scores.level[m].reshape(h, w)
+    outside = ~inside
+    for name in GRID_DTYPE.names:
+        out[name][outside] = OUTSIDE if name.endswith("_level") else np.nan
+    return out
+
+def _write_chunk(out_dir: str, cy: int, cx: int, recs: np.ndarray):
+    path = chunk_path(out_dir, cy, cx)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, recs)
+    os.replace(tmp, path)
+
+async def scan_region(
+    out_dir: str,
+    ring: Optional[Ring] = None,
+    cell_m: Optional[float] = None,
+    max_cloud_pct: Optional[int] = None,
+    weather_days: int = 7,
+    workers: Optional[int] = None,
+) -> Dict[str, int]:
+    """Scan every cell of `ring` into out_dir, resuming a previous run there.
+
+    On resume the grid, acquisition window and thresholds come from the
+    manifest; arguments that disagree with it raise ValueError.
+    """
+    os.makedirs(os.path.join(out_dir, "chunks"), exist_ok=True)
+    spec = read_manifest(out_dir)
+    if spec is None:
+        if ring is None or cell_m is None:
+            raise ValueError("a new scan needs a polygon and a cell size")
+        mcc = settings.s2_max_cloud_pct if max_cloud_pct is None else max_cloud_pct
+        spec = GridSpec.create(ring, cell_m, mcc, weather_days)
+        _write_manifest(out_dir, spec, complete=False)
+    else:
+        if (
+            (ring is not None and [tuple(p) for p in ring] != spec.ring)
+            or (cell_m is not None and cell_m != spec.cell_m)
+            or (max_cloud_pct is not None and max_cloud_pct != spec.max_cloud_pct)
+        ):
+            raise ValueError(f"{out_dir} holds a different scan; use a new output directory")
+
+    ncy, ncx = spec.chunks_shape
+    todo = []
+    skipped = 0
+    for cy in range(ncy):
+        for cx in range(ncx):
+            if os.path.exists(chunk_path(out_dir, cy, cx)):
+                skipped += 1
+                continue
+            inside = spec.inside(cy, cx)
+            if inside.any():
+                todo.append((cy, cx, inside))
+
+    window = (date.fromisoformat(spec.window[0]), date.fromisoformat(spec.window[1]))
+    cache = tile_cache()
+    counts = {"chunks": ncy * ncx, "written": 0, "skipped": skipped, "failed": 0}
+    nproc = workers or settings.grid_workers
+    sem = asyncio.Semaphore(2 * nproc)  # fetch the next chunks while workers reduce
+
+    async def chunk_weather(cy, cx, inside):
+        lat, lon = spec.cell_centers(cy, cx)
+        keys = np.empty(inside.shape, dtype=object)
+        for r, c in zip(*np.nonzero(inside)):
+            keys[r, c] = snap_to_power_grid(float(lat[r, c]), float(lon[r, c]))
+        distinct = sorted({k for k in keys[inside]})
+        results = await asyncio.gather(
+            *[fetch_power_weather(k[0], k[1], spec.weather_days) for k in distinct], return_exceptions=True
+        )
+        # A failed POWER cell fails the chunk: written chunks are never revisited on resume
+        if any(isinstance(v, BaseException) or v.get("fallback") for v in results):
+            return None
+        by_key = dict(zip(distinct, results))
+        wx = {name: np.full(inside.shape, np.nan) for name in WEATHER_FIELDS}
+        for r, c in zip(*np.nonzero(inside)):
+            for name in WEATHER_FIELDS:
+                v = by_key[keys[r, c]].get(name)
+                if v is not None:
+                    wx[name][r, c] = v
+        return wx
+
+    async def one(pool, cy, cx, inside):
+        queue_for_tokens()  # a scan queues for rate-limit tokens instead of failing chunks
+        async with sem:
+            bbox = spec.chunk_bbox(cy, cx)
+            tiles = tiles_for_bbox(bbox)
+            arrays, wx = await asyncio.gather(
+                asyncio.gather(*[_fetch_tile(t, window, spec.max_cloud_pct) for t in tiles]),
+                chunk_weather(cy, cx, inside),
+            )
+            if wx is None or any(a is None for a in arrays):
+                counts["failed"] += 1  # left for the next run
+                return
+            paths = [(t, cache.path(_tile_key(t, window, spec.max_cloud_pct))) for t in tiles]
+            loop = asyncio.get_running_loop()
+            try:
+                means, cloud = await loop.run_in_executor(pool, reduce_chunk, paths, bbox, inside.shape, spec.max_cloud_pct)
+            except FileNotFoundError:
+                counts["failed"] += 1  # tile evicted between fetch and reduce
+                return
+            recs = _chunk_records(spec, inside, means, cloud, wx)
+            _write_chunk(out_dir, cy, cx, recs)
+            counts["written"] += 1
+
+    # spawn, not fork: the parent has an event loop and executor threads running
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(nproc, mp_context=ctx, initializer=_init_worker,
+                             initargs=(settings.s2_tile_px, settings.s2_tile_res_m)) as pool:
+        tasks = [asyncio.ensure_future(one(pool, cy, cx, inside)) for cy, cx, inside in todo]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+    _write_manifest(out_dir, spec, complete=counts["failed"] == 0)
+    return counts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Precompute FieldFusion risk layers over a polygon grid.")
+    ap.add_argument("out_dir", help="output directory; rerun with the same one to resume")
+    ap.add_argument("--polygon", help="GeoJSON file with the region polygon (new scans only)")
+    ap.add_argument("--cell-m", type=float, help="cell size in metres (new scans only)")
+    ap.add_argument("--max-cloud", type=int, default=None, help="max scene cloud cover percent")
+    ap.add_argument("--weather-days", type=int, default=7)
+    ap.add_argument("--workers", type=int, default=None, help="worker processes for the pixel reduction")
+    args = ap.parse_args(argv)
+
+    ring = None
+    if args.polygon:
+        with open(args.polygon) as f:
+            ring = load_polygon(json.load(f))
+
+    async def run():
+        await providers.open()
+        try:
+            return await scan_region(args.out_dir, ring, args.cell_m, args.max_cloud, args.weather_days, args.workers)
+        finally:
+            await providers.aclose()
+            power_cache.close()
+
+    counts = asyncio.run(run())
+    print(json.dumps(counts))
+    return 0 if counts["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy import Column, Float, String, Text, delete
+from database import Base, SessionLocal
+from ..core.config import settings
+from ..core.http import queue_for_tokens
+from ..app.schemas import AnalyzeRequest, AnalyzeResponse, JobStatus
+from .run_analysis import analyze_aoi
+
+# Background analyses for clients that cannot hold a request open for a
+# whole provider round trip. A submit returns a job id at once; a fixed set
+# of worker tasks drains a bounded queue through analyze_aoi. Queued and
+# running jobs live in memory (an identical request joins the existing job);
+# finished jobs are written to the app database and expire after jobs_ttl_s.
+
+TERMINAL = ("done", "failed")
+
+class JobRecord(Base):
+    __tablename__ = "fusion_jobs"
+
+    id = Column(String, primary_key=True)
+    request_key = Column(String, index=True, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+    expires_at = Column(Float, index=True, nullable=False)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+def request_key(body: AnalyzeRequest) -> str:
+    # notes do not change the analysis, so they do not split jobs
+    return hashlib.sha256(body.model_dump_json(exclude={"notes"}).encode()).hexdigest()
+
+class _Job:
+    __slots__ = ("id", "key", "body", "status", "created_at", "updated_at", "result", "error", "changed")
+
+    def __init__(self, key: str, body: AnalyzeRequest, now: float):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.body = body
+        self.status = "queued"
+        self.created_at = self.updated_at = now
+        self.result: Optional[AnalyzeResponse] = None
+        self.error: Optional[str] = None
+        self.changed = asyncio.Event()
+
+    def snapshot(self, coalesced: bool = False) -> JobStatus:
+        return JobStatus(
+            job_id=self.id, status=self.status, created_at=self.created_at, updated_at=self.updated_at,
+            coalesced=coalesced, result=self.result, error=self.error,
+        )
+
+class JobStore:
+    """Finished jobs in the app database (synchronous; call via a thread)."""
+
+    def __init__(self, session_factory=SessionLocal, ttl_s: Optional[float] = None, clock=time.time):
+        self._session = session_factory
+        self.ttl_s = settings.jobs_ttl_s if ttl_s is None else ttl_s
+        self._clock = clock
+
+    def ensure_table(self):
+        JobRecord.__table__.create(self._session.kw["bind"], checkfirst=True)
+
+    def save(self, job: _Job):
+        rec = JobRecord(
+            id=job.id, request_key=job.key, status=job.status,
+            created_at=job.created_at, updated_at=job.updated_at,
+            expires_at=job.updated_at + self.ttl_s,
+            result=job.result.model_dump_json() if job.result is not None else None,
+            error=job.error,
+        )
+        with self._session() as db:
+            db.merge(rec)
+            db.commit()
+
+    def load(self, job_id: str) -> Optional[JobStatus]:
+        with self._session() as db:
+            rec = db.get(JobRecord, job_id)
+            if rec is None or rec.expires_at <= self._clock():
+                return None
+            return JobStatus(
+                job_id=rec.id, status=rec.status, created_at=rec.created_at, updated_at=rec.updated_at,
+                result=AnalyzeResponse.model_validate_json(rec.result) if rec.result else None,
+                error=rec.error,
+            )
+
+    def purge(self) -> int:
+        with self._session() as db:
+            n = db.execute(delete(JobRecord).where(JobRecord.expires_at <= self._clock())).rowcount
+            db.commit()
+            return n
+
+class JobQueue:
+    def __init__(self, store: Optional[JobStore] = None, workers: Optional[int] = None,
+                 max_queued: Optional[int] = None, run=analyze_aoi, clock=time.time):
+        self.store = store or JobStore()
+        self.workers = workers or settings.jobs_workers
+        self.max_queued = max_queued or settings.jobs_max_queued
+        self._run = run
+        self._clock = clock
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._live: Dict[str, _Job] = {}
+        self._by_key: Dict[str, _Job] = {}
+        self.coalesced = 0
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        await asyncio.to_thread(self.store.ensure_table)
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self):
+        # Queued and running jobs are dropped; only finished jobs outlive the process
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._live.clear()
+        self._by_key.clear()
+
+    def _touch(self, job: _Job, status: str):
+        job.status = status
+        job.updated_at = self._clock()
+        changed, job.changed = job.changed, asyncio.Event()
+        changed.set()
+
+    async def submit(self, body: AnalyzeRequest) -> JobStatus:
+        """Queue an analysis; raises asyncio.QueueFull when the backlog is at max_queued."""
+        await self.start()
+        key = request_key(body)
+        job = self._by_key.get(key)
+        if job is not None:
+            self.coalesced += 1
+            return job.snapshot(coalesced=True)
+        job = _Job(key, body, self._clock())
+        self._queue.put_nowait(job)
+        self._live[job.id] = job
+        self._by_key[key] = job
+        return job.snapshot()
+
+    async def get(self, job_id: str) -> Optional[JobStatus]:
+        job = self._live.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        return await asyncio.to_thread(self.store.load, job_id)
+
+    async def watch(self, job_id: str, keepalive_s: Optional[float] = None) -> AsyncIterator[Optional[JobStatus]]:
+        """Yield the job's status on every change until it finishes; None marks a keepalive tick."""
+        job = self._live.get(job_id)
+        if job is None:
+            status = await asyncio.to_thread(self.store.load, job_id)
+            if status is not None:
+                yield status
+            return
+        keepalive_s = settings.jobs_sse_keepalive_s if keepalive_s is None else keepalive_s
+        while True:
+            changed = job.changed
+            yield job.snapshot()
+            if job.status in TERMINAL:
+                return
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive_s)
+                    break
+                except asyncio.TimeoutError:
+                    yield None
+
+    async def _worker(self):
+        queue_for_tokens()  # background work waits for rate-limit tokens
+        while True:
+            job = await self._queue.get()
+            self._touch(job, "running")
+            try:
+                job.result = await self._run(job.body)
+                status = "done"
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                status = "failed"
+            # Stop coalescing before the write so new submits start a fresh run
+            self._by_key.pop(job.key, None)
+            job.status, job.updated_at = status, self._clock()
+            try:
+                await asyncio.to_thread(self.store.save, job)
+            except Exception as e:
+                # Watchers still get the outcome; later GETs will not find the job
+                print(f"Job store write failed: {e}")
+            self._live.pop(job.id, None)
+            self._touch(job, status)
+            self._queue.task_done()
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(settings.jobs_purge_interval_s)
+            try:
+                await asyncio.to_thread(self.store.purge)
+            except Exception as e:
+                print(f"Job store purge failed: {e}")
+
+    def stats(self):
+        counts = {"queued": 0, "running": 0}
+        for job in self._live.values():
+            if job.status in counts:
+                counts[job.status] += 1
+        return {**counts, "workers": self.workers, "max_queued": self.max_queued, "coalesced": self.coalesced}
+
+_job_queue: Optional[JobQueue] = None
+
+def job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
+
+def set_job_queue(queue: Optional[JobQueue]):
+    global _job_queue
+    _job_queue = queue
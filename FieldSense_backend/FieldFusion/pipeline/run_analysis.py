@@ -5,17 +5,64 @@ from ..features.fusion import build_feature_vector
 from ..models.crop_health import infer_crop_health
 from ..models.soil_health import infer_soil_health
 from ..models.pest_cnn import infer_pest_risk
+from ..models.pest_classifier import classify_image
+from ..core.config import settings
+from ..core.metrics import degraded_responses, timed
 from ..app.schemas import AnalyzeRequest, AnalyzeResponse, IndicesSnapshot, WeatherSummary
+from .stages import Stage, run_stages
+
+def _provider_stages(body: AnalyzeRequest, user_image):
+    # Weather, satellite and image have no dependencies on each other and run concurrently;
+    # the image classifier waits only on the image stage.
+    return [
+        Stage(
+            "weather",
+            lambda: fetch_power_weather(body.lat, body.lon, body.include_forecast_days),
+            deadline_s=settings.weather_deadline_s,
+            fallback={"window_days": body.include_forecast_days},
+        ),
+        Stage(
+            "satellite",
+            lambda: fetch_s2_indices(body.lat, body.lon, body.aoi_radius_m, max_cloud_pct=settings.s2_max_cloud_pct),
+            deadline_s=settings.s2_deadline_s,
+            fallback={},
+        ),
+        Stage(
+            "image",
+            lambda: preprocess_user_image(user_image),
+            deadline_s=settings.image_deadline_s,
+            fallback=None,
+        ),
+        Stage(
+            "pest_image",
+            classify_image,
+            deadline_s=settings.image_deadline_s,
+            deps=("image",),
+            fallback=None,
+        ),
+    ]
 
 async def analyze_aoi(body: AnalyzeRequest, user_image=None) -> AnalyzeResponse:
-    wx = await fetch_power_weather(body.lat, body.lon, body.include_forecast_days)
-    s2 = await fetch_s2_indices(body.lat, body.lon, body.aoi_radius_m, max_cloud_pct=40)
-    img_feats = await preprocess_user_image(user_image)
-    fv = build_feature_vector(s2, wx, img_feats)
+    run = await run_stages(_provider_stages(body, user_image))
+    wx = run.results["weather"]
+    s2 = run.results["satellite"]
+    img_feats = run.results["image"]
+    if img_feats is not None and run.results["pest_image"] is not None:
+        img_feats = {**img_feats, "pest_prob": run.results["pest_image"]}
+    degraded = list(run.degraded)
+    if s2.get("fallback"):
+        degraded.append("satellite")
+    if wx.get("fallback"):
+        degraded.append("weather")
+    stale = [name for name, r in (("satellite", s2), ("weather", wx)) if r.get("stale")]
+    if degraded:
+        degraded_responses.inc()
 
-    soil = infer_soil_health(fv)
-    crop = infer_crop_health(fv)
-    pest = infer_pest_risk(fv)
+    with timed("models"):
+        fv = build_feature_vector(s2, wx, img_feats)
+        soil = infer_soil_health(fv)
+        crop = infer_crop_health(fv)
+        pest = infer_pest_risk(fv)
 
     indices = IndicesSnapshot(**s2)
     weather = WeatherSummary(
@@ -24,6 +71,12 @@ async def analyze_aoi(body: AnalyzeRequest, user_image=None) -> AnalyzeResponse:
         rain_mm=wx.get("rain_mm"),
         soil_moisture_proxy=fv.get("ndmi"),
         vpd_proxy=None,
+        gdd_c_days=wx.get("gdd_c_days"),
+        max_rain_3d_mm=wx.get("max_rain_3d_mm"),
+        hot_streak_days=wx.get("hot_streak_days"),
         window_days=wx.get("window_days", body.include_forecast_days),
     )
-    return AnalyzeResponse(indices=indices, weather=weather, soil=soil, crop=crop, pest=pest)
+    return AnalyzeResponse(
+        indices=indices, weather=weather, soil=soil, crop=crop, pest=pest,
+        degraded=sorted(set(degraded)), stale=stale,
+    )
@@ -0,0 +1,298 @@
+import hashlib
+import io
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+from .grid import OUTSIDE, GridSpec, load_grid, read_manifest
+
+# Web-mercator map tiles for the dashboard, rendered from the grid scans in
+# settings.grid_dir. Nothing here calls a provider: tiles are sampled from
+# the precomputed cell grids, PNG-encoded once and kept in a bounded
+# in-memory LRU keyed by the data version, so pan and zoom are served from
+# memory. ETags are content hashes, so a tile whose pixels did not change
+# across a rescan still answers conditional GETs with 304. Scan grids are
+# loaded on first use, per scan and within a byte budget; a scan that is
+# still being written only invalidates the tiles it overlaps.
+
+TILE_PX = 256
+TILE_LAYERS = {"ndvi": "ndvi", "crop": "crop_level", "soil": "soil_level", "pest": "pest_level"}
+
+# RGBA per risk level code: unknown, low, medium, high
+LEVEL_COLORS = np.array([
+    (158, 158, 158, 160),
+    (46, 160, 67, 170),
+    (255, 179, 0, 190),
+    (211, 47, 47, 200),
+], dtype=np.uint8)
+
+# NDVI colour ramp stops: bare soil -> dense canopy
+NDVI_STOPS = np.array([-0.2, 0.2, 0.5, 0.9])
+NDVI_COLORS = np.array([(166, 97, 26), (223, 194, 125), (166, 217, 106), (26, 150, 65)], dtype=np.float64)
+
+TileKey = Tuple[str, int, int, int]
+
+def tile_lonlat(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Pixel-centre lon (columns) and lat (rows) of a tile; mercator is separable
+    n = TILE_PX * 2 ** z
+    frac = (np.arange(TILE_PX) + 0.5) / n
+    lon = (x * TILE_PX / n + frac) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y * TILE_PX / n + frac)))))
+    return lon, lat
+
+def _colorize(layer: str, values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    if layer == "ndvi":
+        v = values[valid]
+        for ch in range(3):
+            rgba[..., ch][valid] = np.interp(v, NDVI_STOPS, NDVI_COLORS[:, ch]).astype(np.uint8)
+        rgba[..., 3][valid] = 190
+    else:
+        rgba[valid] = LEVEL_COLORS[values[valid].astype(np.intp)]
+    return rgba
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buf, format="PNG")
+    return buf.getvalue()
+
+def _etag(png: bytes) -> str:
+    return '"' + hashlib.blake2b(png, digest_size=12).hexdigest() + '"'
+
+_EMPTY: Optional[Tuple[str, bytes]] = None
+
+def _empty_tile() -> Tuple[str, bytes]:
+    # Fully transparent tile for areas no scan covers
+    global _EMPTY
+    if _EMPTY is None:
+        png = _encode_png(np.zeros((TILE_PX, TILE_PX, 4), dtype=np.uint8))
+        _EMPTY = (_etag(png), png)
+    return _EMPTY
+
+def _render(scans, layer: str, z: int, x: int, y: int) -> Optional[np.ndarray]:
+    field = TILE_LAYERS[layer]
+    lon, lat = tile_lonlat(z, x, y)
+    values = np.full((TILE_PX, TILE_PX), np.nan if layer == "ndvi" else OUTSIDE, dtype=np.float32)
+    drawn = False
+    for spec, grid in scans:
+        col = np.floor((lon - spec.west) / spec.cell_deg).astype(np.int64)
+        row = np.floor((spec.north - lat) / spec.cell_deg).astype(np.int64)
+        cols = (col >= 0) & (col < spec.nx)
+        rows = (row >= 0) & (row < spec.ny)
+        if not cols.any() or not rows.any():
+            continue
+        sampled = grid[field][np.ix_(row.clip(0, spec.ny - 1), col.clip(0, spec.nx - 1))]
+        hit = rows[:, None] & cols[None, :]
+        hit &= ~np.isnan(sampled) if layer == "ndvi" else sampled != OUTSIDE
+        values[hit] = sampled[hit]
+        drawn = drawn or bool(hit.any())
+    if not drawn:
+        return None
+    valid = ~np.isnan(values) if layer == "ndvi" else values != OUTSIDE
+    return _colorize(layer, values, valid)
+
+def _tile_lat(t: int, n: int) -> float:
+    # Latitude of the edge between tile rows t-1 and t at n tiles per side
+    return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * t / n))))
+
+def _tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    # (west, south, east, north) of a tile
+    n = 2 ** z
+    return x / n * 360.0 - 180.0, _tile_lat(y + 1, n), (x + 1) / n * 360.0 - 180.0, _tile_lat(y, n)
+
+def _scan_signature(d: str) -> Tuple[int, int]:
+    # Chunks are written with os.replace, which bumps the directory mtime; no per-file stat needed
+    chunks = os.path.join(d, "chunks")
+    chunks_mtime = os.stat(chunks).st_mtime_ns if os.path.isdir(chunks) else 0
+    return os.stat(os.path.join(d, "manifest.json")).st_mtime_ns, chunks_mtime
+
+class _Scan:
+    # One scan directory; its grid is loaded on first use and may be dropped under the byte budget
+    def __init__(self, path: str, signature: Tuple[int, int], spec: GridSpec):
+        self.path = path
+        self.signature = signature
+        self.spec = spec
+        self.version = hashlib.blake2b(repr((path, signature)).encode(), digest_size=8).hexdigest()
+        self.grid: Optional[np.ndarray] = None
+        self.load_lock = threading.Lock()
+
+    def overlaps(self, bounds: Tuple[float, float, float, float]) -> bool:
+        spec = self.spec
+        east = spec.west + spec.nx * spec.cell_deg
+        south = spec.north - spec.ny * spec.cell_deg
+        return bounds[0] < east and bounds[2] > spec.west and bounds[1] < spec.north and bounds[3] > south
+
+class RiskTiles:
+    def __init__(self, root: str, max_bytes: int, refresh_s: float, clock=time.monotonic,
+                 grids_max_bytes: int = settings.tiles_grids_max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.refresh_s = refresh_s
+        self.grids_max_bytes = grids_max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._scans: List[_Scan] = []  # oldest first, so the newest scan is drawn on top
+        self._loaded: "OrderedDict[str, _Scan]" = OrderedDict()  # scans holding a grid, LRU order
+        self._grid_bytes = 0
+        self._checked_at: Optional[float] = None
+        self._refreshing = False
+        # Tiles are keyed by the versions of the scans they overlap, so a rescan only
+        # invalidates its own tiles
+        self._tiles: "OrderedDict[Tuple[Tuple[str, ...], TileKey], Tuple[str, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.grid_loads = 0
+
+    def _scan_dirs(self):
+        try:
+            names = sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.root, n) for n in names if os.path.exists(os.path.join(self.root, n, "manifest.json"))]
+
+    def _refresh(self):
+        # At most one refresh per refresh_s, walked without the lock; only changed scans are replaced
+        with self._lock:
+            now = self._clock()
+            if self._refreshing or (self._checked_at is not None and now - self._checked_at < self.refresh_s):
+                return
+            self._checked_at = now
+            self._refreshing = True
+            current = {scan.path: scan for scan in self._scans}
+        try:
+            scans = []
+            for d in self._scan_dirs():
+                try:
+                    signature = _scan_signature(d)
+                except FileNotFoundError:
+                    continue  # removed mid-walk
+                old = current.get(d)
+                if old is not None and old.signature == signature:
+                    scans.append(old)
+                    continue
+                spec = read_manifest(d)
+                if spec is not None:
+                    scans.append(_Scan(d, signature, spec))
+            scans.sort(key=lambda scan: scan.signature[0])
+            with self._lock:
+                keep = {id(scan) for scan in scans}
+                for scan in self._scans:
+                    if id(scan) not in keep:
+                        self._unload(scan)
+                self._scans = scans
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _unload(self, scan: _Scan):
+        # Called with the lock held
+        if self._loaded.pop(scan.version, None) is not None:
+            self._grid_bytes -= scan.grid.nbytes
+        scan.grid = None
+
+    def _grid(self, scan: _Scan) -> np.ndarray:
+        grid = scan.grid
+        if grid is not None:
+            with self._lock:
+                if scan.version in self._loaded:
+                    self._loaded.move_to_end(scan.version)
+            return grid
+        with scan.load_lock:  # concurrent renders of one scan load it once
+            if scan.grid is None:
+                grid = load_grid(scan.path)
+                with self._lock:
+                    scan.grid = grid
+                    self._loaded[scan.version] = scan
+                    self._grid_bytes += grid.nbytes
+                    self.grid_loads += 1
+                    # Keep the grid just loaded even if it alone exceeds the budget
+                    while self._grid_bytes > self.grids_max_bytes and len(self._loaded) > 1:
+                        _, old = next(iter(self._loaded.items()))
+                        self._unload(old)
+            return scan.grid
+
+    def _key(self, layer: str, z: int, x: int, y: int):
+        bounds = _tile_bounds(z, x, y)
+        with self._lock:
+            scans = [scan for scan in self._scans if scan.overlaps(bounds)]
+        return (tuple(scan.version for scan in scans), (layer, z, x, y)), scans
+
+    def cached(self, layer: str, z: int, x: int, y: int) -> Optional[Tuple[str, bytes]]:
+        self._refresh()
+        key, _ = self._key(layer, z, x, y)
+        with self._lock:
+            hit = self._tiles.get(key)
+            if hit is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+            return hit
+
+    def render(self, layer: str, z: int, x: int, y: int) -> Tuple[str, bytes]:
+        """(etag, png) for a tile; CPU-bound, callers run it off the event loop."""
+        self._refresh()
+        key, scans = self._key(layer, z, x, y)
+        with self._lock:
+            hit = self._tiles.get(key)
+            if hit is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return hit
+            self.misses += 1
+        try:
+            layers = [(scan.spec, self._grid(scan)) for scan in scans]
+        except FileNotFoundError:
+            layers = []  # scan removed since the last refresh
+        rgba = _render(layers, layer, z, x, y) if layers else None
+        if rgba is None:
+            out = _empty_tile()
+        else:
+            png = _encode_png(rgba)
+            out = (_etag(png), png)
+        with self._lock:
+            self._bytes += len(out[1]) - len(self._tiles.pop(key, ("", b""))[1])
+            self._tiles[key] = out
+            while self._bytes > self.max_bytes and self._tiles:
+                _, (_, png) = self._tiles.popitem(last=False)
+                self._bytes -= len(png)
+                self.evictions += 1
+        return out
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "scans": len(self._scans),
+                "version": hashlib.blake2b(
+                    "".join(scan.version for scan in self._scans).encode(), digest_size=8
+                ).hexdigest(),
+                "tiles": len(self._tiles),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+                "grids_loaded": len(self._loaded),
+                "grid_bytes": self._grid_bytes,
+                "grids_max_bytes": self.grids_max_bytes,
+                "grid_loads": self.grid_loads,
+            }
+
+_risk_tiles: Optional[RiskTiles] = None
+
+def risk_tiles() -> RiskTiles:
+    global _risk_tiles
+    if _risk_tiles is None:
+        _risk_tiles = RiskTiles(settings.grid_dir, settings.tiles_cache_max_bytes, settings.tiles_refresh_s)
+    return _risk_tiles
+
+def set_risk_tiles(tiles: Optional[RiskTiles]):
+    global _risk_tiles
+    _risk_tiles = tiles
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+from ..features.indices import INDEX_NAMES
+from ..providers.satellite import _bbox_around_point, fetch_s2_acquisition, list_s2_acquisitions
+
+# Per-field index time series. Each field (AOI + cloud threshold) owns one
+# append-only file of fixed-width records that loads straight into a NumPy
+# structured array, so every column is a zero-copy view. A small sidecar
+# records the date range already scanned, so a request only fetches
+# acquisitions outside it (normally just the ones newer than the last run,
+# plus the last few days, which are re-checked for late-published products).
+
+STAT_FIELDS = ("mean", "median", "p10", "p25", "p75", "p90", "valid_fraction")
+LAYOUT_VERSION = 1
+SERIES_DTYPE = np.dtype(
+    [("day", "<i4"), ("cloud_percent", "<f4")]
+    + [(f"{name}_{stat}", "<f4") for name in INDEX_NAMES for stat in STAT_FIELDS]
+)
+
+def _encode(day: date, stats, cloud_percent) -> np.ndarray:
+    rec = np.zeros(1, dtype=SERIES_DTYPE)
+    for col in SERIES_DTYPE.names[1:]:
+        rec[col] = np.nan
+    rec["day"] = day.toordinal()
+    if cloud_percent is not None:
+        rec["cloud_percent"] = cloud_percent
+    for name in INDEX_NAMES:
+        s = (stats or {}).get(name)
+        if s:
+            for stat in STAT_FIELDS:
+                rec[f"{name}_{stat}"] = s[stat]
+    return rec
+
+def _decode(rec) -> dict:
+    cloud = float(rec["cloud_percent"])
+    indices = {}
+    for name in INDEX_NAMES:
+        vals = {stat: float(rec[f"{name}_{stat}"]) for stat in STAT_FIELDS}
+        indices[name] = None if np.isnan(vals["mean"]) else vals
+    return {
+        "date": date.fromordinal(int(rec["day"])).isoformat(),
+        "cloud_percent": None if np.isnan(cloud) else cloud,
+        "indices": indices,
+    }
+
+class SeriesStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def field_key(lat: float, lon: float, aoi_radius_m: int, max_cloud_pct: int) -> str:
+        return f"{lat:.5f}_{lon:.5f}_r{aoi_radius_m}_cc{max_cloud_pct}"
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, f"{key}.v{LAYOUT_VERSION}.{ext}")
+
+    def load(self, key: str) -> np.ndarray:
+        # Sorted by day; a day appended twice keeps its latest record
+        path = self._path(key, "bin")
+        if not os.path.exists(path):
+            return np.empty(0, dtype=SERIES_DTYPE)
+        recs = np.fromfile(path, dtype=SERIES_DTYPE)
+        _, last = np.unique(recs["day"][::-1], return_index=True)
+        return recs[len(recs) - 1 - last]
+
+    def append(self, key: str, recs: np.ndarray):
+        with self._lock, open(self._path(key, "bin"), "ab") as f:
+            recs.astype(SERIES_DTYPE, copy=False).tofile(f)
+
+    def coverage(self, key: str) -> Optional[Tuple[date, date]]:
+        try:
+            with open(self._path(key, "json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        return date.fromisoformat(meta["from"]), date.fromisoformat(meta["to"])
+
+    def set_coverage(self, key: str, start: date, end: date):
+        path = self._path(key, "json")
+        with self._lock:
+            with open(path + ".tmp", "w") as f:
+                json.dump({"from": start.isoformat(), "to": end.isoformat()}, f)
+            os.replace(path + ".tmp", path)
+
+def _gaps(start: date, end: date, covered: Optional[Tuple[date, date]]):
+    # Ranges to scan so the covered range stays contiguous after this request
+    if covered is None:
+        return [(start, end)]
+    c0, c1 = covered
+    gaps = []
+    if start < c0:
+        gaps.append((start, c0 - timedelta(days=1)))
+    if end > c1:
+        gaps.append((c1 + timedelta(days=1), end))
+    return gaps
+
+async def stream_timeseries(
+    lat: float, lon: float, aoi_radius_m: int, start: date, end: date, max_cloud_pct: int,
+) -> AsyncIterator[dict]:
+    """Yield one point per acquisition in [start, end].
+
+    Stored points come first, in date order; acquisitions not scanned before
+    are fetched with bounded concurrency, stored, and yielded as they finish.
+    """
+    store = series_store()
+    key = store.field_key(lat, lon, aoi_radius_m, max_cloud_pct)
+    end = min(end, datetime.utcnow().date())
+    if end < start:
+        return
+    lo, hi = start.toordinal(), end.toordinal()
+
+    stored = store.load(key)
+    for rec in stored[(stored["day"] >= lo) & (stored["day"] <= hi)]:
+        yield _decode(rec)
+
+    covered = store.coverage(key)
+    gaps = _gaps(start, end, covered)
+    if not gaps:
+        return
+    bbox = _bbox_around_point(lat, lon, aoi_radius_m)
+    known = set(stored["day"].tolist())
+    days = []
+    for g0, g1 in gaps:
+        days += [d for d in await list_s2_acquisitions(bbox, g0, g1, max_cloud_pct) if d.toordinal() not in known]
+
+    sem = asyncio.Semaphore(settings.timeseries_concurrency)
+
+    async def one(day):
+        async with sem:
+            return day, await fetch_s2_acquisition(lat, lon, aoi_radius_m, day, max_cloud_pct)
+
+    complete = True
+    tasks = [asyncio.ensure_future(one(d)) for d in days]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            day, result = await fut
+            if result is None:
+                complete = False
+                continue
+            rec = _encode(day, *result)
+            store.append(key, rec)
+            if lo <= day.toordinal() <= hi:
+                yield _decode(rec[0])
+    finally:
+        for t in tasks:
+            t.cancel()
+    # Only widen the scanned range once every acquisition in it is stored, and
+    # stop short of days whose products may not be published yet
+    if complete:
+        new_start = min(start, covered[0]) if covered else start
+        settled = datetime.utcnow().date() - timedelta(days=settings.timeseries_publish_lag_days)
+        new_end = max(min(end, settled), covered[1]) if covered else min(end, settled)
+        if new_start <= new_end:
+            store.set_coverage(key, new_start, new_end)
+
+_series_store: Optional[SeriesStore] = None
+
+def series_store() -> SeriesStore:
+    global _series_store
+    if _series_store is None:
+        _series_store = SeriesStore(settings.timeseries_dir)
+    return _series_store
+
+def set_series_store(store: Optional[SeriesStore]):
+    global _series_store
+    _series_store = store
@@ -1,9 +1,119 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Optional
+import numpy as np
 from fastapi import UploadFile
-from typing import Optional
+from ..core.config import settings
+from ..core.executor import run_cpu
+from ..features.image import IMAGE_FEATURES, image_features
+
+# Leaf photo preprocessing. The upload is never read into one bytes object:
+# Starlette spools it to disk, we hash it in chunks (enforcing the size
+# limit), and Pillow decodes straight from the file. JPEGs are decoded in
+# draft mode at 1/2..1/8 scale close to the model input size, so a 12 MP
+# phone photo never materialises at full resolution. All of it runs on the
+# CPU executor; results are cached by content hash.
+
+class ImageRejected(ValueError):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+def _digest(f: BinaryIO, max_bytes: int):
+    f.seek(0)
+    h = hashlib.blake2b(digest_size=16)
+    n = 0
+    for chunk in iter(lambda: f.read(1 << 16), b""):
+        n += len(chunk)
+        if n > max_bytes:
+            raise ImageRejected(413, f"Image larger than {max_bytes} bytes")
+        h.update(chunk)
+    if n == 0:
+        raise ImageRejected(400, "Empty image")
+    return h.hexdigest(), n
+
+def _decode(f: BinaryIO, size_px: int) -> np.ndarray:
+    from PIL import Image, UnidentifiedImageError
+    f.seek(0)
+    try:
+        im = Image.open(f)
+    except UnidentifiedImageError:
+        raise ImageRejected(415, "Unsupported image format")
+    except Image.DecompressionBombError:
+        # Pillow's own guard, for headers far past ours (it raises before we see the size)
+        raise ImageRejected(413, f"Image has more than {settings.image_max_pixels} pixels")
+    with im:
+        if im.width * im.height > settings.image_max_pixels:
+            raise ImageRejected(413, f"Image has more than {settings.image_max_pixels} pixels")
+        # JPEG only: pick the smallest DCT scale that still covers size_px
+        im.draft("RGB", (size_px, size_px))
+        try:
+            im = im.convert("RGB")
+        except OSError:
+            raise ImageRejected(415, "Corrupt image")
+        im.thumbnail((size_px, size_px), reducing_gap=2.0)
+        return np.asarray(im)
+
+class ImageFeatureCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return hit
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else None,
+            }
+
+image_cache = ImageFeatureCache(settings.image_cache_entries)
+
+def image_file_features(f: BinaryIO) -> Dict:
+    """Feature dict for an image file object; blocking, run it off the event loop."""
+    key, n = _digest(f, settings.image_max_bytes)
+    hit = image_cache.get(key)
+    if hit is not None:
+        return hit
+    rgb = _decode(f, settings.image_input_px)
+    vec = image_features(rgb)
+    out = {
+        "sha": key,
+        "bytes": n,
+        "input_shape": list(rgb.shape[:2]),
+        "vector": vec,
+        **{name: float(v) for name, v in zip(IMAGE_FEATURES, vec)},
+    }
+    image_cache.put(key, out)
+    return out
 
 async def preprocess_user_image(user_image: Optional[UploadFile]):
     if not user_image:
         return None
-    content = await user_image.read()
-    # TODO: decode, resize, normalize; return embedding or tensor
-    return {"bytes": len(content)}
+    if user_image.size is not None and user_image.size > settings.image_max_bytes:
+        raise ImageRejected(413, f"Image larger than {settings.image_max_bytes} bytes")
+    return await run_cpu(image_file_features, user_image.file)
@@ -0,0 +1,173 @@
+import math
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+
+# Disk cache of decoded Sentinel-2 rasters on a fixed lat/lon tile grid.
+# AOIs are snapped to the tiles they overlap and served by cropping cached
+# tiles, so nearby fields and repeat requests inside the same acquisition
+# window reuse one fetch. Tiles are stored as float32 (bands, rows, cols)
+# .npy and opened memory-mapped, so a crop only pages in the rows it touches.
+
+Bbox = List[float]  # [min_lon, min_lat, max_lon, max_lat]
+Tile = Tuple[int, int]
+
+def pixel_deg() -> float:
+    return settings.s2_tile_res_m / 111320.0
+
+def tile_deg() -> float:
+    return settings.s2_tile_px * pixel_deg()
+
+def tiles_for_bbox(bbox: Bbox) -> List[Tile]:
+    t = tile_deg()
+    x0, x1 = math.floor(bbox[0] / t), math.floor(bbox[2] / t)
+    y0, y1 = math.floor(bbox[1] / t), math.floor(bbox[3] / t)
+    return [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+def tile_bbox(tile: Tile) -> Bbox:
+    t = tile_deg()
+    x, y = tile
+    return [x * t, y * t, (x + 1) * t, (y + 1) * t]
+
+def mosaic(tiles, bbox: Bbox, n_bands: int) -> np.ndarray:
+    """Assemble the AOI from (tile, array) pairs into one (B, h, w) float32 array.
+
+    Tile arrays are (B, N, N) with rows running north->south as in the
+    GeoTIFF output; pixels not covered by any tile stay NaN.
+    """
+    p = pixel_deg()
+    n = settings.s2_tile_px
+    c0, c1 = math.floor(bbox[0] / p), math.ceil(bbox[2] / p)
+    g0, g1 = math.floor(bbox[1] / p), math.ceil(bbox[3] / p)  # global rows, south->north
+    out = np.full((n_bands, g1 - g0, c1 - c0), np.nan, dtype=np.float32)
+    for (x, y), arr in tiles:
+        ca, cb = max(c0, x * n), min(c1, (x + 1) * n)
+        ga, gb = max(g0, y * n), min(g1, (y + 1) * n)
+        if ca >= cb or ga >= gb:
+            continue
+        top = (y + 1) * n
+        out[:, g1 - gb:g1 - ga, ca - c0:cb - c0] = arr[:, top - gb:top - ga, ca - x * n:cb - x * n]
+    return out
+
+class RasterTileCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # key -> size, LRU order
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+        # Adopt tiles left by a previous process, oldest first
+        existing = []
+        for name in os.listdir(root):
+            if name.endswith(".npy"):
+                st = os.stat(os.path.join(root, name))
+                existing.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(existing):
+            self._files[key] = size
+            self._bytes += size
+        self._evict()
+
+    @staticmethod
+    def key(product: str, tile: Tile, window: Tuple[str, str]) -> str:
+        return f"{product}_{settings.s2_tile_res_m}m_{tile[0]}_{tile[1]}_{window[0]}_{window[1]}"
+
+    def latest(self, product: str, tile: Tile, min_end: str) -> Optional[Tuple[str, np.ndarray]]:
+        """Newest cached window for `tile` ending on or after `min_end` (ISO date), as (end, array)."""
+        prefix = f"{product}_{settings.s2_tile_res_m}m_{tile[0]}_{tile[1]}_"
+        with self._lock:
+            # keys end in _{start}_{end}; ISO dates sort as strings
+            ends = [(k.rsplit("_", 1)[1], k) for k in self._files if k.startswith(prefix)]
+        for end, key in sorted(ends, reverse=True):
+            if end < min_end:
+                break
+            arr = self.get(key)
+            if arr is not None:
+                return end, arr
+        return None
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            known = key in self._files
+            if known:
+                self._files.move_to_end(key)
+        if known:
+            try:
+                arr = np.load(self.path(key), mmap_mode="r")
+            except (OSError, ValueError):
+                arr = None
+                self._forget(key)
+            if arr is not None:
+                with self._lock:
+                    self.hits += 1
+                return arr
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, arr: np.ndarray):
+        path = self.path(key)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(arr, dtype=np.float32))
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._bytes += size - self._files.pop(key, 0)
+            self._files[key] = size
+        self._evict()
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._bytes -= self._files.pop(key, 0)
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if self._bytes <= self.max_bytes or not self._files:
+                    return
+                key, size = self._files.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tiles": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+                "tile_px": settings.s2_tile_px,
+                "res_m": settings.s2_tile_res_m,
+            }
+
+_tile_cache: Optional[RasterTileCache] = None
+
+def tile_cache() -> RasterTileCache:
+    # Created on first use so importing FieldFusion never touches the disk
+    global _tile_cache
+    if _tile_cache is None:
+        _tile_cache = RasterTileCache(settings.s2_tile_cache_dir, settings.s2_tile_cache_max_bytes)
+    return _tile_cache
+
+def set_tile_cache(cache: Optional[RasterTileCache]):
+    global _tile_cache
+    _tile_cache = cache
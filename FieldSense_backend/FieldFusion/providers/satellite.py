@@ -1,21 +1,39 @@
 from datetime import datetime, timedelta
+import asyncio
 import io
+import httpx
 import numpy as np
-import requests
+from ..core.config import settings
+from ..core.executor import run_cpu
+from ..core.http import providers
+from ..core.metrics import fallbacks, stale_served, timed
+from ..core.singleflight import flight
+from ..features.indices import INDEX_NAMES, STACK_BANDS, index_stack, index_stats
+from ..features.masks import apply_mask, scl_mask
+from .raster_cache import mosaic, tile_bbox, tile_cache, tiles_for_bbox
 
-# Simple NDVI via Copernicus Data Space "Process" API without OAuth,
-# using evalscript and PNG output; small bbox and 20m sampling to keep it quick.
+# Sentinel-2 reflectance stack (B03, B04, B08, B11) plus the SCL scene
+# classification via Copernicus Data Space "Process" API without OAuth, using
+# evalscript and FLOAT32 TIFF output. Requests are made per fixed-grid tile
+# (see raster_cache) so the decoded rasters can be reused across AOIs; cloud
+# masking and all indices are computed locally. While Copernicus is down (or
+# the circuit to it is open) AOIs are served from the newest cached window
+# of the same tiles, flagged "stale".
 
-def _evalscript_png():
+S2_PRODUCT = "b03-b04-b08-b11-scl"
+TILE_BANDS = STACK_BANDS + ("SCL",)
+
+def _evalscript():
+    # Output band order must match TILE_BANDS
     return """
     //VERSION=3
     function setup() {
-      return { input: [{bands:["B04","B08"], units: "REFLECTANCE"}],
-               output: { bands: 1, sampleType: "FLOAT32" } };
+      return { input: [{bands:["B03","B04","B08","B11","SCL"],
+                        units: ["REFLECTANCE","REFLECTANCE","REFLECTANCE","REFLECTANCE","DN"]}],
+               output: { bands: 5, sampleType: "FLOAT32" } };
     }
     function evaluatePixel(s) {
-      let ndvi = (s.B08 - s.B04) / (s.B08 + s.B04 + 1e-6);
-      return [ndvi];
+      return [s.B03, s.B04, s.B08, s.B11, s.SCL];
     }
     """
 
@@ -23,66 +41,185 @@ def _bbox_around_point(lat, lon, radius_m):
     size_deg = radius_m / 111320.0
     return [lon - size_deg, lat - size_deg, lon + size_deg, lat + size_deg]
 
-async def fetch_s2_indices(lat: float, lon: float, aoi_radius_m: int, max_cloud_pct: int):
-    bbox = _bbox_around_point(lat, lon, aoi_radius_m)
-    end = datetime.utcnow().date()
-    start = end - timedelta(days=20)
+def _fallback(end, reason):
+    # Stub NDVI used when remote processing or decoding fails; "fallback" marks it for analyze_aoi
+    fallbacks.inc("satellite", reason)
+    return {
+        "ndvi": 0.4, "gndvi": None, "ndwi": None, "ndmi": None, "savi": None,
+        "data_date": end.isoformat(), "cloud_percent": None, "fallback": reason,
+    }
 
-    body = {
-      "input": {
-        "bounds": {
-          "bbox": bbox,
-          "properties": { "crs": "http://www.opengis.net/def/crs/EPSG/0/4326" }
-        },
-        "data": [{
-          "type": "S2L2A",
-          "dataFilter": {
-            "timeRange": {
-              "from": start.isoformat() + "T00:00:00Z",
-              "to": end.isoformat() + "T23:59:59Z"
+def _clouded(end, cloud_percent):
+    # Scene too cloudy over the AOI: report the cover, leave the indices empty
+    return {
+        "ndvi": None, "gndvi": None, "ndwi": None, "ndmi": None, "savi": None,
+        "data_date": end.isoformat(), "cloud_percent": cloud_percent
+    }
+
+def _product(max_cloud_pct):
+    return f"{S2_PRODUCT}-cc{max_cloud_pct}"
+
+def _decode_tiff(content: bytes):
+    # CPU-bound: runs on the bounded executor, never on the event loop
+    try:
+        import tifffile as tiff
+    except Exception:
+        # it’s much easier to install tifffile than to hand-decode GeoTIFF
+        return None
+    arr = np.asarray(tiff.imread(io.BytesIO(content)), dtype=np.float32)
+    # Multi-band TIFFs decode pixel-interleaved (H, W, B); cache band-first (B, H, W)
+    if arr.ndim == 2:
+        arr = arr[np.newaxis]
+    elif arr.shape[-1] == len(TILE_BANDS) and arr.shape[0] != len(TILE_BANDS):
+        arr = np.ascontiguousarray(np.moveaxis(arr, -1, 0))
+    if arr.shape[0] != len(TILE_BANDS):
+        return None
+    return arr
+
+def _aoi_stats(tiles, bbox, max_cloud_pct):
+    # The cloud share comes from the SCL band alone, so a mostly-cloudy AOI
+    # returns before the reflectance bands are mosaicked or indexed.
+    scl = mosaic([(t, arr[-1:]) for t, arr in tiles], bbox, 1)[0]
+    dropped, cloud_percent = scl_mask(scl)
+    if cloud_percent is None or cloud_percent > max_cloud_pct:
+        return None, cloud_percent
+    n = len(STACK_BANDS)
+    reflectance = apply_mask(mosaic([(t, arr[:n]) for t, arr in tiles], bbox, n), dropped)
+    return index_stats(index_stack(reflectance)), cloud_percent
+
+def _process_body(bbox, start, end, size_px, max_cloud_pct):
+    return {
+        "input": {
+            "bounds": {
+                "bbox": bbox,
+                "properties": {"crs": "http://www.opengis.net/def/crs/EPSG/0/4326"}
             },
-            "mosaickingOrder": "leastCC"
-          }
-        }]
-      },
-      "output": {
-        "width": 128,
-        "height": 128,
-        "responses": [{ "identifier": "default", "format": { "type": "image/tiff" } }]
-      },
-      "evalscript": _evalscript_png()
+            "data": [{
+                "type": "S2L2A",
+                "dataFilter": {
+                    "timeRange": {
+                        "from": start.isoformat() + "T00:00:00Z",
+                        "to": end.isoformat() + "T23:59:59Z"
+                    },
+                    "maxCloudCoverage": max_cloud_pct,
+                    "mosaickingOrder": "leastCC"
+                }
+            }]
+        },
+        "output": {
+            "width": size_px,
+            "height": size_px,
+            "responses": [{"identifier": "default", "format": {"type": "image/tiff"}}]
+        },
+        "evalscript": _evalscript()
     }
 
-    url = "https://sh.dataspace.copernicus.eu/api/v1/process"
+def _tile_key(tile, window, max_cloud_pct):
+    return tile_cache().key(_product(max_cloud_pct), tile, window)
+
+def _fetch_tile(tile, window, max_cloud_pct):
+    # AOIs overlapping the same tile share one in-flight fetch
+    key = _tile_key(tile, window, max_cloud_pct)
+    return flight("s2_tile").do(key, lambda: _load_tile(key, tile, window, max_cloud_pct))
+
+async def _load_tile(key, tile, window, max_cloud_pct):
+    # One cached tile: served from disk when present, fetched and stored otherwise
+    cache = tile_cache()
+    arr = cache.get(key)
+    if arr is not None:
+        return arr
+    start, end = window
+    body = _process_body(tile_bbox(tile), start, end, settings.s2_tile_px, max_cloud_pct)
     # No OAuth; the endpoint allows anonymous processing for small requests
-    r = requests.post(url, json=body, timeout=60)
-    if r.status_code != 200:
-      # Fallback to stub if remote processing fails
-      ndvi = 0.4
-      return {
-        "ndvi": ndvi, "gndvi": None, "ndwi": None, "ndmi": None, "savi": None,
-        "data_date": end.isoformat(), "cloud_percent": None
-      }
-
-    # Decode tiny GeoTIFF as ndarray
     try:
-      import tifffile as tiff
-    except Exception:
-      # minimal decoder using numpy from buffer if tifffile missing
-      # but it’s much easier to install tifffile
-      ndvi = 0.4
-      return {
-        "ndvi": ndvi, "gndvi": None, "ndwi": None, "ndmi": None, "savi": None,
-        "data_date": end.isoformat(), "cloud_percent": None
-      }
-
-    arr = tiff.imread(io.BytesIO(r.content))
-    arr = np.array(arr, dtype=float)
-    if arr.size == 0 or np.all(~np.isfinite(arr)):
-      ndvi = 0.4
+        r = await providers.request("copernicus", "POST", settings.s2_process_url, json=body)
+    except httpx.HTTPError:
+        return None  # unreachable, timed out, or refused locally (circuit open / rate limited)
+    if r.status_code != 200:
+        return None
+    with timed("tiff_decode"):
+        arr = await run_cpu(_decode_tiff, r.content)
+    if arr is None:
+        return None
+    await run_cpu(cache.put, key, arr)
+    return arr
+
+async def _window_stats(bbox, window, max_cloud_pct):
+    # (stats, cloud_percent) for the AOI over one acquisition window; None when a tile failed
+    tiles = tiles_for_bbox(bbox)
+    arrays = await asyncio.gather(*[_fetch_tile(t, window, max_cloud_pct) for t in tiles])
+    if any(a is None for a in arrays):
+        return None
+    with timed("s2_reduce"):
+        return await run_cpu(_aoi_stats, list(zip(tiles, arrays)), bbox, max_cloud_pct)
+
+async def _stale_window_stats(bbox, end, max_cloud_pct):
+    # Newest cached window per tile, at most s2_stale_max_days old: ((stats, cloud_percent), date of the oldest)
+    tiles = tiles_for_bbox(bbox)
+    min_end = (end - timedelta(days=settings.s2_stale_max_days)).isoformat()
+    found = [tile_cache().latest(_product(max_cloud_pct), t, min_end) for t in tiles]
+    if any(f is None for f in found):
+        return None
+    with timed("s2_reduce"):
+        result = await run_cpu(_aoi_stats, [(t, arr) for t, (_, arr) in zip(tiles, found)], bbox, max_cloud_pct)
+    return result, datetime.strptime(min(e for e, _ in found), "%Y-%m-%d").date()
+
+async def fetch_s2_indices(lat: float, lon: float, aoi_radius_m: int, max_cloud_pct: int):
+    end = datetime.utcnow().date()
+    # ~1 m rounding: the same field asked for by many clients at once is computed once
+    key = (round(lat, 5), round(lon, 5), aoi_radius_m, max_cloud_pct, end)
+    return await flight("s2_aoi").do(key, lambda: _s2_indices(lat, lon, aoi_radius_m, max_cloud_pct, end))
+
+async def _s2_indices(lat, lon, aoi_radius_m, max_cloud_pct, end):
+    bbox = _bbox_around_point(lat, lon, aoi_radius_m)
+    start = end - timedelta(days=settings.s2_lookback_days)
+
+    result = await _window_stats(bbox, (start, end), max_cloud_pct)
+    data_date, stale = end, False
+    if result is None:
+        cached = await _stale_window_stats(bbox, end, max_cloud_pct)
+        if cached is None:
+            return _fallback(end, "tile_unavailable")
+        (result, data_date), stale = cached, True
+        stale_served.inc("satellite")
+    stats, cloud_percent = result
+    if stats is None:
+        out = _clouded(data_date, cloud_percent)
+    elif stats["ndvi"] is None:
+        return _fallback(end, "no_valid_pixels")
     else:
-      ndvi = float(np.nanmean(np.where(np.isfinite(arr), arr, np.nan)))
-    return {
-      "ndvi": ndvi, "gndvi": None, "ndwi": None, "ndmi": None, "savi": None,
-      "data_date": end.isoformat(), "cloud_percent": None
+        out = {name: (stats[name]["mean"] if stats[name] else None) for name in INDEX_NAMES}
+        out.update({"data_date": data_date.isoformat(), "cloud_percent": cloud_percent, "index_stats": stats})
+    if stale:
+        out["stale"] = True
+    return out
+
+async def list_s2_acquisitions(bbox, start, end, max_cloud_pct: int):
+    """Distinct S2 L2A acquisition dates over bbox in [start, end], via the Catalog (STAC) API."""
+    body = {
+        "bbox": bbox,
+        "datetime": f"{start.isoformat()}T00:00:00Z/{end.isoformat()}T23:59:59Z",
+        "collections": ["sentinel-2-l2a"],
+        "limit": 100,
+        "filter": f"eo:cloud_cover <= {max_cloud_pct}",
+        "filter-lang": "cql2-text",
+        "fields": {"include": ["properties.datetime"], "exclude": ["assets", "links", "geometry"]},
     }
+    days = set()
+    while True:
+        r = await providers.request("copernicus", "POST", settings.s2_catalog_url, json=body)
+        r.raise_for_status()
+        data = r.json()
+        for feat in data.get("features", []):
+            stamp = (feat.get("properties") or {}).get("datetime")
+            if stamp:
+                days.add(datetime.fromisoformat(stamp.replace("Z", "+00:00")).date())
+        nxt = (data.get("context") or {}).get("next")
+        if nxt is None:
+            return sorted(days)
+        body["next"] = nxt
+
+async def fetch_s2_acquisition(lat: float, lon: float, aoi_radius_m: int, day, max_cloud_pct: int):
+    """Index stats for the single acquisition on `day`: (stats or None, cloud_percent), None on failure."""
+    bbox = _bbox_around_point(lat, lon, aoi_radius_m)
+    return await _window_stats(bbox, (day, day), max_cloud_pct)
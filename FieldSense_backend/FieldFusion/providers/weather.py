@@ -1,66 +1,74 @@
 import httpx
-import numpy as np
 from ..core.config import settings
-from ..core.constants import POWER_PARS
+from ..core.constants import GDD_BASE_C, GDD_CAP_C, HOT_DAY_C, POWER_PARS, RAIN_WINDOW_DAYS
 from ..core.utils import date_range_for_power
+from ..core.http import providers
+from ..core.metrics import fallbacks, stale_served
+from ..core.singleflight import flight
+from ..features.weather_agg import (
+    day_rows_arrays, growing_degree_days, longest_run, nan_mean, nan_sum, rolling_sum,
+)
+from .weather_cache import power_cache, power_days, snap_to_power_grid
 
-def _safe_mean(values):
-    nums = []
-    for v in values or []:
-        try:
-            f = float(v)
-            if np.isfinite(f) and -60 <= f <= 60:
-                nums.append(f)
-        except Exception:
-            continue
-    return float(np.mean(nums)) if nums else None
-
-def _safe_mean_pct(values):
-    nums = []
-    for v in values or []:
-        try:
-            f = float(v)
-            if np.isfinite(f) and 0 <= f <= 100:
-                nums.append(f)
-        except Exception:
-            continue
-    return float(np.mean(nums)) if nums else None
-
-def _safe_sum(values):
-    nums = []
-    for v in values or []:
-        try:
-            f = float(v)
-            if np.isfinite(f) and f >= 0:
-                nums.append(f)
-        except Exception:
-            continue
-    return float(np.sum(nums)) if nums else None
-
-async def fetch_power_weather(lat: float, lon: float, days: int):
-    start, end = date_range_for_power(days)
+async def _fetch_power_days(lat: float, lon: float, start: str, end: str):
+    # start/end are POWER day keys (YYYYMMDD); returns {day: {par: value}}
     params = {
         "parameters": ",".join(POWER_PARS),
         "community": settings.community,
         "latitude": lat,
         "longitude": lon,
-        "start": start.replace("-", ""),
-        "end": end.replace("-", ""),
+        "start": start,
+        "end": end,
         "format": "JSON"
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(settings.nasa_power_base, params=params)
-        r.raise_for_status()
+    r = await providers.request("power", "GET", settings.nasa_power_base, params=params)
+    r.raise_for_status()
     data = r.json()
     p = data.get("properties", {}).get("parameter", {})
+    rows = {}
+    for par in POWER_PARS:
+        for day, v in (p.get(par) or {}).items():
+            rows.setdefault(day, {})[par] = v
+    return rows
+
+def _fallback(days: int, reason: str):
+    # POWER unavailable and nothing cached: empty summary, "fallback" marks it for analyze_aoi
+    fallbacks.inc("weather", reason)
+    return {"window_days": days, "fallback": reason}
+
+async def fetch_power_weather(lat: float, lon: float, days: int):
+    # Every field in the same POWER grid cell shares cached days, and
+    # concurrent requests for one cell and window share a single fetch.
+    start, end = date_range_for_power(days)
+    cell = snap_to_power_grid(lat, lon)
+    return await flight("power").do((cell, start, end), lambda: _power_weather(cell, start, end, days))
 
-    t2m_vals = list(p.get("T2M", {}).values()) if p.get("T2M") else []
-    rh2m_vals = list(p.get("RH2M", {}).values()) if p.get("RH2M") else []
-    rain_vals = list(p.get("PRECTOTCORR", {}).values()) if p.get("PRECTOTCORR") else []
+async def _power_weather(cell, start: str, end: str, days: int):
+    day_keys = power_days(start, end)
+    # Only the days not already cached (usually the newest tail) are fetched
+    rows = await power_cache.get_days(cell, POWER_PARS, day_keys)
+    missing = [d for d in day_keys if d not in rows]
+    stale = False
+    if missing:
+        try:
+            fetched = await _fetch_power_days(cell[0], cell[1], missing[0], missing[-1])
+        except httpx.HTTPError:
+            # POWER down, erroring or refused locally (circuit open / rate limited): serve expired days
+            old = await power_cache.stale_days(cell, POWER_PARS, missing)
+            if not rows and not old:
+                return _fallback(days, "power_unavailable")
+            rows.update(old)
+            stale = True
+            stale_served.inc("weather")
+        else:
+            await power_cache.put_days(cell, POWER_PARS, fetched)
+            rows.update(fetched)
 
-    t2m_c = _safe_mean(t2m_vals)
-    rh2m = _safe_mean_pct(rh2m_vals)
-    rain_mm = _safe_sum(rain_vals)
+    arr = day_rows_arrays(rows, day_keys, POWER_PARS)
+    t2m_c = nan_mean(arr["T2M"])
+    rh2m = nan_mean(arr["RH2M"])
+    rain_mm = nan_sum(arr["PRECTOTCORR"])
+    rain_3d = rolling_sum(arr["PRECTOTCORR"], RAIN_WINDOW_DAYS)
 
     soil_proxy = None
     if rain_mm is not None:
@@ -70,11 +78,17 @@ async def fetch_power_weather(lat: float, lon: float, days: int):
     if t2m_c is not None and rh2m is not None:
         vpd_proxy = max(0.0, min(1.0, (1 - rh2m / 100.0) * max(0.0, t2m_c) / 40.0))
 
-    return {
+    out = {
         "t2m_c": t2m_c,
         "rh2m_pct": rh2m,
         "rain_mm": rain_mm,
         "soil_moisture_proxy": soil_proxy,
         "vpd_proxy": vpd_proxy,
+        "gdd_c_days": growing_degree_days(arr["T2M_MAX"], arr["T2M_MIN"], GDD_BASE_C, GDD_CAP_C),
+        "max_rain_3d_mm": float(rain_3d.max()) if rain_3d.size and rain_mm is not None else None,
+        "hot_streak_days": longest_run(arr["T2M_MAX"] > HOT_DAY_C),
         "window_days": days
     }
+    if stale:
+        out["stale"] = True
+    return out
@@ -0,0 +1,187 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..core.config import settings
+from ..core.constants import POWER_FILL
+from ..core.executor import run_cpu
+
+# Per-day cache for NASA POWER responses. POWER daily data lives on a coarse
+# grid, so every field in the same cell shares one entry; entries hold
+# individual days, so overlapping windows only fetch the days they lack.
+# Memory tier is an LRU over (cell, parameter set); the optional SQLite tier
+# survives restarts and is shared across workers on the same host.
+
+Cell = Tuple[float, float]
+DayRow = Dict[str, float]
+
+def snap_to_power_grid(lat: float, lon: float) -> Cell:
+    dlat, dlon = settings.power_grid_lat_deg, settings.power_grid_lon_deg
+    return (round(round(lat / dlat) * dlat, 4), round(round(lon / dlon) * dlon, 4))
+
+def _day_ttl(day: str, row: DayRow, today) -> float:
+    # Fill values mean POWER has not published the day yet; recent days are
+    # near-real-time and still get revised; older days are final.
+    if any(v is None or float(v) == POWER_FILL for v in row.values()):
+        return settings.power_cache_missing_ttl_s
+    age_days = (today - datetime.strptime(day, "%Y%m%d").date()).days
+    if age_days <= settings.power_final_after_days:
+        return settings.power_cache_provisional_ttl_s
+    return settings.power_cache_final_ttl_s
+
+class _SqliteTier:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS power_days ("
+            " cell TEXT NOT NULL, pars TEXT NOT NULL, day TEXT NOT NULL,"
+            " vals TEXT NOT NULL, expires REAL NOT NULL,"
+            " PRIMARY KEY (cell, pars, day))"
+        )
+        self._conn.commit()
+
+    def get(self, cell: str, pars: str, days: List[str], now: float) -> Dict[str, Tuple[DayRow, float]]:
+        marks = ",".join("?" * len(days))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT day, vals, expires FROM power_days WHERE cell=? AND pars=? AND day IN ({marks}) AND expires>?",
+                (cell, pars, *days, now),
+            ).fetchall()
+        return {day: (json.loads(vals), expires) for day, vals, expires in rows}
+
+    def put(self, cell: str, pars: str, rows: Dict[str, Tuple[DayRow, float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO power_days (cell, pars, day, vals, expires) VALUES (?, ?, ?, ?, ?)",
+                [(cell, pars, day, json.dumps(vals), exp) for day, (vals, exp) in rows.items()],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class PowerDayCache:
+    def __init__(self, max_entries: int, sqlite_path: Optional[str] = None, clock=time.time,
+                 stale_s: float = settings.power_cache_stale_s):
+        self.max_entries = max_entries
+        self.stale_s = stale_s  # expired days are kept this long for stale_days()
+        self._clock = clock
+        self._mem: "OrderedDict[Tuple[str, str], Dict[str, Tuple[DayRow, float]]]" = OrderedDict()
+        self._disk = _SqliteTier(sqlite_path) if sqlite_path else None
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.days_reused = 0
+        self.days_fetched = 0
+        self.stale_hits = 0
+
+    @staticmethod
+    def _key(cell: Cell, pars: Iterable[str]) -> Tuple[str, str]:
+        return (f"{cell[0]:.4f},{cell[1]:.4f}", ",".join(sorted(pars)))
+
+    async def get_days(self, cell: Cell, pars: Iterable[str], days: List[str]) -> Dict[str, DayRow]:
+        key = self._key(cell, pars)
+        now = self._clock()
+        entry = self._mem.get(key)
+        found: Dict[str, DayRow] = {}
+        if entry is not None:
+            self._mem.move_to_end(key)
+            for d in days:
+                hit = entry.get(d)
+                if hit is not None and hit[1] > now:
+                    found[d] = hit[0]
+        if self._disk is not None and len(found) < len(days):
+            lacking = [d for d in days if d not in found]
+            on_disk = await run_cpu(self._disk.get, key[0], key[1], lacking, now)
+            if on_disk:
+                self.disk_hits += 1
+                self._store(key, on_disk)
+                found.update({d: row for d, (row, _) in on_disk.items()})
+
+        if len(found) == len(days):
+            self.hits += 1
+        elif found:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+        self.days_reused += len(found)
+        return found
+
+    async def stale_days(self, cell: Cell, pars: Iterable[str], days: List[str]) -> Dict[str, DayRow]:
+        # Cached days regardless of TTL (within stale_s), for when POWER can't be reached
+        key = self._key(cell, pars)
+        oldest = self._clock() - self.stale_s
+        entry = self._mem.get(key) or {}
+        found: Dict[str, DayRow] = {}
+        for d in days:
+            hit = entry.get(d)
+            if hit is not None and hit[1] > oldest:
+                found[d] = hit[0]
+        if self._disk is not None and len(found) < len(days):
+            lacking = [d for d in days if d not in found]
+            on_disk = await run_cpu(self._disk.get, key[0], key[1], lacking, oldest)
+            found.update({d: row for d, (row, _) in on_disk.items()})
+        if found:
+            self.stale_hits += 1
+        return found
+
+    async def put_days(self, cell: Cell, pars: Iterable[str], rows: Dict[str, DayRow]):
+        if not rows:
+            return
+        key = self._key(cell, pars)
+        now = self._clock()
+        today = datetime.utcfromtimestamp(now).date()
+        stamped = {d: (row, now + _day_ttl(d, row, today)) for d, row in rows.items()}
+        self.days_fetched += len(rows)
+        self._store(key, stamped)
+        if self._disk is not None:
+            await run_cpu(self._disk.put, key[0], key[1], stamped)
+
+    def _store(self, key, stamped: Dict[str, Tuple[DayRow, float]]):
+        entry = self._mem.setdefault(key, {})
+        entry.update(stamped)
+        self._mem.move_to_end(key)
+        # Drop days expired for longer than stale_s so long-lived cells don't grow without bound
+        oldest = self._clock() - self.stale_s
+        for d in [d for d, (_, exp) in entry.items() if exp <= oldest]:
+            del entry[d]
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "entries": len(self._mem),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_ratio": (self.hits / lookups) if lookups else None,
+            "days_reused": self.days_reused,
+            "days_fetched": self.days_fetched,
+            "stale_hits": self.stale_hits,
+            "disk_tier": self._disk is not None,
+        }
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+
+def power_days(start: str, end: str) -> List[str]:
+    # Inclusive ISO date range -> POWER's YYYYMMDD day keys
+    d0 = datetime.strptime(start, "%Y-%m-%d").date()
+    d1 = datetime.strptime(end, "%Y-%m-%d").date()
+    return [(d0 + timedelta(days=i)).strftime("%Y%m%d") for i in range((d1 - d0).days + 1)]
+
+power_cache = PowerDayCache(
+    max_entries=settings.power_cache_max_entries,
+    sqlite_path=settings.power_cache_sqlite or None,
+)
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from FieldFusion.app.router import router
+from FieldFusion.core.http import providers
+from FieldFusion.providers import weather
+from FieldFusion.providers.weather_cache import PowerDayCache
+
+
+def test_batch_streams_ndjson_and_dedupes_provider_work(monkeypatch, s2_tiff, power_handler, copernicus_handler):
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64))
+    power_calls, s2_calls = [], []
+    app = FastAPI()
+    app.include_router(router)
+    # 40 fields scattered inside one ~250 m patch: one POWER cell, a handful of tiles
+    fields = [{"lat": 18.5204 + (i % 5) * 0.0005, "lon": 73.8567 + (i // 5) * 0.0005, "aoi_radius_m": 100}
+              for i in range(40)]
+
+    async def main():
+        providers.set_client("power", httpx.AsyncClient(transport=httpx.MockTransport(power_handler(power_calls))))
+        providers.set_client("copernicus", httpx.AsyncClient(transport=httpx.MockTransport(copernicus_handler(s2_calls, s2_tiff(0.45)))))
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                r = await client.post("/fusion/analyze-batch", json=fields)
+        finally:
+            await providers.aclose()
+        return r
+
+    r = asyncio.run(main())
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert sorted(row["index"] for row in rows) == list(range(40))
+    assert all(row["result"]["indices"]["ndvi"] == pytest.approx(0.45, abs=1e-5) for row in rows)
+    assert len(power_calls) == 1
+    assert len(s2_calls) <= 4
+
+
+def test_batch_rejects_oversized(monkeypatch):
+    from FieldFusion.core.config import settings
+    monkeypatch.setattr(settings, "batch_max_items", 2)
+    app = FastAPI()
+    app.include_router(router)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/fusion/analyze-batch", json=[{"lat": 1, "lon": 1}] * 3)
+    assert asyncio.run(main()).status_code == 413
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from FieldFusion.models.batch import score_batch
+from FieldFusion.models.crop_health import infer_crop_health
+from FieldFusion.models.pest_cnn import infer_pest_risk
+from FieldFusion.models.soil_health import infer_soil_health
+
+FIELDS = [
+    {"ndvi": 0.2, "ndmi": 0.05, "rain_mm": 3.0, "rh2m_pct": 85.0, "t2m_c": 27.0, "img_pest_prob": 0.8},
+    {"ndvi": 0.45, "ndmi": 0.2, "rain_mm": None, "rh2m_pct": 50.0, "t2m_c": 35.0},
+    {"ndvi": 0.8, "ndmi": 0.4, "rain_mm": 40.0, "rh2m_pct": 72.0, "t2m_c": 21.5},
+    {"ndvi": None, "ndmi": None, "rain_mm": None, "rh2m_pct": None, "t2m_c": None},
+]
+
+
+def test_scalar_wrappers_keep_rule_outputs():
+    assert infer_crop_health(FIELDS[0]) == {"level": "high", "drivers": ["low_ndvi=0.20<0.3"], "confidence": 0.8}
+    assert infer_soil_health(FIELDS[0]) == {
+        "level": "high", "drivers": ["low_ndmi=0.05", "low_rain=3.0mm"], "confidence": 0.75,
+    }
+    pest = infer_pest_risk(FIELDS[0])
+    assert pest["level"] == "high" and pest["confidence"] == pytest.approx(0.9)
+    assert pest["drivers"] == ["high_humidity=85%", "favorable_temp=27.0C", "image_pest_prob=0.80"]
+    assert infer_crop_health(FIELDS[3])["level"] == "unknown"
+    assert infer_pest_risk(FIELDS[3]) == {"level": "low", "drivers": ["insufficient_signals"], "confidence": 0.2}
+
+
+def test_frame_batch_matches_per_dict_functions():
+    frame = pd.DataFrame(FIELDS)
+    scores = score_batch(frame)
+    assert len(scores) == 4
+    for i, fv in enumerate(FIELDS):
+        row = scores.row(i)
+        assert row["soil"] == infer_soil_health(fv)
+        assert row["crop"] == infer_crop_health(fv)
+        assert row["pest"] == infer_pest_risk(fv)
+    out = scores.to_frame()
+    assert list(out["crop_level"]) == ["high", "medium", "low", "unknown"]
+
+
+def test_structured_array_input():
+    arr = np.zeros(3, dtype=[("ndvi", "f4"), ("rh2m_pct", "f8")])
+    arr["ndvi"] = [0.1, 0.5, 0.9]
+    arr["rh2m_pct"] = [90, 10, 75]
+    scores = score_batch(arr)
+    assert scores.levels("crop").tolist() == ["high", "medium", "low"]
+    assert scores.levels("soil").tolist() == ["unknown"] * 3
@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+import httpx
+import numpy as np
+import pytest
+
+from FieldFusion.core.config import settings
+from FieldFusion.core.http import providers
+from FieldFusion.pipeline import grid
+from FieldFusion.providers import weather
+from FieldFusion.providers.raster_cache import tiles_for_bbox
+from FieldFusion.providers.weather_cache import PowerDayCache
+
+# ~2 km triangle; 200 m cells in 4x4-cell chunks
+RING = [(73.80, 18.50), (73.82, 18.50), (73.80, 18.52)]
+
+
+def test_points_in_polygon():
+    lon = np.array([73.805, 73.818, 73.81])
+    lat = np.array([18.505, 18.518, 18.499])
+    assert grid.points_in_polygon(lon, lat, RING).tolist() == [True, False, False]
+
+
+def test_scan_writes_chunks_and_resumes(tmp_path, monkeypatch, s2_tiff, power_handler, copernicus_handler):
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64))
+    monkeypatch.setattr(settings, "grid_chunk_cells", 4)
+    power_calls, s2_calls = [], []
+    out = str(tmp_path / "scan")
+
+    async def run(power=None, **kw):
+        power = power or power_handler(power_calls)
+        providers.set_client("power", httpx.AsyncClient(transport=httpx.MockTransport(power)))
+        providers.set_client("copernicus", httpx.AsyncClient(transport=httpx.MockTransport(copernicus_handler(s2_calls, s2_tiff(0.6)))))
+        try:
+            return await grid.scan_region(out, workers=1, **kw)
+        finally:
+            await providers.aclose()
+
+    counts = asyncio.run(run(ring=RING, cell_m=200))
+    spec = grid.read_manifest(out)
+    assert counts["failed"] == 0 and counts["written"] > 1
+    # One fetch per raster tile and per POWER cell, however many chunks overlap them
+    ncy, ncx = spec.chunks_shape
+    tiles = {t for cy in range(ncy) for cx in range(ncx) if spec.inside(cy, cx).any()
+             for t in tiles_for_bbox(spec.chunk_bbox(cy, cx))}
+    assert len(s2_calls) == len(tiles) < counts["written"]
+    assert len(power_calls) == 1
+
+    g = grid.load_grid(out)
+    inside = g["crop_level"] != grid.OUTSIDE
+    assert inside[-2, 0] and not inside[0, -1]
+    assert np.allclose(g["ndvi"][inside], 0.6, atol=1e-4)
+    assert np.all(np.isnan(g["ndvi"][~inside]))
+    assert np.all(g["t2m_c"][inside] == 26.0)
+
+    os.remove(grid.chunk_path(out, 0, 0))
+    again = asyncio.run(run())
+    assert again["written"] == 1 and again["skipped"] == counts["written"] - 1
+    np.testing.assert_array_equal(grid.load_grid(out)["crop_level"], g["crop_level"])
+
+    # POWER down with nothing cached: the chunk fails and is retried by the next run
+    os.remove(grid.chunk_path(out, 0, 0))
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64))
+    monkeypatch.setattr(settings, "http_backoff_base_s", 0.001)
+    failed = asyncio.run(run(power=lambda request: httpx.Response(503)))
+    assert failed["failed"] == 1 and failed["written"] == 0
+    assert not os.path.exists(grid.chunk_path(out, 0, 0))
+    providers.reset_guards()
+    retried = asyncio.run(run())
+    assert retried["written"] == 1 and retried["failed"] == 0
+    assert np.all(grid.load_grid(out)["t2m_c"][inside] == 26.0)
+    with pytest.raises(ValueError):
+        asyncio.run(run(cell_m=100))
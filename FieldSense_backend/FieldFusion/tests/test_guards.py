@@ -0,0 +1,176 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from FieldFusion.app.schemas import AnalyzeRequest
+from FieldFusion.core import metrics
+from FieldFusion.core.config import settings
+from FieldFusion.core.guards import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, TokenBucket
+from FieldFusion.core.http import ProviderClients, ProviderSpec, ProviderUnavailable, providers
+from FieldFusion.pipeline.batch import analyze_many
+from FieldFusion.pipeline.run_analysis import analyze_aoi
+from FieldFusion.providers import weather
+from FieldFusion.providers.raster_cache import tile_cache, tiles_for_bbox
+from FieldFusion.providers.satellite import _bbox_around_point, _decode_tiff, _tile_key
+from FieldFusion.providers.weather_cache import PowerDayCache
+
+
+def test_token_bucket_and_breaker_states():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_s=2.0, burst=2, clock=lambda: now[0])
+    assert bucket.reserve(0.0) == 0.0 and bucket.reserve(0.0) == 0.0
+    assert bucket.reserve(0.1) is None  # next token is 0.5 s away
+    assert bucket.reserve(1.0) == pytest.approx(0.5)
+    assert bucket.reserve(1.0) == pytest.approx(1.0)  # queued behind the first waiter
+    now[0] = 10.0
+    assert bucket.reserve(0.0) == 0.0
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_s=30.0, clock=lambda: now[0])
+    breaker.failure()
+    breaker.failure()
+    breaker.success()  # consecutive failures only
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.retry_after_s() == pytest.approx(30.0)
+    now[0] += 30.0
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()  # one probe at a time
+    breaker.failure()
+    assert breaker.state == OPEN
+    now[0] += 30.0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.stats()["opened"] == 2
+
+
+def test_open_circuit_fails_fast_without_calling_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "http_backoff_base_s", 0.001)
+    monkeypatch.setattr(settings, "http_rate_max_wait_s", 0.0)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    now = [0.0]
+    reg = ProviderClients(specs={"up": ProviderSpec(timeout_s=5, rate_per_s=1.0, burst=100)})
+    reg.set_client("up", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    reg._breakers["up"] = CircuitBreaker(failure_threshold=4, reset_s=30.0, clock=lambda: now[0])
+
+    async def main():
+        r = await reg.request("up", "GET", "http://upstream.test/")  # 3 attempts, all 503
+        assert r.status_code == 503
+        with pytest.raises(ProviderUnavailable) as err:
+            await reg.request("up", "GET", "http://upstream.test/")  # 4th failure trips it mid-retry
+        assert err.value.reason == "circuit_open"
+        n = len(calls)
+        with pytest.raises(ProviderUnavailable):
+            await reg.request("up", "GET", "http://upstream.test/")
+        assert len(calls) == n
+        now[0] += 30.0  # half-open: one probe goes through
+        with pytest.raises(ProviderUnavailable):
+            await reg.request("up", "GET", "http://upstream.test/")
+        assert len(calls) == n + 1
+
+    asyncio.run(main())
+    stats = reg.stats()["up"]
+    assert stats["circuit"]["state"] == OPEN and stats["circuit_rejected"] == 3
+
+
+def test_rate_limit_refuses_past_max_wait(monkeypatch):
+    monkeypatch.setattr(settings, "http_rate_max_wait_s", 0.0)
+    reg = ProviderClients(specs={"up": ProviderSpec(timeout_s=5, rate_per_s=0.5, burst=2)})
+    reg.set_client("up", httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200))))
+    before = metrics.upstream_rejected.value("up", "rate_limited")
+
+    async def main():
+        for _ in range(2):
+            assert (await reg.request("up", "GET", "http://upstream.test/")).status_code == 200
+        with pytest.raises(ProviderUnavailable) as err:
+            await reg.request("up", "GET", "http://upstream.test/")
+        assert err.value.reason == "rate_limited" and err.value.retry_after_s == 2.0
+
+    asyncio.run(main())
+    assert reg.stats()["up"]["rate_limited"] == 1
+    assert metrics.upstream_rejected.value("up", "rate_limited") == before + 1
+
+
+def test_unavailable_providers_serve_stale_cache(monkeypatch, s2_tiff, power_handler):
+    monkeypatch.setattr(settings, "http_backoff_base_s", 0.001)
+    now = [datetime.utcnow().timestamp()]
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64, clock=lambda: now[0]))
+    lat, lon = 18.5204, 73.8567
+    # A tile cached for an earlier window; today's window can't be fetched
+    today = datetime.utcnow().date()
+    old_window = (today - timedelta(days=25), today - timedelta(days=5))
+    tile = _decode_tiff(s2_tiff(0.45))
+    for t in tiles_for_bbox(_bbox_around_point(lat, lon, 100)):
+        tile_cache().put(_tile_key(t, old_window, settings.s2_max_cloud_pct), tile)
+    power_up = [True]
+    power = power_handler([])
+
+    def flaky_power(request):
+        return power(request) if power_up[0] else httpx.Response(503)
+
+    async def main(req):
+        providers.set_client("power", httpx.AsyncClient(transport=httpx.MockTransport(flaky_power)))
+        providers.set_client("copernicus", httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(503))))
+        try:
+            return await analyze_aoi(req)
+        finally:
+            await providers.aclose()
+
+    req = AnalyzeRequest(lat=lat, lon=lon, aoi_radius_m=100)
+    resp = asyncio.run(main(req))
+    assert resp.stale == ["satellite"] and resp.degraded == []
+    assert resp.indices.ndvi == pytest.approx(0.45, abs=1e-5)
+    assert resp.indices.data_date == old_window[1].isoformat()
+
+    # Recent POWER days expire after the provisional TTL; with POWER down they are served stale
+    now[0] += settings.power_cache_provisional_ttl_s + 60
+    power_up[0] = False
+    before = metrics.stale_served.value("weather")
+    resp = asyncio.run(main(req))
+    assert resp.stale == ["satellite", "weather"] and resp.degraded == []
+    assert resp.weather.t2m_c == pytest.approx(26.0)
+    assert metrics.stale_served.value("weather") == before + 1
+    assert providers.breaker("copernicus").state == OPEN
+
+    # Nothing cached for this cell: the weather stage degrades instead of failing the request
+    resp = asyncio.run(main(AnalyzeRequest(lat=28.61, lon=77.21, aoi_radius_m=100)))
+    assert resp.degraded == ["satellite", "weather"]
+    assert resp.weather.t2m_c is None
+
+
+def test_batch_queues_for_tokens_instead_of_falling_back(monkeypatch, s2_tiff, power_handler, copernicus_handler):
+    # A bucket far smaller than the batch, and no waiting allowed for interactive calls
+    monkeypatch.setattr(settings, "http_rate_max_wait_s", 0.0)
+    for spec in providers.specs.values():
+        monkeypatch.setattr(spec, "rate_per_s", 40.0)
+        monkeypatch.setattr(spec, "burst", 2)
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64))
+    s2_calls = []
+    # One POWER cell and tile set per field: every field needs its own upstream calls
+    bodies = [AnalyzeRequest(lat=10.1 + i * 0.5, lon=70.1, aoi_radius_m=100) for i in range(12)]
+    before = metrics.upstream_rejected.value("power", "rate_limited")
+
+    async def main():
+        providers.set_client("power", httpx.AsyncClient(transport=httpx.MockTransport(power_handler([]))))
+        providers.set_client("copernicus", httpx.AsyncClient(transport=httpx.MockTransport(copernicus_handler(s2_calls, s2_tiff(0.45)))))
+        try:
+            return [item async for item in analyze_many(bodies)]
+        finally:
+            await providers.aclose()
+
+    items = asyncio.run(main())
+    assert len(items) == 12 and all(err is None for _, _, err in items)
+    assert all(resp.degraded == [] and resp.stale == [] for _, resp, _ in items)
+    assert all(resp.indices.ndvi == pytest.approx(0.45, abs=1e-5) for _, resp, _ in items)
+    assert len(s2_calls) >= 12
+    assert metrics.upstream_rejected.value("power", "rate_limited") == before
+    assert providers.stats()["copernicus"]["rate_limited"] == 0
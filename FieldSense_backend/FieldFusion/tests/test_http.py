@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from FieldFusion.core.http import ProviderClients, ProviderSpec
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_requests_reuse_pooled_connection():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    reg = ProviderClients(specs={"local": ProviderSpec(timeout_s=5, http2=False)})
+
+    async def main():
+        await reg.open()
+        try:
+            for _ in range(5):
+                r = await reg.request("local", "GET", url)
+                assert r.status_code == 200
+        finally:
+            await reg.aclose()
+
+    try:
+        asyncio.run(main())
+    finally:
+        server.shutdown()
+    stats = reg.stats()["local"]
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 4
+
+
+def test_retries_gateway_errors_with_backoff(monkeypatch):
+    from FieldFusion.core import http as ff_http
+    monkeypatch.setattr(ff_http.settings, "http_backoff_base_s", 0.001)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503 if len(calls) < 3 else 200)
+
+    reg = ProviderClients(specs={"up": ProviderSpec(timeout_s=5)})
+    reg.set_client("up", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    r = asyncio.run(reg.request("up", "GET", "http://upstream.test/"))
+    assert r.status_code == 200
+    assert len(calls) == 3
+    assert reg.stats()["up"]["retries"] == 2
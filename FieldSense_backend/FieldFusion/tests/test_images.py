@@ -0,0 +1,81 @@
+import asyncio
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+
+from FieldFusion.core.config import settings
+from FieldFusion.benchmarks.pest_classifier import FIXTURE_MODEL
+from FieldFusion.models.pest_classifier import NumpyMLP, PestClassifier, classify_image, set_pest_classifier
+from FieldFusion.models.pest_cnn import infer_pest_risk
+from FieldFusion.providers.images import ImageRejected, image_cache, preprocess_user_image
+
+
+def _leaf_jpeg(w=4000, h=3000, lesion_frac=0.0):
+    # Green leaf with a brown band covering `lesion_frac` of the frame
+    px = np.empty((h, w, 3), dtype=np.uint8)
+    px[...] = (40, 140, 50)
+    px[: int(h * lesion_frac)] = (150, 100, 30)
+    buf = io.BytesIO()
+    Image.fromarray(px).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _png_header(w, h):
+    # ~60 bytes claiming a w x h RGB image, with no pixel data
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", b"") + chunk(b"IEND", b"")
+
+
+def _upload(data):
+    return UploadFile(io.BytesIO(data), size=len(data), filename="leaf.jpg")
+
+
+def test_large_photo_is_downscaled_and_cached():
+    data = _leaf_jpeg(lesion_frac=0.2)
+    hits = image_cache.hits
+    feats = asyncio.run(preprocess_user_image(_upload(data)))
+    again = asyncio.run(preprocess_user_image(_upload(data)))
+    assert max(feats["input_shape"]) <= settings.image_input_px
+    assert feats["bytes"] == len(data)
+    assert feats["lesion_frac"] == pytest.approx(0.2, abs=0.03)
+    assert feats["green_frac"] == pytest.approx(0.8, abs=0.03)
+    assert again is feats and image_cache.hits == hits + 1
+
+
+def test_pest_image_signal_needs_lesions():
+    async def prob(data):
+        return await classify_image(await preprocess_user_image(_upload(data)))
+
+    set_pest_classifier(PestClassifier(NumpyMLP(FIXTURE_MODEL)))
+    try:
+        healthy = asyncio.run(prob(_leaf_jpeg(800, 600)))
+        diseased = asyncio.run(prob(_leaf_jpeg(800, 600, lesion_frac=0.3)))
+    finally:
+        set_pest_classifier(None)
+    base = {"rh2m_pct": 50.0, "t2m_c": 25.0}
+    assert infer_pest_risk({**base, "img_pest_prob": healthy})["drivers"] == ["favorable_temp=25.0C"]
+    out = infer_pest_risk({**base, "img_pest_prob": diseased})
+    assert out["level"] == "medium" and out["drivers"][-1].startswith("image_pest_prob=")
+
+
+def test_rejects_oversized_and_non_images(monkeypatch):
+    with pytest.raises(ImageRejected) as err:
+        asyncio.run(preprocess_user_image(_upload(b"not an image")))
+    assert err.value.status_code == 415
+    monkeypatch.setattr(settings, "image_max_bytes", 1000)
+    data = _leaf_jpeg(800, 600)
+    with pytest.raises(ImageRejected) as err:
+        asyncio.run(preprocess_user_image(UploadFile(io.BytesIO(data), filename="leaf.jpg")))
+    assert err.value.status_code == 413
+
+    for w, h in ((8000, 8000), (20000, 20000)):  # ours, then past Pillow's decompression-bomb limit
+        with pytest.raises(ImageRejected) as err:
+            asyncio.run(preprocess_user_image(_upload(_png_header(w, h))))
+        assert err.value.status_code == 413
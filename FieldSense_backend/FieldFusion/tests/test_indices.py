@@ -11,3 +11,25 @@ def test_savi_not_nan():
 def test_ndwi_sign():
     v = ndwi(0.1, 0.05)
     assert v is not None
+
+def test_index_stack_matches_scalar_formulas():
+    import numpy as np
+    from FieldFusion.features.indices import index_stack, index_stats, INDEX_NAMES
+    b3, b4, b8, b11 = 0.08, 0.1, 0.4, 0.2
+    bands = np.array([b3, b4, b8, b11], dtype=np.float32).reshape(4, 1, 1) * np.ones((4, 3, 3), np.float32)
+    stack = index_stack(bands)
+    expected = [ndvi(b8, b4), gndvi(b8, b3), ndwi(b3, b11), ndmi(b8, b11), savi(b8, b4)]
+    for name, layer, exp in zip(INDEX_NAMES, stack, expected):
+        assert np.allclose(layer, exp, atol=1e-6), name
+    stats = index_stats(stack)
+    assert stats["ndvi"]["valid_fraction"] == 1.0
+
+def test_index_stack_masks_zero_denominator():
+    import numpy as np
+    from FieldFusion.features.indices import index_stack, index_stats
+    bands = np.full((4, 2, 2), 0.2, dtype=np.float32)
+    bands[:, 0, 0] = 0.0
+    bands[2, 1, 1] = np.nan
+    stats = index_stats(index_stack(bands))
+    assert stats["ndvi"]["valid_fraction"] == 0.5
+    assert stats["ndvi"]["median"] == 0.0
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from FieldFusion.app.router import router
+from FieldFusion.app.schemas import AnalyzeRequest, AnalyzeResponse
+from FieldFusion.pipeline.jobs import JobQueue, JobStore, set_job_queue
+
+RESPONSE = {
+    "indices": {"ndvi": 0.6},
+    "weather": {"window_days": 7},
+    "soil": {"level": "low", "drivers": [], "confidence": 0.6},
+    "crop": {"level": "low", "drivers": [], "confidence": 0.6},
+    "pest": {"level": "low", "drivers": [], "confidence": 0.2},
+}
+
+
+def _store(tmp_path, clock):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    return JobStore(sessionmaker(bind=engine), ttl_s=60, clock=clock)
+
+
+def test_identical_jobs_coalesce_and_results_persist_with_ttl(tmp_path):
+    now = [1000.0]
+
+    def clock():
+        return now[0]
+
+    calls = []
+
+    async def run(body):
+        calls.append(body)
+        await asyncio.sleep(0.05)
+        return AnalyzeResponse(**RESPONSE)
+
+    async def main():
+        queue = JobQueue(_store(tmp_path, clock), workers=2, run=run, clock=clock)
+        body = AnalyzeRequest(lat=18.52, lon=73.85)
+        first = await queue.submit(body)
+        second = await queue.submit(AnalyzeRequest(lat=18.52, lon=73.85, notes="again"))
+        other = await queue.submit(AnalyzeRequest(lat=18.6, lon=73.85))
+        statuses = [s.status async for s in queue.watch(first.job_id) if s is not None]
+        await queue.stop()
+        # A fresh queue (as after a restart) serves the stored result until it expires
+        restarted = JobQueue(_store(tmp_path, clock), run=run, clock=clock)
+        stored = await restarted.get(first.job_id)
+        now[0] += 61
+        expired = await restarted.get(first.job_id)
+        purged = restarted.store.purge()
+        return first, second, other, statuses, stored, expired, purged
+
+    first, second, other, statuses, stored, expired, purged = asyncio.run(main())
+    assert second.job_id == first.job_id and second.coalesced and not first.coalesced
+    assert other.job_id != first.job_id
+    assert len(calls) == 2
+    assert statuses == ["queued", "running", "done"]
+    assert stored.status == "done" and stored.result.indices.ndvi == 0.6
+    assert expired is None and purged == 2
+
+
+def test_job_endpoints_return_at_once_and_stream_events(tmp_path):
+    release = asyncio.Event()
+
+    async def run(body):
+        await release.wait()
+        raise RuntimeError("provider down")
+
+    set_job_queue(JobQueue(_store(tmp_path, lambda: 1000.0), workers=1, run=run))
+    app = FastAPI()
+    app.include_router(router)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            r = await client.post("/fusion/jobs", json={"lat": 18.52, "lon": 73.85})
+            job_id = r.json()["job_id"]
+            polled = (await client.get(f"/fusion/jobs/{job_id}")).json()
+            asyncio.get_running_loop().call_later(0.05, release.set)
+            sse = await client.get(f"/fusion/jobs/{job_id}/events")
+            final = (await client.get(f"/fusion/jobs/{job_id}")).json()
+            missing = await client.get("/fusion/jobs/nope")
+        return r, polled, sse, final, missing
+
+    try:
+        r, polled, sse, final, missing = asyncio.run(main())
+    finally:
+        set_job_queue(None)
+    assert r.status_code == 202 and r.headers["location"].endswith(r.json()["job_id"])
+    assert polled["status"] in ("queued", "running")
+    assert sse.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in sse.text.strip().split("\n\n")]
+    assert [e[0] for e in events][-1] == "event: failed"
+    assert json.loads(events[-1][1][len("data: "):])["error"] == "RuntimeError: provider down"
+    assert final["status"] == "failed"
+    assert missing.status_code == 404
@@ -0,0 +1,24 @@
+import numpy as np
+
+from FieldFusion.features.indices import index_stack, index_stats
+from FieldFusion.features.masks import SCL_CLOUD_HIGH, SCL_SNOW, apply_mask, scl_mask
+
+
+def test_cloud_percent_and_masked_reductions():
+    stack = np.empty((4, 10, 10), dtype=np.float32)
+    stack[:] = np.array([0.08, 0.1, 0.4, 0.2], dtype=np.float32)[:, None, None]
+    scl = np.full((10, 10), 4.0, dtype=np.float32)
+    # Bright cloud over the top 3 rows would drag NDVI towards 0 if not masked
+    scl[:3] = SCL_CLOUD_HIGH
+    stack[:, :3] = 0.9
+    scl[3, :5] = SCL_SNOW
+    dropped, cloud = scl_mask(scl)
+    assert cloud == 30.0
+    stats = index_stats(index_stack(apply_mask(stack, dropped)))
+    assert np.isclose(stats["ndvi"]["mean"], 0.6, atol=1e-6)
+    assert np.isclose(stats["ndvi"]["valid_fraction"], 0.65)
+
+
+def test_no_data_aoi_has_no_cloud_percent():
+    dropped, cloud = scl_mask(np.full((4, 4), np.nan, dtype=np.float32))
+    assert cloud is None and dropped.all()
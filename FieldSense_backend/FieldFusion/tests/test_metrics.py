@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from FieldFusion.app.router import router
+from FieldFusion.core import metrics
+from FieldFusion.core.config import settings
+from FieldFusion.core.http import providers
+from FieldFusion.providers import weather
+from FieldFusion.providers.weather_cache import PowerDayCache
+
+
+def test_render_prometheus_text():
+    h = metrics.Histogram("t_seconds", "Test latency.", ("stage",), buckets=(0.1, 1.0))
+    c = metrics.Counter("t_events", "Test events.", ("kind",))
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v, "a")
+    c.inc('x"y')
+    metrics._registry.extend([h, c])
+    try:
+        text = metrics.render()
+    finally:
+        metrics._registry.remove(h)
+        metrics._registry.remove(c)
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 't_seconds_sum{stage="a"} 5.55' in text
+    assert 't_seconds_count{stage="a"} 3' in text
+    assert 't_events_total{kind="x\\"y"} 1' in text
+
+
+def test_analyze_records_stages_upstreams_and_fallback(monkeypatch, power_handler):
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64))
+    monkeypatch.setattr(settings, "server_timing", True)
+    app = FastAPI()
+    app.include_router(router)
+    before = {
+        "s2_500": metrics.upstream_responses.value("copernicus", "500"),
+        "fallback": metrics.fallbacks.value("satellite", "tile_unavailable"),
+        "degraded": metrics.degraded_responses.value(),
+        "weather": metrics.stage_seconds.count("weather"),
+    }
+
+    async def main():
+        providers.set_client("power", httpx.AsyncClient(transport=httpx.MockTransport(power_handler([]))))
+        providers.set_client("copernicus", httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(500))))
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.post("/fusion/analyze", json={"lat": 12.97, "lon": 77.59, "aoi_radius_m": 100})
+        finally:
+            await providers.aclose()
+
+    r = asyncio.run(main())
+    assert r.status_code == 200
+    assert r.json()["indices"]["ndvi"] == 0.4
+    assert r.json()["degraded"] == ["satellite"]
+    timing = r.headers["Server-Timing"]
+    assert "weather;dur=" in timing and "satellite;dur=" in timing and "models;dur=" in timing
+    assert timing.split(", ")[-1].startswith("total;dur=")
+
+    assert metrics.upstream_responses.value("copernicus", "500") > before["s2_500"]
+    assert metrics.fallbacks.value("satellite", "tile_unavailable") == before["fallback"] + 1
+    assert metrics.degraded_responses.value() == before["degraded"] + 1
+    assert metrics.stage_seconds.count("weather") == before["weather"] + 1
+
+    text = metrics.render()
+    assert 'fieldfusion_upstream_responses_total{provider="power",status="200"}' in text
+    assert 'fieldfusion_cache_lookups_total{cache="weather",result="miss"}' in text
+    assert 'fieldfusion_http_request_seconds_count{method="POST",route="/fusion/analyze",status="200"}' in text
@@ -0,0 +1,95 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from FieldFusion.features.image import IMAGE_FEATURES
+from FieldFusion.benchmarks.pest_classifier import FIXTURE_MODEL
+from FieldFusion.models.pest_classifier import NumpyMLP, OnnxModel, PestClassifier, classify_image, load_model, set_pest_classifier
+
+
+def _feats(lesion, green=0.7, edge=0.1):
+    f = dict.fromkeys(IMAGE_FEATURES, 0.0)
+    f.update(lesion_frac=lesion, green_frac=green, edge_density=edge)
+    return f
+
+
+def test_fixture_model_separates_lesioned_leaves():
+    model = NumpyMLP(FIXTURE_MODEL)
+    x = np.array([[0.0, 0.8, 0.2, 0.1], [0.3, 0.6, 0.1, 0.1]], dtype=np.float32)
+    p = model.predict(x)
+    assert p[0] < 0.3 and p[1] > 0.9
+
+
+def test_concurrent_requests_share_micro_batches():
+    clf = PestClassifier(NumpyMLP(FIXTURE_MODEL), max_batch=8, max_wait_s=0.01)
+
+    async def main():
+        return await asyncio.gather(*[clf.predict(_feats(0.3 if i % 2 else 0.0)) for i in range(20)])
+
+    probs = asyncio.run(main())
+    assert clf.items == 20 and clf.batches == 3  # 8 + 8 full, then 4 after the wait
+    assert all(p > 0.9 for p in probs[1::2]) and all(p < 0.3 for p in probs[::2])
+
+
+def test_running_batches_are_held_until_done():
+    clf = PestClassifier(NumpyMLP(FIXTURE_MODEL), max_batch=4, max_wait_s=0.01)
+
+    async def main():
+        calls = [asyncio.ensure_future(clf.predict(_feats(0.0))) for _ in range(4)]
+        await asyncio.sleep(0)  # the 4th call fills the batch and flushes it
+        held = len(clf._tasks)
+        await asyncio.gather(*calls)
+        await asyncio.sleep(0)
+        return held
+
+    assert asyncio.run(main()) == 1
+    assert not clf._tasks
+
+
+def _onnx_copy(ref, path, features):
+    # The bundled MLP as an ONNX graph, with `features` as its metadata
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from onnx import TensorProto, helper, numpy_helper
+    (w0, b0), (w1, b1) = ref.layers
+    graph = helper.make_graph(
+        [
+            helper.make_node("Gemm", ["x", "w0", "b0"], ["h"]),
+            helper.make_node("Relu", ["h"], ["r"]),
+            helper.make_node("Gemm", ["r", "w1", "b1"], ["z"]),
+            helper.make_node("Sigmoid", ["z"], ["p"]),
+        ],
+        "pest",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [None, 4])],
+        [helper.make_tensor_value_info("p", TensorProto.FLOAT, [None, 1])],
+        [numpy_helper.from_array(a, n) for a, n in ((w0, "w0"), (b0, "b0"), (w1, "w1"), (b1, "b1"))],
+    )
+    m = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    helper.set_model_props(m, {"features": ",".join(features)})
+    onnx.save(m, path)
+    return path
+
+
+def test_onnx_backend_matches_numpy(tmp_path):
+    ref = NumpyMLP(FIXTURE_MODEL)
+    model = OnnxModel(_onnx_copy(ref, str(tmp_path / "pest.onnx"), ref.features), intra_op_threads=1, inter_op_threads=1)
+    x = np.random.default_rng(0).random((16, 4), dtype=np.float32)
+    assert model.features == ref.features
+    np.testing.assert_allclose(model.predict(x), ref.predict(x), rtol=1e-5)
+
+
+def test_onnx_model_with_unknown_features_is_rejected(tmp_path):
+    ref = NumpyMLP(FIXTURE_MODEL)
+    path = _onnx_copy(ref, str(tmp_path / "pest.onnx"), ref.features[:3] + ("leaf_area_cm2",))
+    with pytest.raises(ValueError, match="leaf_area_cm2"):
+        load_model(path)
+
+
+def test_no_configured_model_adds_no_image_term():
+    assert load_model() is None
+    set_pest_classifier(PestClassifier())
+    try:
+        assert asyncio.run(classify_image(_feats(0.3))) is None
+    finally:
+        set_pest_classifier(None)
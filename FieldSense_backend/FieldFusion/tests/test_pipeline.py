@@ -1,15 +1,59 @@
 import asyncio
-# from ..app.schemas import AnalyzeRequest
-# from ..pipeline.run_analysis import analyze_aoi
+
+import pytest
 
 from FieldFusion.app.schemas import AnalyzeRequest
+from FieldFusion.benchmarks.standin import StandInServer
+from FieldFusion.core.config import settings
+from FieldFusion.core.http import providers
 from FieldFusion.pipeline.run_analysis import analyze_aoi
+from FieldFusion.providers import weather
+from FieldFusion.providers.weather_cache import PowerDayCache
+
 
+@pytest.fixture
+def standin(monkeypatch):
+    # Recorded POWER / Sentinel-2 fixtures on a local server instead of the live APIs
+    pytest.importorskip("tifffile")
+    server = StandInServer().start()
+    for k, v in server.urls().items():
+        monkeypatch.setattr(settings, k, v)
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64))
+    yield server
+    server.stop()
 
-def test_smoke_pipeline():
+
+def test_smoke_pipeline(standin):
     req = AnalyzeRequest(lat=18.5204, lon=73.8567, aoi_radius_m=200, include_forecast_days=7)
-    resp = asyncio.get_event_loop().run_until_complete(analyze_aoi(req, user_image=None))
+
+    async def main():
+        try:
+            return await analyze_aoi(req, user_image=None)
+        finally:
+            await providers.aclose()
+
+    resp = asyncio.run(main())
     assert resp.indices.ndvi is not None
     assert resp.soil.level in {"low","medium","high","unknown"}
     assert resp.crop.level in {"low","medium","high","unknown"}
     assert resp.pest.level in {"low","medium","high","unknown"}
+    assert resp.weather.t2m_c is not None
+    assert resp.degraded == []
+    assert standin.counts["power"] == 1 and standin.counts["process"] >= 1
+
+
+def test_benchmark_emits_comparable_json(tmp_path):
+    pytest.importorskip("tifffile")
+    from FieldFusion.benchmarks import pipeline
+    base, new = tmp_path / "base.json", tmp_path / "new.json"
+    args = ["--concurrency", "2", "--requests", "4", "--min-time", "0"]
+    pipeline.main(args + ["--out", str(base)])
+    pipeline.main(args + ["--out", str(new), "--compare", str(base)])
+
+    import json
+    result = json.loads(new.read_text())
+    cold, warm = result["analyze"]
+    assert cold["phase"] == "cold" and cold["errors"] == 0 and cold["upstream"]["power"] == 4
+    assert warm["phase"] == "warm" and warm["upstream"] == {"power": 0, "process": 0}
+    assert "s2.index_stack_256px" in result["micro"] and result["env"]["numpy"]
+    assert any(line.startswith("analyze cold c=2") for line in pipeline.compare(json.loads(base.read_text()), result))
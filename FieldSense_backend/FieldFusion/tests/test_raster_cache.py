@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from FieldFusion.core.http import providers
+from FieldFusion.providers.raster_cache import (
+    RasterTileCache, mosaic, tile_bbox, tile_cache, tiles_for_bbox,
+)
+from FieldFusion.providers.satellite import _bbox_around_point, fetch_s2_indices
+
+
+def _copernicus(calls, payload):
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, content=payload)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _fetch_all(points, calls, payload):
+    async def main():
+        providers.set_client("copernicus", _copernicus(calls, payload))
+        try:
+            return [await fetch_s2_indices(lat, lon, r, 40) for lat, lon, r in points]
+        finally:
+            await providers.aclose()
+    return asyncio.run(main())
+
+
+def test_mosaic_covers_aoi_across_tiles():
+    bbox = _bbox_around_point(18.5204, 73.8567, 200)
+    tile = tiles_for_bbox(bbox)[0]
+    tb = tile_bbox(tile)
+    assert tb[0] <= bbox[0] and tb[1] <= bbox[1]
+    # Shift the AOI onto a tile corner so it spans four tiles
+    t = tb[2] - tb[0]
+    corner = [tb[2] - t / 10, tb[3] - t / 10, tb[2] + t / 10, tb[3] + t / 10]
+    tiles = tiles_for_bbox(corner)
+    assert len(tiles) == 4
+    arrays = [(tl, np.full((1, 256, 256), i, dtype=np.float32)) for i, tl in enumerate(tiles)]
+    out = mosaic(arrays, corner, 1)
+    assert np.isfinite(out).all()
+    h, w = out.shape[1:]
+    # tiles are listed south-west, south-east, north-west, north-east; rows run north->south
+    assert out[0, -1, 0] == 0 and out[0, -1, -1] == 1 and out[0, 0, 0] == 2 and out[0, 0, -1] == 3
+    assert abs(h - w) <= 1
+
+
+def test_nearby_and_repeat_requests_reuse_tiles(s2_tiff):
+    calls = []
+    points = [(18.5204, 73.8567, 200), (18.5204, 73.8567, 200), (18.5210, 73.8575, 150)]
+    out = _fetch_all(points, calls, s2_tiff(0.5))
+    assert all(o["ndvi"] == pytest.approx(0.5, abs=1e-5) for o in out)
+    first_fetch_tiles = len(tiles_for_bbox(_bbox_around_point(18.5204, 73.8567, 200)))
+    assert len(calls) == first_fetch_tiles
+    assert tile_cache().stats()["hits"] >= 2
+
+
+def test_size_bounded_eviction(tmp_path):
+    arr = np.zeros((64, 64), dtype=np.float32)
+    cache = RasterTileCache(str(tmp_path), max_bytes=3 * (arr.nbytes + 128))
+    for i in range(6):
+        cache.put(cache.key("ndvi", (i, 0), ("2024-01-01", "2024-01-21")), arr)
+    stats = cache.stats()
+    assert stats["tiles"] == 3 and stats["evictions"] == 3
+    assert stats["bytes"] <= stats["max_bytes"]
+    # A new process adopts what is on disk
+    assert RasterTileCache(str(tmp_path), max_bytes=10 ** 9).stats()["tiles"] == 3
+    assert isinstance(cache.get(cache.key("ndvi", (5, 0), ("2024-01-01", "2024-01-21"))), np.memmap)
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from FieldFusion.core.http import providers
+from FieldFusion.features.indices import STACK_BANDS
+from FieldFusion.providers import satellite
+from FieldFusion.providers.raster_cache import mosaic, tiles_for_bbox
+from FieldFusion.providers.satellite import _aoi_stats, _bbox_around_point, _decode_tiff, fetch_s2_indices
+
+
+def _slow_copernicus(payload, delay):
+
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return httpx.Response(200, content=payload)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _health_app():
+    app = FastAPI()
+
+    @app.get("/health")
+    def health():
+        return {"ok": True}
+    return app
+
+
+def test_fetch_decodes_tiff_off_loop(s2_tiff):
+    async def main():
+        providers.set_client("copernicus", _slow_copernicus(s2_tiff(0.55), 0.0))
+        try:
+            return await fetch_s2_indices(18.52, 73.85, 200, max_cloud_pct=40)
+        finally:
+            await providers.aclose()
+    out = asyncio.run(main())
+    assert out["ndvi"] == pytest.approx(0.55, abs=1e-5)
+    assert out["ndmi"] is not None and out["savi"] is not None
+    assert out["index_stats"]["ndvi"]["valid_fraction"] == 1.0
+
+
+def test_health_stays_fast_while_satellite_in_flight(s2_tiff):
+    async def main():
+        providers.set_client("copernicus", _slow_copernicus(s2_tiff(0.55), 0.5))
+        fetches = [asyncio.create_task(fetch_s2_indices(18.5 + i * 0.01, 73.8, 200, 40)) for i in range(8)]
+        await asyncio.sleep(0.05)
+        transport = httpx.ASGITransport(app=_health_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            latencies = []
+            for _ in range(10):
+                t0 = time.perf_counter()
+                r = await client.get("/health")
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200
+        pending = sum(not f.done() for f in fetches)
+        results = await asyncio.gather(*fetches)
+        await providers.aclose()
+        return latencies, pending, results
+
+    latencies, pending, results = asyncio.run(main())
+    # Health checks were answered while every satellite fetch was still in flight
+    assert pending == 8
+    assert max(latencies) < 0.2
+    assert all(r["ndvi"] == pytest.approx(0.55, abs=1e-5) for r in results)
+
+
+def test_mostly_cloudy_aoi_short_circuits(s2_tiff):
+    async def main():
+        providers.set_client("copernicus", _slow_copernicus(s2_tiff(0.55, scl=9), 0.0))
+        try:
+            return await fetch_s2_indices(18.52, 73.85, 200, max_cloud_pct=40)
+        finally:
+            await providers.aclose()
+    out = asyncio.run(main())
+    assert out["cloud_percent"] == 100.0
+    assert out["ndvi"] is None and "index_stats" not in out
+
+
+def test_cloud_check_reads_only_the_scl_band(monkeypatch, s2_tiff):
+    bbox = _bbox_around_point(18.52, 73.85, 200)
+    built = []
+
+    def spy(tiles, bbox, n_bands):
+        built.append(n_bands)
+        return mosaic(tiles, bbox, n_bands)
+
+    monkeypatch.setattr(satellite, "mosaic", spy)
+    cloudy = [(t, _decode_tiff(s2_tiff(0.55, scl=9))) for t in tiles_for_bbox(bbox)]
+    assert _aoi_stats(cloudy, bbox, 40) == (None, 100.0)
+    assert built == [1]
+
+    clear = [(t, _decode_tiff(s2_tiff(0.55))) for t in tiles_for_bbox(bbox)]
+    stats, cloud = _aoi_stats(clear, bbox, 40)
+    assert cloud == 0.0 and stats["ndvi"]["mean"] == pytest.approx(0.55, abs=1e-5)
+    assert built == [1, 1, len(STACK_BANDS)]
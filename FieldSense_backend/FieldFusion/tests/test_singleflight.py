@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+import pytest
+
+from FieldFusion.core.http import providers
+from FieldFusion.core.singleflight import SingleFlight, flight
+from FieldFusion.providers import weather
+from FieldFusion.providers.satellite import fetch_s2_indices
+from FieldFusion.providers.weather_cache import PowerDayCache
+
+
+def test_concurrent_callers_share_one_task_and_survive_cancellation():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        sf = SingleFlight("t")
+        impatient = asyncio.ensure_future(sf.do("k", fetch))
+        others = [sf.do("k", fetch) for _ in range(9)]
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        results = await asyncio.gather(*others)
+        after = await sf.do("k", fetch)  # nothing in flight any more: a new call
+        return sf, results, after
+
+    sf, results, after = asyncio.run(main())
+    assert results == [42] * 9 and after == 42
+    assert len(calls) == 2
+    assert sf.stats()["coalesced"] == 9 and sf.stats()["in_flight"] == 0
+
+
+def test_spike_of_identical_analyses_hits_upstream_once(monkeypatch, s2_tiff, power_handler, copernicus_handler):
+    monkeypatch.setattr(weather, "power_cache", PowerDayCache(max_entries=64))
+    power_calls, s2_calls = [], []
+    before = flight("s2_aoi").coalesced
+
+    async def main():
+        providers.set_client("power", httpx.AsyncClient(transport=httpx.MockTransport(power_handler(power_calls))))
+        providers.set_client("copernicus", httpx.AsyncClient(transport=httpx.MockTransport(copernicus_handler(s2_calls, s2_tiff(0.5)))))
+        try:
+            return await asyncio.gather(
+                *[weather.fetch_power_weather(18.52 + i * 1e-4, 73.85, 7) for i in range(50)],
+                *[fetch_s2_indices(18.52, 73.85, 200, 40) for _ in range(50)],
+            )
+        finally:
+            await providers.aclose()
+
+    out = asyncio.run(main())
+    assert len(power_calls) == 1
+    assert len(s2_calls) == 1
+    assert all(o["ndvi"] == pytest.approx(0.5, abs=1e-5) for o in out[50:])
+    assert flight("s2_aoi").coalesced - before == 49
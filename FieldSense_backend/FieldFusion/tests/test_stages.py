@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+from FieldFusion.pipeline.stages import Stage, run_stages
+
+
+def _sleeper(value, delay):
+    async def fn(*_):
+        await asyncio.sleep(delay)
+        return value
+    return fn
+
+
+def test_independent_stages_overlap():
+    stages = [Stage("a", _sleeper(1, 0.2)), Stage("b", _sleeper(2, 0.2))]
+    t0 = time.perf_counter()
+    run = asyncio.run(run_stages(stages))
+    assert run.results == {"a": 1, "b": 2}
+    assert time.perf_counter() - t0 < 0.35
+
+
+def test_late_stage_degrades_to_fallback():
+    stages = [
+        Stage("fast", _sleeper("ok", 0.0), deadline_s=1.0),
+        Stage("slow", _sleeper("late", 1.0), deadline_s=0.05, fallback={}),
+    ]
+    run = asyncio.run(run_stages(stages))
+    assert run.results == {"fast": "ok", "slow": {}}
+    assert run.degraded == ["slow"]
+
+
+def test_dependent_stage_receives_upstream_value():
+    async def double(x):
+        return x * 2
+    run = asyncio.run(run_stages([Stage("a", _sleeper(3, 0.0)), Stage("b", double, deps=["a"])]))
+    assert run.results["b"] == 6
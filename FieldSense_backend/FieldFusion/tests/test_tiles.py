@@ -0,0 +1,96 @@
+import asyncio
+import io
+import math
+import os
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from PIL import Image
+
+from FieldFusion.app.router import router
+from FieldFusion.pipeline import grid
+from FieldFusion.pipeline.tiles import LEVEL_COLORS, risk_tiles
+
+RING = [(73.80, 18.50), (73.82, 18.50), (73.82, 18.52), (73.80, 18.52)]
+
+
+def _write_scan(out_dir, ndvi):
+    # Synthetic finished scan: every cell at `ndvi`, no weather
+    os.makedirs(os.path.join(out_dir, "chunks"))
+    spec = grid.GridSpec.create(RING, 200, 40, 7, chunk=8)
+    grid._write_manifest(out_dir, spec, complete=True)
+    ncy, ncx = spec.chunks_shape
+    for cy in range(ncy):
+        for cx in range(ncx):
+            inside = spec.inside(cy, cx)
+            h, w = inside.shape
+            wx = {name: np.full((h, w), np.nan) for name in grid.WEATHER_FIELDS}
+            recs = grid._chunk_records(spec, inside, np.full((5, h, w), ndvi), np.zeros((h, w)), wx)
+            grid._write_chunk(out_dir, cy, cx, recs)
+
+
+def _tile_xy(lon, lat, z):
+    n = 2 ** z
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return int((lon + 180) / 360 * n), int(y)
+
+
+def test_tiles_render_from_scans_with_conditional_get():
+    _write_scan(os.path.join(risk_tiles().root, "district"), ndvi=0.2)
+    app = FastAPI()
+    app.include_router(router)
+    x, y = _tile_xy(73.81, 18.51, 14)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get(f"/fusion/tiles/crop/14/{x}/{y}")
+            again = await client.get(f"/fusion/tiles/crop/14/{x}/{y}", headers={"If-None-Match": first.headers["etag"]})
+            ndvi = await client.get(f"/fusion/tiles/ndvi/14/{x}/{y}")
+            empty = await client.get("/fusion/tiles/pest/14/0/0")
+            bad = await client.get("/fusion/tiles/yield/14/0/0")
+            stats = (await client.get("/fusion/stats")).json()["map_tiles"]
+        return first, again, ndvi, empty, bad, stats
+
+    first, again, ndvi, empty, bad, stats = asyncio.run(main())
+    assert first.status_code == 200 and first.headers["content-type"] == "image/png"
+    px = np.asarray(Image.open(io.BytesIO(first.content)))
+    colors = {tuple(c) for c in px.reshape(-1, 4) if c[3]}
+    assert colors == {tuple(LEVEL_COLORS[3])}  # ndvi 0.2 -> high crop risk
+    assert again.status_code == 304 and not again.content
+    assert ndvi.status_code == 200 and ndvi.headers["etag"] != first.headers["etag"]
+    assert not np.asarray(Image.open(io.BytesIO(empty.content)))[..., 3].any()
+    assert bad.status_code == 404
+    assert stats["scans"] == 1 and stats["hits"] == 1 and stats["misses"] == 3
+
+
+def test_rescan_reloads_only_changed_scan_within_grid_budget(tmp_path):
+    from FieldFusion.pipeline.tiles import RiskTiles
+    root = tmp_path / "grids"
+    _write_scan(str(root / "a"), ndvi=0.2)
+    far = [(lon + 1.0, lat) for lon, lat in RING]  # a second region, one degree east
+    os.makedirs(root / "b" / "chunks")
+    spec_b = grid.GridSpec.create(far, 200, 40, 7, chunk=8)
+    grid._write_manifest(str(root / "b"), spec_b, complete=False)
+    tiles = RiskTiles(str(root), max_bytes=1024 * 1024, refresh_s=0.0, grids_max_bytes=1)
+    xa, ya = _tile_xy(73.81, 18.51, 14)
+    xb, yb = _tile_xy(74.81, 18.51, 14)
+
+    etag_a = tiles.render("crop", 14, xa, ya)[0]
+    tiles.render("crop", 14, xb, yb)
+    assert tiles.stats()["grid_loads"] == 2 and tiles.stats()["grids_loaded"] == 1  # budget keeps one
+
+    # Scan b gains a chunk while running: tile a stays cached, only b re-renders
+    inside = spec_b.inside(0, 0)
+    h, w = inside.shape
+    wx = {name: np.full((h, w), np.nan) for name in grid.WEATHER_FIELDS}
+    os.utime(root / "b" / "chunks", ns=(1, 1))  # make sure the directory mtime moves
+    grid._write_chunk(str(root / "b"), 0, 0, grid._chunk_records(spec_b, inside, np.full((5, h, w), 0.8), np.zeros((h, w)), wx))
+    before = tiles.stats()
+    assert tiles.cached("crop", 14, xa, ya)[0] == etag_a
+    assert tiles.cached("crop", 14, xb, yb) is None
+    tiles.render("crop", 14, xb, yb)
+    after = tiles.stats()
+    assert after["grid_loads"] == before["grid_loads"] + 1
+    assert after["scans"] == 2 and after["version"] != before["version"]
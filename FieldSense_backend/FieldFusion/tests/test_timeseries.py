@@ -0,0 +1,108 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from FieldFusion.app.router import router
+from FieldFusion.core.config import settings
+from FieldFusion.core.http import providers
+from FieldFusion.pipeline.timeseries import series_store
+
+
+def _copernicus(acquisitions, s2_tiff, log):
+    payload = s2_tiff(0.6)
+
+    def handler(request):
+        body = json.loads(request.content)
+        if request.url.path.endswith("/search"):
+            lo, hi = [datetime.fromisoformat(x.replace("Z", "+00:00")).date() for x in body["datetime"].split("/")]
+            days = [d for d in acquisitions if lo <= d <= hi]
+            log.append(("search", lo, hi))
+            feats = [{"properties": {"datetime": f"{d.isoformat()}T05:30:00Z"}} for d in days]
+            return httpx.Response(200, json={"features": feats, "context": {}})
+        log.append(("process", body["input"]["data"][0]["dataFilter"]["timeRange"]["from"][:10]))
+        return httpx.Response(200, content=payload)
+    return handler
+
+
+def _query(app, handler, start, end):
+    async def main():
+        providers.set_client("copernicus", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+                r = await c.post("/fusion/timeseries", json={
+                    "lat": 18.5204, "lon": 73.8567, "aoi_radius_m": 100,
+                    "start": start.isoformat(), "end": end.isoformat(),
+                })
+        finally:
+            await providers.aclose()
+        return r
+    r = asyncio.run(main())
+    assert r.status_code == 200
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+def test_series_is_stored_and_only_new_acquisitions_fetched(s2_tiff):
+    app = FastAPI()
+    app.include_router(router)
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=30)
+    acquisitions = [start + timedelta(days=5 * i) for i in range(4)]
+    log = []
+    handler = _copernicus(acquisitions, s2_tiff, log)
+
+    first = _query(app, handler, start, today - timedelta(days=12))
+    assert sorted(p["date"] for p in first) == [d.isoformat() for d in acquisitions[:4] if d <= today - timedelta(days=12)]
+    assert all(p["indices"]["ndvi"]["mean"] == pytest.approx(0.6, abs=1e-4) for p in first)
+
+    # A later acquisition appears; the repeat query replays stored points and fetches only the new one
+    acquisitions.append(today - timedelta(days=2))
+    log.clear()
+    second = _query(app, handler, start, today)
+    assert [p["date"] for p in second] == [d.isoformat() for d in acquisitions]
+    searches = [e for e in log if e[0] == "search"]
+    assert len(searches) == 1 and searches[0][1] == today - timedelta(days=11)
+    assert [e[1] for e in log if e[0] == "process"] == [acquisitions[-1].isoformat()]
+
+    # An acquisition from inside the publication lag shows up in the catalog late; it is still fetched
+    late = today - timedelta(days=settings.timeseries_publish_lag_days - 1)
+    acquisitions.insert(-1, late)
+    log.clear()
+    third = _query(app, handler, start, today)
+    assert sorted(p["date"] for p in third) == [d.isoformat() for d in sorted(acquisitions)]
+    searches = [e for e in log if e[0] == "search"]
+    assert len(searches) == 1 and searches[0][1] == today - timedelta(days=settings.timeseries_publish_lag_days - 1)
+    assert [e[1] for e in log if e[0] == "process"] == [late.isoformat()]
+
+    key = series_store().field_key(18.5204, 73.8567, 100, settings.s2_max_cloud_pct)
+    assert len(series_store().load(key)) == len(acquisitions)
+
+
+def test_catalog_failure_ends_stream_with_error_line(monkeypatch, s2_tiff):
+    monkeypatch.setattr(settings, "http_backoff_base_s", 0.001)
+    app = FastAPI()
+    app.include_router(router)
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=30)
+    handler = _copernicus([start + timedelta(days=2)], s2_tiff, [])
+    assert len(_query(app, handler, start, today - timedelta(days=12))) == 1
+
+    def down(request):
+        return httpx.Response(503) if request.url.path.endswith("/search") else handler(request)
+
+    lines = _query(app, down, start, today)
+    assert lines[0]["date"] == (start + timedelta(days=2)).isoformat()
+    assert len(lines) == 2 and lines[1]["error"].startswith("HTTPStatusError")
+
+
+def test_rejects_inverted_range():
+    app = FastAPI()
+    app.include_router(router)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            return await c.post("/fusion/timeseries", json={"lat": 1, "lon": 1, "start": "2024-02-01", "end": "2024-01-01"})
+    assert asyncio.run(main()).status_code == 400
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from FieldFusion.features.fusion import build_feature_vector
+from FieldFusion.features.vector import FEATURE_NAMES, FeatureBlock, FeatureVector
+from FieldFusion.models.batch import feature_columns, score_batch
+from FieldFusion.models.crop_health import infer_crop_health
+from FieldFusion.models.pest_cnn import infer_pest_risk
+from FieldFusion.models.soil_health import infer_soil_health
+
+S2 = {"ndvi": 0.6, "gndvi": 0.5, "ndwi": 0.1, "ndmi": 0.05, "savi": 0.4}
+WX = {"t2m_c": 27.0, "rh2m_pct": 85.0, "rain_mm": None}
+
+
+def test_missing_reads_as_none_and_roundtrips():
+    fv = build_feature_vector(S2, WX)
+    assert fv.get("ndvi") == 0.6 and fv.get("rain_mm") is None and fv.get("img_pest_prob") is None
+    assert fv.missing.tolist() == [n in ("rain_mm", "img_pest_prob") for n in FEATURE_NAMES]
+    buf = fv.to_bytes()
+    assert len(buf) == 2 + 2 + 7 * 8
+    back = FeatureVector.from_bytes(buf)
+    np.testing.assert_array_equal(back.values, fv.values)
+    with pytest.raises(ValueError):
+        FeatureVector.from_bytes(b"\x09" + buf[1:])
+
+
+def test_block_rows_are_views_and_score_like_dicts():
+    block = FeatureBlock(2)
+    build_feature_vector(S2, WX, {"pest_prob": 0.12}, out=block.vector(0))
+    build_feature_vector({"ndvi": 0.8}, {"t2m_c": 20.0}, out=block.vector(1))
+    assert block.matrix[0, FEATURE_NAMES.index("img_pest_prob")] == 0.12
+    cols = feature_columns(block)
+    assert np.shares_memory(cols["ndvi"], block.matrix)
+    scores = score_batch(block)
+    for i in range(2):
+        fv = block.vector(i)
+        row = scores.row(i)
+        assert row["soil"] == infer_soil_health(fv)
+        assert row["crop"] == infer_crop_health(fv)
+        assert row["pest"] == infer_pest_risk(fv)
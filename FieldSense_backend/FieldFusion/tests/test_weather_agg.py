@@ -0,0 +1,34 @@
+import numpy as np
+
+from FieldFusion.features.weather_agg import (
+    growing_degree_days, longest_run, nan_mean, nan_sum, parameter_arrays, rolling_sum,
+)
+
+
+def test_fill_and_out_of_range_values_become_nan():
+    parameter = {
+        "T2M": {"20240101": 25.0, "20240102": -999.0, "20240103": 75.0, "20240104": 27.0},
+        "RH2M": {"20240101": 101.0, "20240102": 60.0, "20240103": None, "20240104": 80.0},
+        "PRECTOTCORR": {"20240101": -999.0, "20240102": -999.0, "20240103": -999.0, "20240104": -999.0},
+    }
+    arr = parameter_arrays(parameter)
+    assert arr["T2M"].dtype == np.float64
+    assert nan_mean(arr["T2M"]) == 26.0
+    assert nan_mean(arr["RH2M"]) == 70.0
+    assert nan_sum(arr["PRECTOTCORR"]) is None
+
+
+def test_rolling_windows():
+    rain = np.array([0.0, 5.0, np.nan, 10.0, 1.0, 0.0])
+    assert rolling_sum(rain, 3).tolist() == [5.0, 15.0, 11.0, 11.0]
+    assert rolling_sum(rain, 10).size == 0
+    t_max = np.array([36.0, 37.0, 30.0, 36.0, 38.0, 39.0, np.nan])
+    assert longest_run(t_max > 35.0) == 3
+    assert longest_run(np.zeros(0, dtype=bool)) == 0
+
+
+def test_growing_degree_days_capped():
+    t_max = np.array([25.0, 35.0, np.nan])
+    t_min = np.array([15.0, 5.0, 12.0])
+    # (25 + 15) / 2 - 10 = 10; (min(35, 30) + max(5, 10)) / 2 - 10 = 10
+    assert growing_degree_days(t_max, t_min, 10.0, 30.0) == 20.0
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+from FieldFusion.core.http import providers
+from FieldFusion.providers import weather
+from FieldFusion.providers.weather_cache import PowerDayCache, snap_to_power_grid
+
+
+def _power_stub(calls):
+    def handler(request):
+        q = request.url.params
+        calls.append((q["start"], q["end"], q["latitude"], q["longitude"]))
+        d0 = datetime.strptime(q["start"], "%Y%m%d")
+        n = (datetime.strptime(q["end"], "%Y%m%d") - d0).days + 1
+        days = [(d0 + timedelta(days=i)).strftime("%Y%m%d") for i in range(n)]
+        values = {"T2M": 25.0, "T2M_MAX": 31.0, "T2M_MIN": 19.0, "RH2M": 80.0, "PRECTOTCORR": 2.0}
+        par = {k: {d: values[k] for d in days} for k in q["parameters"].split(",")}
+        return httpx.Response(200, json={"properties": {"parameter": par}})
+    return handler
+
+
+def _run(monkeypatch, cache, windows):
+    calls = []
+    monkeypatch.setattr(weather, "power_cache", cache)
+
+    async def main():
+        providers.set_client("power", httpx.AsyncClient(transport=httpx.MockTransport(_power_stub(calls))))
+        try:
+            return [await weather.fetch_power_weather(lat, lon, days) for lat, lon, days in windows]
+        finally:
+            await providers.aclose()
+    return asyncio.run(main()), calls
+
+
+def test_snap_groups_nearby_fields():
+    assert snap_to_power_grid(18.52, 73.85) == snap_to_power_grid(18.61, 73.99)
+    assert snap_to_power_grid(18.52, 73.85) != snap_to_power_grid(19.1, 73.85)
+
+
+def test_same_cell_served_from_cache(monkeypatch):
+    cache = PowerDayCache(max_entries=8)
+    out, calls = _run(monkeypatch, cache, [(18.52, 73.85, 7), (18.61, 73.99, 7)])
+    assert len(calls) == 1
+    assert out[0] == out[1]
+    assert out[0]["rain_mm"] == 16.0
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_overlapping_window_fetches_only_missing_days(monkeypatch):
+    cache = PowerDayCache(max_entries=8)
+    out, calls = _run(monkeypatch, cache, [(18.52, 73.85, 7), (18.52, 73.85, 9)])
+    assert len(calls) == 2
+    start, end = calls[1][:2]
+    assert (datetime.strptime(end, "%Y%m%d") - datetime.strptime(start, "%Y%m%d")).days == 1
+    assert out[1]["rain_mm"] == 20.0
+    assert cache.stats()["partial_hits"] == 1
+
+
+def test_sqlite_tier_survives_new_process(monkeypatch, tmp_path):
+    db = str(tmp_path / "power.db")
+    _run(monkeypatch, PowerDayCache(max_entries=8, sqlite_path=db), [(18.52, 73.85, 7)])
+    fresh = PowerDayCache(max_entries=8, sqlite_path=db)
+    _, calls = _run(monkeypatch, fresh, [(18.52, 73.85, 7)])
+    assert calls == []
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_lru_bound():
+    cache = PowerDayCache(max_entries=2)
+
+    async def main():
+        for i in range(4):
+            await cache.put_days((float(i), 0.0), ["T2M"], {"20240101": {"T2M": 1.0}})
+    asyncio.run(main())
+    assert cache.stats()["entries"] == 2
@@ -1,7 +1,23 @@
-from passlib.context import CryptContext
+import asyncio
+import functools
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from config import BCRYPT_ROUNDS, AUTH_HASH_WORKERS, AUTH_HASH_MAX_QUEUE
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def make_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    # min == max == default, so any stored hash with a different cost needs an update
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+pwd_context = make_context()
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -11,3 +27,75 @@ def verify_password(password: str, hashed: str) -> bool:
 
 def create_verification_token() -> str:
     return secrets.token_urlsafe(32)
+
+# bcrypt is ~250 ms of CPU per call at cost 12. It runs on its own small
+# thread pool (the bcrypt C code releases the GIL) so it never blocks the
+# event loop or starves the FieldFusion CPU pool. Work beyond workers +
+# max_queue is refused with HashPoolBusy, which the endpoints turn into 429.
+
+class HashPoolBusy(Exception):
+    pass
+
+class HashPool:
+    def __init__(self, workers: int = AUTH_HASH_WORKERS, max_queue: int = AUTH_HASH_MAX_QUEUE,
+                 context: Optional[CryptContext] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.context = context or pwd_context
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="auth-hash")
+        return self._pool
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashPoolBusy()
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor(), functools.partial(fn, *args))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(ok, new_hash); new_hash is set when the stored hash used other cost parameters."""
+        ok, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        if new_hash is not None:
+            self.rehashed += 1
+        return ok, new_hash
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self.context.to_dict().get("bcrypt__default_rounds"),
+                "pending": self.pending,
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+            }
+
+hash_pool = HashPool()
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# /register, /verify and /login throughput through the real app and database
+# layer (ASGI in-process, no network). bcrypt is turned down by default so the
+# numbers reflect the DB path; pass --rounds 12 to include production hashing.
+# Emails are only queued: the outbox sender is not started.
+#
+#   python bench_auth_db.py [--users 2000] [--concurrency 1,16,64] [--database-url URL]
+
+def _setup_env(args):
+    os.environ.setdefault("SMTP_USERNAME", "bench")
+    os.environ.setdefault("SMTP_PASSWORD", "bench")
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["AUTH_HASH_MAX_QUEUE"] = str(10 * max(args.concurrency))
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='fieldsense-bench-')}/bench.db"
+
+async def _phase(name, requests, concurrency, expect):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(send):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            r = await send()
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != expect:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(s) for s in requests])
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+
+    def pct(q):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000.0, 2)
+
+    return {
+        "endpoint": name, "concurrency": concurrency, "requests": len(latencies),
+        "req_per_s": round(len(latencies) / elapsed, 1), "p50_ms": pct(0.5), "p95_ms": pct(0.95), "errors": errors,
+    }
+
+async def bench(concurrency_levels, users: int):
+    import httpx
+    from sqlalchemy import select
+    from database import AsyncSessionLocal, init_db, close_db
+    from models import User
+    import main
+
+    await init_db()
+    rows = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for conc in concurrency_levels:
+            emails = [f"c{conc}-u{i}@example.com" for i in range(users)]
+            rows.append(await _phase("/register", [
+                (lambda e=e: c.post("/register", json={
+                    "name": "Bench", "email": e, "mobile": "0", "password": "pw-" + e, "requested_role": "farmer",
+                })) for e in emails
+            ], conc, 200))
+
+            async with AsyncSessionLocal() as db:
+                tokens = (await db.scalars(select(User.verification_token).where(User.email.in_(emails)))).all()
+            rows.append(await _phase("/verify", [
+                (lambda t=t: c.get(f"/verify/{t}")) for t in tokens
+            ], conc, 200))
+
+            rows.append(await _phase("/login", [
+                (lambda e=e: c.post("/login", json={"email": e, "password": "pw-" + e})) for e in emails
+            ], conc, 200))
+    await close_db()
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Auth endpoint throughput against the configured database.")
+    ap.add_argument("--users", type=int, default=2000, help="users registered per concurrency level")
+    ap.add_argument("--concurrency", default="1,16,64")
+    ap.add_argument("--rounds", type=int, default=4, help="bcrypt cost (4 is the minimum)")
+    ap.add_argument("--database-url", default=None, help="default: a fresh SQLite file in a temp dir")
+    args = ap.parse_args(argv)
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    _setup_env(args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    rows = asyncio.run(bench(args.concurrency, args.users))
+    print(json.dumps({"database_url": os.environ["DATABASE_URL"], "rounds": args.rounds, "results": rows}, indent=2))
+
+if __name__ == "__main__":
+    main()
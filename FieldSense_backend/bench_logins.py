@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# auth imports config, which needs SMTP settings; the benchmark never sends mail
+os.environ.setdefault("SMTP_USERNAME", "bench")
+os.environ.setdefault("SMTP_PASSWORD", "bench")
+
+from auth import HashPool, HashPoolBusy, make_context
+
+# Login throughput (bcrypt verify) against hashing pool size. Each client
+# loops over verify_and_update for --seconds; a ticker on the event loop
+# records the worst stall, which should stay near zero since hashing is
+# off-loop. Rejected = 429s the endpoint would have returned.
+#
+#   python bench_logins.py [--rounds 12] [--workers 1,2,4,8] [--clients 32] [--seconds 5]
+
+async def _ticker(stop: asyncio.Event, out: dict, interval: float = 0.01):
+    worst = 0.0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - t0 - interval)
+    out["max_loop_stall_ms"] = round(worst * 1000.0, 1)
+
+async def bench(workers: int, max_queue: int, clients: int, seconds: float, ctx, hashed: str):
+    pool = HashPool(workers, max_queue, ctx)
+    latencies = []
+    rejected = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                await pool.verify_and_update("correct horse", hashed)
+            except HashPoolBusy:
+                rejected += 1
+                await asyncio.sleep(0.05)  # client backs off as on Retry-After
+                continue
+            latencies.append(time.perf_counter() - t0)
+
+    stop, loop_stats = asyncio.Event(), {}
+    ticker = asyncio.create_task(_ticker(stop, loop_stats))
+    t0 = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(clients)])
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await ticker
+    pool.shutdown()
+
+    latencies.sort()
+
+    def pct(q):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000.0, 1)
+
+    return {
+        "workers": workers, "max_queue": max_queue, "clients": clients,
+        "logins_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.5), "p95_ms": pct(0.95),
+        "rejected": rejected, **loop_stats,
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Login (bcrypt verify) throughput vs hashing pool size.")
+    ap.add_argument("--rounds", type=int, default=12)
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--max-queue", type=int, default=16)
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args(argv)
+
+    ctx = make_context(args.rounds)
+    hashed = ctx.hash("correct horse")
+    rows = [
+        asyncio.run(bench(int(w), args.max_queue, args.clients, args.seconds, ctx, hashed))
+        for w in args.workers.split(",")
+    ]
+    print(json.dumps({"rounds": args.rounds, "cpus": os.cpu_count(), "results": rows}, indent=2))
+
+if __name__ == "__main__":
+    main()
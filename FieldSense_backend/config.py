@@ -13,6 +13,22 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USERNAME: str
     SMTP_PASSWORD: str
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT_S: float = 30.0
+
+    # Email outbox: background sender batching, retry backoff, idle disconnect and
+    # how long a claimed row stays with its sender before another may retry it
+    EMAIL_BATCH_SIZE: int = 20
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_S: float = 30.0
+    EMAIL_POLL_S: float = 10.0
+    EMAIL_IDLE_CLOSE_S: float = 60.0
+    EMAIL_LEASE_S: float = 300.0
+
+    # Password hashing: bcrypt cost and the bounded pool it runs on
+    BCRYPT_ROUNDS: int = 12
+    AUTH_HASH_WORKERS: int = 2
+    AUTH_HASH_MAX_QUEUE: int = 16
 
     class Config:
         env_file = ".env"
@@ -24,3 +40,14 @@ SMTP_SERVER = settings.SMTP_SERVER
 SMTP_PORT = settings.SMTP_PORT
 SMTP_USERNAME = settings.SMTP_USERNAME
 SMTP_PASSWORD = settings.SMTP_PASSWORD
+SMTP_STARTTLS = settings.SMTP_STARTTLS
+SMTP_TIMEOUT_S = settings.SMTP_TIMEOUT_S
+EMAIL_BATCH_SIZE = settings.EMAIL_BATCH_SIZE
+EMAIL_MAX_ATTEMPTS = settings.EMAIL_MAX_ATTEMPTS
+EMAIL_RETRY_BASE_S = settings.EMAIL_RETRY_BASE_S
+EMAIL_POLL_S = settings.EMAIL_POLL_S
+EMAIL_IDLE_CLOSE_S = settings.EMAIL_IDLE_CLOSE_S
+EMAIL_LEASE_S = settings.EMAIL_LEASE_S
+BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS
+AUTH_HASH_WORKERS = settings.AUTH_HASH_WORKERS
+AUTH_HASH_MAX_QUEUE = settings.AUTH_HASH_MAX_QUEUE
@@ -1,10 +1,73 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
 
-DATABASE_URL = "sqlite:///./test.db"  # For now, SQLite. Later you can switch to PostgreSQL.
+# SQLite (WAL) by default; set DATABASE_URL=postgresql://... in production
+# (needs asyncpg for the request path and psycopg2 for the background jobs).
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+_SYNC_DRIVERS = {"sqlite": "sqlite", "postgresql": "postgresql"}
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def _url(url: str, drivers):
+    u = make_url(url)
+    backend = u.get_backend_name()
+    u = u.set(drivername=drivers.get(backend, u.drivername))
+    if u.drivername == "postgresql+asyncpg":
+        # asyncpg prepares every statement; keep them per connection
+        u = u.update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE)})
+    return u
+
+def _engine_kwargs(url) -> dict:
+    kw = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_S,
+        "pool_recycle": DB_POOL_RECYCLE_S,
+        "query_cache_size": DB_STATEMENT_CACHE,
+    }
+    if url.get_backend_name() == "sqlite":
+        kw["connect_args"] = {"check_same_thread": False, "cached_statements": DB_STATEMENT_CACHE}
+    else:
+        kw["pool_pre_ping"] = True
+    return kw
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    # WAL lets readers run alongside the single writer; NORMAL sync is safe with WAL
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.close()
+
+_sync_url = _url(DATABASE_URL, _SYNC_DRIVERS)
+_async_url = _url(DATABASE_URL, _ASYNC_DRIVERS)
+
+# Sync engine for background work run in threads (FieldFusion job store, email outbox)
+engine = create_engine(_sync_url, **_engine_kwargs(_sync_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for request handlers
+async_engine = create_async_engine(_async_url, **_engine_kwargs(_async_url))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if _sync_url.get_backend_name() == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+
 Base = declarative_base()
+
+async def init_db():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+async def close_db():
+    await async_engine.dispose()
+    engine.dispose()
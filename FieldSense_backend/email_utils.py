@@ -1,11 +1,32 @@
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 from datetime import datetime
-from config import SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD
-
-def _send_email(to_email: str, subject: str, html_body: str, text_body: str, attachments: list | None = None):
+from functools import lru_cache
+from string import Template
+from typing import Optional
+from config import SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_STARTTLS, SMTP_TIMEOUT_S
+
+# Rendering and SMTP transport. Requests never call these directly: they
+# queue a message in the outbox (outbox.py) and its background sender
+# renders and delivers it over one reused SMTP connection.
+
+@lru_cache(maxsize=None)
+def _read_attachment(path: str) -> bytes:
+    # Only successful reads are cached; a missing file raises and is retried next time
+    with open(path, "rb") as f:
+        return f.read()
+
+def _attachment(path: str) -> Optional[bytes]:
+    try:
+        return _read_attachment(path)
+    except FileNotFoundError:
+        print("⚠️ No attachment found, skipping:", path)
+        return None
+
+def build_message(to_email: str, subject: str, html_body: str, text_body: str, attachments: list | None = None):
     alt = MIMEMultipart("alternative")
     alt["From"] = SMTP_USERNAME
     alt["To"] = to_email
@@ -20,23 +41,75 @@ def _send_email(to_email: str, subject: str, html_body: str, text_body: str, att
             mixed[h] = alt[h]
         mixed.attach(alt)
         for path, filename in attachments:
-            try:
-                with open(path, "rb") as f:
-                    pdf = MIMEApplication(f.read(), _subtype="pdf")
-                    pdf.add_header("Content-Disposition", "attachment", filename=filename)
-                    mixed.attach(pdf)
-            except FileNotFoundError:
-                print("⚠️ No attachment found, skipping:", path)
+            data = _attachment(path)
+            if data is None:
+                continue
+            pdf = MIMEApplication(data, _subtype="pdf")
+            pdf.add_header("Content-Disposition", "attachment", filename=filename)
+            mixed.attach(pdf)
         msg = mixed
-
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.send_message(msg)
-
-def send_verification_email(to_email: str, token: str, role: str, name: str):
+    return msg
+
+class SMTPConnection:
+    """One logged-in SMTP session reused across sends; reconnects when the server drops it."""
+
+    def __init__(self, host: str = SMTP_SERVER, port: int = SMTP_PORT, username: Optional[str] = SMTP_USERNAME,
+                 password: Optional[str] = SMTP_PASSWORD, starttls: bool = SMTP_STARTTLS, timeout: float = SMTP_TIMEOUT_S):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.sent = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connects += 1
+        return smtp
+
+    def send(self, msg):
+        with self._lock:
+            if self._smtp is None:
+                self._smtp = self._connect()
+            try:
+                self._smtp.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # idle connections get closed by the server; retry once on a fresh one
+                self._smtp = self._connect()
+                self._smtp.send_message(msg)
+            self.sent += 1
+
+    def close(self):
+        with self._lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except smtplib.SMTPException:
+                    self._smtp.close()
+                except OSError:
+                    pass
+                self._smtp = None
+
+def render_verification(token: str, role: str, name: str):
     # Include role hint so /verify can theme and route correctly
     verify_url = f"http://localhost:8000/verify/{token}?r={role}"
+    subject, html_body, text_body = _verification_template(role, datetime.now().year)
+    fields = {"name": name, "verify_url": verify_url}
+    return subject, Template(html_body).substitute(fields), Template(text_body).substitute(fields), None
+
+@lru_cache(maxsize=None)
+def _verification_template(role: str, year: int):
+    name, verify_url = "${name}", "${verify_url}"
     if role == "researcher":
         subject = "🔬 Verify your FieldSense researcher account"
         headline = "Welcome, Researcher"
@@ -87,15 +160,23 @@ If this wasn’t requested, ignore this message.
       <p style="color:#8aa79a;font-size:12px;margin-top:12px">The link may expire after 24 hours. If this wasn’t requested, ignore this email.</p>
     </div>
     <div style="background:linear-gradient(180deg,#0f2a21,#0b1f18);padding:16px 20px;text-align:center;border-top:1px solid rgba(255,255,255,.06)">
-      <div style="color:#98b2a6;font-size:12px">© {datetime.now().year} FieldSense • Cultivating the future of farming</div>
+      <div style="color:#98b2a6;font-size:12px">© {year} FieldSense • Cultivating the future of farming</div>
     </div>
   </div>
 </body>
 </html>
 """
-    _send_email(to_email, subject, html_body, text_body)
+    return subject, html_body, text_body
+
+def render_welcome(name: str, role: str):
+    subject, html_body, text_body = _welcome_template(role, datetime.now().year)
+    fields = {"name": name}
+    attachments = [("welcome_guide.pdf", "Welcome_Guide.pdf")]
+    return subject, Template(html_body).substitute(fields), Template(text_body).substitute(fields), attachments
 
-def send_welcome_email(to_email: str, name: str, role: str):
+@lru_cache(maxsize=None)
+def _welcome_template(role: str, year: int):
+    name = "${name}"
     if role == "researcher":
         subject = "🔬 Welcome to FieldSense Research — accelerate insights"
         cta_url = "http://localhost:3000/dashboard/researchdash"
@@ -156,11 +237,12 @@ Reply if any help is needed — the team reads every message.
       <p style="color:#8aa79a;font-size:12px;text-align:center">Need a hand? Reply to this email — real humans respond.</p>
     </div>
     <div style="background:linear-gradient(180deg,#0f2a21,#0b1f18);padding:18px 20px;text-align:center;border-top:1px solid rgba(255,255,255,.06)">
-      <div style="color:#98b2a6;font-size:12px">© {datetime.now().year} FieldSense • Cultivating the future of farming</div>
+      <div style="color:#98b2a6;font-size:12px">© {year} FieldSense • Cultivating the future of farming</div>
     </div>
   </div>
 </body>
 </html>
 """
-    attachments = [("welcome_guide.pdf", "Welcome_Guide.pdf")]
-    _send_email(to_email, subject, html_body, text_body, attachments=attachments)
+    return subject, html_body, text_body
+
+RENDERERS = {"verification": render_verification, "welcome": render_welcome}
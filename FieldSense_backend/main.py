@@ -1,17 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, Request
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base
-from models import User
+from fastapi.responses import HTMLResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, async_engine, init_db, close_db
+from models import ROLES, User, select_users
+from migrate_roles import unmigrated
 from schemas import UserCreate, UserOut
-from auth import hash_password, create_verification_token, verify_password
-from email_utils import send_verification_email, send_welcome_email
+from auth import hash_pool, HashPoolBusy, create_verification_token
+from outbox import outbox
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 
 from FieldFusion.app.router import router as fusion_router
+from FieldFusion.core.http import providers
+from FieldFusion.core.executor import shutdown_cpu_pool
+from FieldFusion.core import metrics
+from FieldFusion.providers.weather_cache import power_cache
+from FieldFusion.pipeline.jobs import job_queue
+from FieldFusion.models.pest_classifier import pest_classifier
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # FieldFusion provider clients live for the whole app so connections are reused
+    await init_db()
+    async with async_engine.connect() as conn:
+        # Check only: every worker runs this, and the backfill belongs to migrate_roles.py
+        if await conn.run_sync(unmigrated):
+            print("⚠️ Some users have no user_roles rows (role listings miss them); run `python migrate_roles.py`")
+    await providers.open()
+    pest_classifier().load()
+    await job_queue().start()
+    await outbox().start()
+    try:
+        yield
+    finally:
+        await outbox().stop()
+        await job_queue().stop()
+        await providers.aclose()
+        power_cache.close()
+        shutdown_cpu_pool()
+        hash_pool.shutdown()
+        await close_db()
 
-app = FastAPI(title="FieldSense API") 
+app = FastAPI(title="FieldSense API", lifespan=lifespan)
 
 # CORS
 import os
@@ -36,53 +67,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# DB init
-Base.metadata.create_all(bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def _user(db: AsyncSession, *where):
+    # User and roles in one query
+    return (await db.scalars(select_users().where(*where))).unique().first()
+
+def _hash_busy():
+    return HTTPException(status_code=429, detail="Too many sign-in requests, retry shortly", headers={"Retry-After": "1"})
 
 # Health
 @app.get("/health")
 def health():
     return {"ok": True}
 
+# Prometheus scrape target (FieldFusion stages, upstreams, caches, fallbacks)
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/auth/stats")
+def auth_stats():
+    return {"hash_pool": hash_pool.stats()}
+
+@app.get("/email/stats")
+def email_stats():
+    return {"outbox": outbox().stats()}
+
 # --------------------
 # Register (multi-role)
 # --------------------
 @app.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     requested = (user.requested_role or "farmer").lower()
-    if requested not in ("farmer", "researcher"):
+    if requested not in ROLES:
         raise HTTPException(status_code=400, detail="Invalid role")
 
-    existing = db.query(User).filter(User.email == user.email).first()
+    existing = await _user(db, User.email == user.email)
     if existing:
-        current_roles = [r.strip() for r in (existing.roles or "").split(",") if r.strip()]
-        if requested in current_roles:
+        if not existing.add_role(requested):
             return existing
 
-        current_roles.append(requested)
-        existing.roles = ",".join(sorted(set(current_roles)))
         token = create_verification_token()
         existing.verification_token = token
-        db.commit()
-        try:
-            send_verification_email(
-                to_email=existing.email,
-                token=token,
-                role=requested,
-                name=existing.name,
-            )
-        except Exception as e:
-            print(f"Email send error (append role): {e}")
+        outbox().enqueue(db, "verification", existing.email, token=token, role=requested, name=existing.name)
+        await db.commit()
         return existing
 
-    hashed_pw = hash_password(user.password)
+    try:
+        hashed_pw = await hash_pool.hash(user.password)
+    except HashPoolBusy:
+        raise _hash_busy()
     token = create_verification_token()
     db_user = User(
         name=user.name,
@@ -90,17 +127,11 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         mobile=user.mobile,
         hashed_password=hashed_pw,
         verification_token=token,
-        roles=requested,
     )
+    db_user.add_role(requested)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    try:
-        send_verification_email(to_email=user.email, token=token, role=requested, name=user.name)
-    except Exception as e:
-        print(f"Email send error: {e}")
-
+    outbox().enqueue(db, "verification", user.email, token=token, role=requested, name=user.name)
+    await db.commit()
     return db_user
 
 # --------------------
@@ -111,10 +142,20 @@ class LoginInput(BaseModel):
     password: str
 
 @app.post("/login")
-def login(payload: LoginInput, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.hashed_password):
+async def login(payload: LoginInput, db: AsyncSession = Depends(get_db)):
+    user = await _user(db, User.email == payload.email)
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    try:
+        ok, new_hash = await hash_pool.verify_and_update(payload.password, user.hashed_password)
+    except HashPoolBusy:
+        raise _hash_busy()
+    if not ok:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        # Stored with older cost parameters; upgrade while we have the plaintext
+        user.hashed_password = new_hash
+        await db.commit()
     if not user.is_verified:
         raise HTTPException(status_code=403, detail="Email not verified")
     return {"message": "login successful", "name": user.name, "email": user.email, "roles": user.roles}
@@ -126,28 +167,25 @@ class ResendInput(BaseModel):
     email: EmailStr
 
 @app.post("/resend-verification")
-def resend_verification(payload: ResendInput, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
+async def resend_verification(payload: ResendInput, db: AsyncSession = Depends(get_db)):
+    user = await _user(db, User.email == payload.email)
     if not user:
         raise HTTPException(status_code=400, detail="User not found")
     if user.is_verified:
         raise HTTPException(status_code=400, detail="Already verified")
     token = create_verification_token()
     user.verification_token = token
-    db.commit()
-    first_role = (user.roles or "farmer").split(",")[0].strip() or "farmer"
-    try:
-        send_verification_email(to_email=user.email, token=token, role=first_role, name=user.name)
-    except Exception as e:
-        print(f"Resend email error: {e}")
+    first_role = user.role_names[0] if user.role_names else "farmer"
+    outbox().enqueue(db, "verification", user.email, token=token, role=first_role, name=user.name)
+    await db.commit()
     return {"message": "Verification email resent"}
 
 # --------------------
 # Verify (role hint via ?r=)
 # --------------------
 @app.get("/verify/{token}", response_class=HTMLResponse)
-def verify_email(token: str, request: Request, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.verification_token == token).first()
+async def verify_email(token: str, request: Request, db: AsyncSession = Depends(get_db)):
+    user = await _user(db, User.verification_token == token)
     if not user:
         return HTMLResponse(
             content="<h2 style='color:red;text-align:center;margin-top:20%'>Invalid or expired verification link.</h2>",
@@ -156,16 +194,13 @@ def verify_email(token: str, request: Request, db: Session = Depends(get_db)):
 
     user.is_verified = True
     user.verification_token = None
-    db.commit()
 
-    roles_list = [r.strip() for r in (user.roles or "").split(",") if r.strip()]
+    roles_list = user.role_names
     hint = (request.query_params.get("r") or "").lower()
     effective_role = hint if hint in roles_list else (roles_list[0] if roles_list else "farmer")
 
-    try:
-        send_welcome_email(to_email=user.email, name=user.name, role=effective_role)
-    except Exception as e:
-        print(f"Welcome email send error: {e}")
+    outbox().enqueue(db, "welcome", user.email, name=user.name, role=effective_role)
+    await db.commit()
 
     # Build redirect target based on provided origin (supports mobile LAN testing)
     base_frontend = FRONTEND_ORIGIN or f"http://{LAN_IP}:3000"
@@ -0,0 +1,68 @@
+import argparse
+import json
+from sqlalchemy import exists, insert, select
+from database import engine
+from models import User, UserRole, legacy_role_names
+
+# Copies the legacy users.roles CSV into user_roles in keyset-paginated
+# batches. Idempotent: only users without any user_roles row are read, and
+# rows another run already wrote are skipped, so concurrent runs are safe.
+# The app only checks at startup (unmigrated()) and leaves the backfill to
+# this script, so a large table never holds up a worker.
+#
+#   python migrate_roles.py [--batch-size 1000] [--dry-run]
+
+def _pending(users, links):
+    return ~exists().where(links.c.user_id == users.c.id)
+
+def _insert_ignore(conn, table):
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing()
+    return insert(table).prefix_with("OR IGNORE", dialect="sqlite")
+
+def unmigrated(conn) -> bool:
+    """True if any user has no user_roles row yet (one indexed probe, stops at the first)."""
+    users, links = User.__table__, UserRole.__table__
+    return conn.execute(select(users.c.id).where(_pending(users, links)).limit(1)).first() is not None
+
+def migrate_roles(conn, batch_size: int = 1000, dry_run: bool = False, commit_each_batch: bool = False) -> dict:
+    users, links = User.__table__, UserRole.__table__
+    links.create(conn, checkfirst=True)
+    pending = (
+        select(users.c.id, users.c.roles)
+        .where(_pending(users, links))
+        .order_by(users.c.id)
+        .limit(batch_size)
+    )
+    counts = {"users": 0, "roles": 0}
+    last_id = None
+    while True:
+        q = pending if last_id is None else pending.where(users.c.id > last_id)
+        rows = conn.execute(q).all()
+        if not rows:
+            break
+        batch = []
+        for user_id, csv in rows:
+            batch.extend({"user_id": user_id, "role": r} for r in legacy_role_names(csv))
+        if not dry_run:
+            conn.execute(_insert_ignore(conn, links), batch)
+            if commit_each_batch:
+                conn.commit()
+        counts["users"] += len(rows)
+        counts["roles"] += len(batch)
+        last_id = rows[-1][0]
+    return counts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Move users.roles CSV values into the user_roles table.")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--dry-run", action="store_true", help="count what would be migrated without writing")
+    args = ap.parse_args(argv)
+    with engine.connect() as conn:
+        counts = migrate_roles(conn, args.batch_size, args.dry_run, commit_each_batch=True)
+        conn.commit()
+    print(json.dumps({"dry_run": args.dry_run, **counts}))
+
+if __name__ == "__main__":
+    main()
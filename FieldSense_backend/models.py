@@ -1,6 +1,22 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Boolean, select
+from sqlalchemy.orm import joinedload, relationship
 from database import Base
 
+ROLES = ("farmer", "researcher")
+
+def legacy_role_names(csv) -> list:
+    # users.roles CSV -> sorted role names; users from before roles existed are farmers
+    return sorted({r.strip().lower() for r in (csv or "").split(",") if r.strip()}) or ["farmer"]
+
+class UserRole(Base):
+    __tablename__ = "user_roles"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    role = Column(String, primary_key=True)
+
+    # "all researchers" listings walk this index instead of scanning users
+    __table_args__ = (Index("ix_user_roles_role_user", "role", "user_id"),)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -10,7 +26,47 @@ class User(Base):
     mobile = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_verified = Column(Boolean, default=False)
-    verification_token = Column(String, unique=True, nullable=True)
+    verification_token = Column(String, unique=True, index=True, nullable=True)
+
+    # Roles live in user_roles; the old CSV column is kept as a mirror so
+    # earlier builds (and migrate_roles.py) can still read it, and is read
+    # here only for users the migration hasn't reached yet.
+    legacy_roles = Column("roles", String, nullable=False, default="")
+    role_links = relationship(
+        UserRole, lazy="raise", cascade="all, delete-orphan", passive_deletes=True, order_by=UserRole.role,
+    )
+
+    @property
+    def role_names(self) -> list:
+        if not self.role_links and self.id is not None:
+            # Not migrated yet (migrate_roles.py): read the CSV it would copy
+            return legacy_role_names(self.legacy_roles)
+        return [link.role for link in self.role_links]
+
+    @property
+    def roles(self) -> str:
+        # CSV for the API, as before
+        return ",".join(self.role_names)
+
+    def add_role(self, role: str) -> bool:
+        names = self.role_names
+        if role in names:
+            return False
+        if not self.role_links:
+            # Copy an unmigrated user's CSV roles first so the new row doesn't replace them
+            self.role_links.extend(UserRole(role=r) for r in names)
+        self.role_links.append(UserRole(role=role))
+        self.role_links.sort(key=lambda link: link.role)
+        self.legacy_roles = self.roles
+        return True
+
+def select_users():
+    """User rows with their roles in one joined query (call .unique() on the result)."""
+    return select(User).options(joinedload(User.role_links))
 
-    # New: roles as a CSV string, e.g., "farmer" or "farmer,researcher"
-    roles = Column(String, nullable=False, default="farmer")
+def select_users_with_role(role: str):
+    return (
+        select_users()
+        .where(User.id.in_(select(UserRole.user_id).where(UserRole.role == role)))
+        .order_by(User.id)
+    )
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import smtplib
+import time
+from typing import Optional
+from sqlalchemy import Column, Float, Index, Integer, String, Text, event, func, select, update
+from database import Base, SessionLocal
+from config import EMAIL_BATCH_SIZE, EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BASE_S, EMAIL_POLL_S, EMAIL_IDLE_CLOSE_S, EMAIL_LEASE_S
+from email_utils import RENDERERS, SMTPConnection, build_message
+
+# Transactional email outbox. Handlers add a row to their own session, so the
+# message is committed (or rolled back) together with the user change and
+# the response never waits on SMTP. One background task per process drains
+# due rows in batches over a single reused SMTP connection, retrying with
+# exponential backoff. Every worker runs a sender, so each row is claimed
+# with a conditional UPDATE before it is sent; a claim is a lease, and a row
+# whose sender died mid-send becomes due again once the lease runs out.
+
+class OutboxMessage(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    to_email = Column(String, nullable=False)
+    params = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending | sending | sent | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(Float, nullable=False)
+    next_attempt_at = Column(Float, nullable=False)  # while sending: when the lease runs out
+    sent_at = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (Index("ix_email_outbox_due", "status", "next_attempt_at"),)
+
+def _due(now: float):
+    # Pending and past its backoff, or claimed by a sender whose lease has run out
+    return OutboxMessage.status.in_(("pending", "sending")) & (OutboxMessage.next_attempt_at <= now)
+
+class Outbox:
+    def __init__(self, session_factory=SessionLocal, connection: Optional[SMTPConnection] = None,
+                 batch_size: int = EMAIL_BATCH_SIZE, max_attempts: int = EMAIL_MAX_ATTEMPTS,
+                 retry_base_s: float = EMAIL_RETRY_BASE_S, poll_s: float = EMAIL_POLL_S,
+                 idle_close_s: float = EMAIL_IDLE_CLOSE_S, lease_s: float = EMAIL_LEASE_S, clock=time.time):
+        self._session = session_factory
+        self.connection = connection or SMTPConnection()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_s = retry_base_s
+        self.poll_s = poll_s
+        self.idle_close_s = idle_close_s
+        self.lease_s = lease_s
+        self._clock = clock
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_send = 0.0
+
+    def ensure_table(self):
+        OutboxMessage.__table__.create(self._session.kw["bind"], checkfirst=True)
+
+    def enqueue(self, db, kind: str, to_email: str, **params):
+        """Queue a message in the caller's session; the sender is woken once it commits."""
+        if kind not in RENDERERS:
+            raise ValueError(f"unknown email kind: {kind}")
+        now = self._clock()
+        db.add(OutboxMessage(kind=kind, to_email=to_email, params=json.dumps(params),
+                             status="pending", attempts=0, created_at=now, next_attempt_at=now))
+        # AsyncSession proxies a sync Session, which is where the events fire
+        event.listen(getattr(db, "sync_session", db), "after_commit", lambda _s: self.wake(), once=True)
+
+    def wake(self):
+        # Called from request threads as well as the loop
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        await asyncio.to_thread(self.ensure_table)
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = self._wake = None
+        await asyncio.to_thread(self.connection.close)
+
+    async def _run(self):
+        while True:
+            try:
+                n = await asyncio.to_thread(self.drain)
+            except Exception as e:
+                print(f"Email outbox error: {e}")
+                n = 0
+            if n >= self.batch_size:
+                continue  # more may be due
+            if self._clock() - self._last_send > self.idle_close_s:
+                await asyncio.to_thread(self.connection.close)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def drain(self) -> int:
+        """Send up to batch_size due messages; blocking, returns how many were attempted."""
+        now = self._clock()
+        with self._session() as db:
+            rows = db.scalars(
+                select(OutboxMessage)
+                .where(_due(now))
+                .order_by(OutboxMessage.id)
+                .limit(self.batch_size)
+            ).all()
+            for i, row in enumerate(rows):
+                if not self._claim(db, row, now):
+                    continue  # another worker's sender got there first
+                ok = self._deliver(row, now)
+                db.commit()
+                if not ok:
+                    # Server-side trouble: leave the rest for the next round
+                    return i + 1
+            return len(rows)
+
+    def _claim(self, db, row: OutboxMessage, now: float) -> bool:
+        # Still due when the UPDATE runs: a sender that claimed it first has pushed next_attempt_at out
+        claimed = db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == row.id, _due(now))
+            .values(status="sending", next_attempt_at=now + self.lease_s)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        db.commit()
+        return claimed
+
+    def _deliver(self, row: OutboxMessage, now: float) -> bool:
+        row.attempts += 1
+        try:
+            subject, html_body, text_body, attachments = RENDERERS[row.kind](**json.loads(row.params))
+            self.connection.send(build_message(row.to_email, subject, html_body, text_body, attachments))
+        except smtplib.SMTPRecipientsRefused as e:
+            # Permanent for this address; the connection itself is fine
+            row.status, row.last_error = "failed", str(e)[:500]
+            return True
+        except Exception as e:
+            self.connection.close()
+            row.last_error = str(e)[:500]
+            if row.attempts >= self.max_attempts:
+                row.status = "failed"
+            else:
+                row.status = "pending"
+                row.next_attempt_at = now + self.retry_base_s * 2 ** (row.attempts - 1)
+            return False
+        row.status, row.sent_at, row.last_error = "sent", now, None
+        self._last_send = now
+        return True
+
+    def stats(self):
+        with self._session() as db:
+            counts = dict(db.execute(select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)).all())
+        return {
+            "pending": counts.get("pending", 0),
+            "sending": counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "smtp_connects": self.connection.connects,
+            "smtp_sent": self.connection.sent,
+        }
+
+_outbox: Optional[Outbox] = None
+
+def outbox() -> Outbox:
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox()
+    return _outbox
+
+def set_outbox(box: Optional[Outbox]):
+    global _outbox
+    _outbox = box
@@ -0,0 +1,125 @@
+# Backend (auth/email) tests: `python -m pytest -q tests` from FieldSense_backend
+import base64
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+from email import message_from_bytes
+from pathlib import Path
+
+backend_root = Path(__file__).resolve().parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+# config.py requires SMTP credentials; tests never reach a real server
+os.environ.setdefault("SMTP_USERNAME", "tests@fieldsense.local")
+os.environ.setdefault("SMTP_PASSWORD", "secret")
+# keep the app off the checked-in test.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='fieldsense-tests-')}/app.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: EHLO with AUTH PLAIN, MAIL/RCPT/DATA, RSET, NOOP, QUIT
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        rcpt, data = [], None
+        self.reply("220 stub ESMTP")
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            if data is not None:
+                if line == ".":
+                    server.messages.append((rcpt, message_from_bytes("\r\n".join(data).encode())))
+                    rcpt, data = [], None
+                    self.reply("250 queued")
+                else:
+                    data.append(line[1:] if line.startswith("..") else line)
+                continue
+            cmd = line[:4].upper()
+            if cmd == "EHLO":
+                self.reply("250-stub")
+                self.reply("250 AUTH PLAIN")
+            elif cmd == "HELO":
+                self.reply("250 stub")
+            elif cmd == "AUTH":
+                _, user, _ = base64.b64decode(line.split()[-1]).split(b"\0")
+                server.logins.append(user.decode())
+                self.reply("235 ok")
+            elif cmd == "MAIL":
+                if server.fail_next > 0:
+                    server.fail_next -= 1
+                    self.reply("421 try again later")
+                    return
+                self.reply("250 ok")
+            elif cmd == "RCPT":
+                addr = line.split(":", 1)[1].strip().strip("<>")
+                if addr in server.reject:
+                    self.reply("550 no such user")
+                else:
+                    rcpt.append(addr)
+                    self.reply("250 ok")
+            elif cmd == "DATA":
+                data = []
+                self.reply("354 go ahead")
+            elif cmd in ("RSET", "NOOP"):
+                rcpt = []
+                self.reply("250 ok")
+            elif cmd == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class _SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.logins = []
+        self.reject = set()
+        self.fail_next = 0
+
+
+@pytest.fixture
+def smtp_server():
+    server = _SMTPStub()
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app_client():
+    # Factory: an httpx client talking to the FastAPI app in-process
+    import httpx
+    import main
+
+    def make():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://t")
+    return make
+
+
+@pytest.fixture
+def load_user():
+    # Async lookup of a stored User by email (roles not loaded)
+    from sqlalchemy import select
+    from database import AsyncSessionLocal
+    from models import User
+
+    async def load(email):
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(User).where(User.email == email))
+    return load
@@ -0,0 +1,24 @@
+import asyncio
+
+from database import init_db
+
+
+def test_register_verify_login_flow(app_client, load_user):
+    async def run():
+        await init_db()
+        async with app_client() as c:
+            r = await c.post("/register", json={
+                "name": "Ada", "email": "ada@example.com", "mobile": "1", "password": "pw", "requested_role": "farmer",
+            })
+            assert r.status_code == 200 and r.json()["is_verified"] is False
+            assert (await c.post("/login", json={"email": "ada@example.com", "password": "pw"})).status_code == 403
+
+            token = (await load_user("ada@example.com")).verification_token
+            assert (await c.get(f"/verify/{token}?r=farmer")).status_code == 200
+            assert (await c.get(f"/verify/{token}")).status_code == 400
+
+            assert (await c.post("/login", json={"email": "ada@example.com", "password": "nope"})).status_code == 400
+            r = await c.post("/login", json={"email": "ada@example.com", "password": "pw"})
+            assert r.status_code == 200 and r.json()["roles"] == "farmer"
+
+    asyncio.run(run())
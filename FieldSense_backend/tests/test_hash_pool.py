@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+import main
+from auth import HashPool, HashPoolBusy, make_context
+from database import AsyncSessionLocal, init_db
+from models import User
+
+
+def test_pool_hashes_off_the_loop_and_upgrades_old_costs():
+    pool = HashPool(workers=2, max_queue=0, context=make_context(4))
+
+    async def run():
+        assert (await pool._run(lambda: threading.current_thread().name)).startswith("auth-hash")
+        hashed = await pool.hash("pw")
+        assert await pool.verify_and_update("pw", hashed) == (True, None)
+        assert (await pool.verify_and_update("nope", hashed))[0] is False
+        ok, upgraded = await pool.verify_and_update("pw", make_context(5).hash("pw"))
+        assert ok and upgraded.startswith("$2b$04$")
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert stats["rehashed"] == 1 and stats["completed"] == 5 and stats["pending"] == 0
+
+
+def test_pool_rejects_past_workers_plus_queue():
+    release = threading.Event()
+    ctx = type("Ctx", (), {"hash": staticmethod(lambda pw: release.wait(5) and "h"),
+                           "to_dict": staticmethod(lambda: {})})()
+    pool = HashPool(workers=1, max_queue=1, context=ctx)
+
+    async def run():
+        running = [asyncio.ensure_future(pool.hash("pw")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HashPoolBusy):
+            await pool.hash("pw")
+        release.set()
+        assert await asyncio.gather(*running) == ["h", "h"]
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["rejected"] == 1 and pool.stats()["peak_pending"] == 2
+
+
+def test_login_rehashes_when_cost_changes(app_client, load_user):
+    async def run():
+        await init_db()
+        async with AsyncSessionLocal() as db:
+            user = User(name="B", email="b@example.com", mobile="1", is_verified=True,
+                        hashed_password=make_context(5).hash("pw"))
+            user.add_role("farmer")
+            db.add(user)
+            await db.commit()
+        async with app_client() as c:
+            assert (await c.post("/login", json={"email": "b@example.com", "password": "pw"})).status_code == 200
+        assert (await load_user("b@example.com")).hashed_password.startswith("$2b$04$")
+
+    asyncio.run(run())
+
+
+def test_saturated_hash_pool_returns_429(monkeypatch, app_client):
+    pool = HashPool(workers=1, max_queue=0, context=make_context(4))
+    monkeypatch.setattr(main, "hash_pool", pool)
+
+    async def run():
+        await init_db()
+        async with app_client() as c:
+            rs = await asyncio.gather(*[
+                c.post("/register", json={
+                    "name": "C", "email": f"c{i}@example.com", "mobile": "1", "password": "pw", "requested_role": "farmer",
+                }) for i in range(6)
+            ])
+        codes = sorted(r.status_code for r in rs)
+        assert 200 in codes and 429 in codes
+        assert next(r for r in rs if r.status_code == 429).headers["Retry-After"] == "1"
+        assert pool.stats()["rejected"] == codes.count(429)
+
+    asyncio.run(run())
+    pool.shutdown()
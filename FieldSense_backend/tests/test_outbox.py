@@ -0,0 +1,149 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import email_utils
+from email_utils import SMTPConnection
+from outbox import Outbox, OutboxMessage
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def _outbox(tmp_path, smtp_server, **kw):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    session = sessionmaker(bind=engine)
+    conn = SMTPConnection("127.0.0.1", smtp_server.server_address[1], "sender@fieldsense.local", "pw", starttls=False, timeout=5)
+    box = Outbox(session_factory=session, connection=conn, clock=kw.pop("clock", _Clock()), **kw)
+    box.ensure_table()
+    return box, session
+
+
+def _enqueue(box, session, *items):
+    with session() as db:
+        for kind, to, params in items:
+            box.enqueue(db, kind, to, **params)
+        db.commit()
+
+
+def _statuses(session):
+    with session() as db:
+        return [(m.to_email, m.status, m.attempts) for m in db.query(OutboxMessage).order_by(OutboxMessage.id)]
+
+
+def test_batch_reuses_one_connection(tmp_path, smtp_server):
+    box, session = _outbox(tmp_path, smtp_server, batch_size=10)
+    _enqueue(box, session, *[
+        ("verification", f"u{i}@x.io", {"token": f"t{i}", "role": "farmer", "name": f"User {i}"}) for i in range(5)
+    ])
+
+    assert box.drain() == 5
+    assert smtp_server.connections == 1
+    assert smtp_server.logins == ["sender@fieldsense.local"]
+    assert [rcpt for rcpt, _ in smtp_server.messages] == [[f"u{i}@x.io"] for i in range(5)]
+    body = smtp_server.messages[2][1].get_payload()[0].get_payload(decode=True).decode()
+    assert "Hi User 2" in body and "/verify/t2?r=farmer" in body
+    assert all(s == "sent" for _, s, _ in _statuses(session))
+    assert box.stats()["sent"] == 5
+    box.connection.close()
+
+
+def test_retry_with_backoff_then_permanent_failures(tmp_path, smtp_server):
+    clock = _Clock()
+    box, session = _outbox(tmp_path, smtp_server, clock=clock, retry_base_s=30.0, max_attempts=3)
+    smtp_server.reject.add("gone@x.io")
+    smtp_server.fail_next = 1
+    _enqueue(box, session,
+             ("welcome", "a@x.io", {"name": "A", "role": "farmer"}),
+             ("welcome", "gone@x.io", {"name": "G", "role": "researcher"}))
+
+    # 421 on the first message stops the batch; nothing else is attempted yet
+    assert box.drain() == 1
+    assert _statuses(session) == [("a@x.io", "pending", 1), ("gone@x.io", "pending", 0)]
+
+    # second message was never tried, so it is still due; the first waits out its backoff
+    box.drain()
+    assert _statuses(session)[1] == ("gone@x.io", "failed", 1)
+    clock.t += 30.0
+    box.drain()
+    assert _statuses(session)[0] == ("a@x.io", "sent", 2)
+    assert [rcpt for rcpt, _ in smtp_server.messages] == [["a@x.io"]]
+    box.connection.close()
+
+
+def test_rollback_drops_message_and_commit_wakes_sender(tmp_path, smtp_server):
+    box, session = _outbox(tmp_path, smtp_server, poll_s=60.0)
+
+    async def main():
+        await box.start()
+        with session() as db:
+            box.enqueue(db, "welcome", "nope@x.io", name="N", role="farmer")
+            db.rollback()
+        _enqueue(box, session, ("welcome", "yes@x.io", {"name": "Y", "role": "farmer"}))
+        for _ in range(100):
+            if smtp_server.messages:
+                break
+            await asyncio.sleep(0.02)
+        await box.stop()
+
+    asyncio.run(main())
+    assert [rcpt for rcpt, _ in smtp_server.messages] == [["yes@x.io"]]
+    assert _statuses(session) == [("yes@x.io", "sent", 1)]
+
+
+def test_two_senders_send_each_message_once(tmp_path, smtp_server):
+    clock = _Clock()
+    a, session = _outbox(tmp_path, smtp_server, clock=clock, lease_s=300.0)
+    b, _ = _outbox(tmp_path, smtp_server, clock=clock, lease_s=300.0)
+    _enqueue(a, session, *[("welcome", f"u{i}@x.io", {"name": f"U{i}", "role": "farmer"}) for i in range(5)])
+
+    # Worker B drains while worker A is mid-way through sending its first row
+    send = a.connection.send
+
+    def racing_send(msg):
+        if not smtp_server.messages:
+            b.drain()
+        return send(msg)
+
+    a.connection.send = racing_send
+    a.drain()
+    assert sorted(rcpt[0] for rcpt, _ in smtp_server.messages) == [f"u{i}@x.io" for i in range(5)]
+    assert all(s == "sent" for _, s, _ in _statuses(session))
+
+    # A sender that died after claiming a row: it is retried once the lease runs out
+    _enqueue(a, session, ("welcome", "late@x.io", {"name": "L", "role": "farmer"}))
+    with session() as db:
+        row = db.query(OutboxMessage).filter_by(to_email="late@x.io").one()
+        assert b._claim(db, row, clock.t)
+    assert a.drain() == 0
+    clock.t += 300.0
+    assert a.drain() == 1
+    assert _statuses(session)[-1] == ("late@x.io", "sent", 1)
+    a.connection.close()
+    b.connection.close()
+
+
+def test_templates_and_attachment_are_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    email_utils._read_attachment.cache_clear()
+    email_utils._welcome_template.cache_clear()
+
+    # A missing guide is skipped but not remembered: once it exists it is attached
+    subject, html, text, attachments = email_utils.render_welcome("A", "farmer")
+    assert len(email_utils.build_message("x@x.io", subject, html, text, attachments).get_payload()) == 1
+    (tmp_path / "welcome_guide.pdf").write_bytes(b"%PDF-1.4 guide")
+
+    for name in ("A", "B", "C"):
+        subject, html, text, attachments = email_utils.render_welcome(name, "farmer")
+        msg = email_utils.build_message("x@x.io", subject, html, text, attachments)
+    assert "Welcome to FieldSense, C!" in html
+    assert msg.get_payload()[1].get_payload(decode=True) == b"%PDF-1.4 guide"
+    assert email_utils._welcome_template.cache_info().misses == 1
+    assert email_utils._read_attachment.cache_info().currsize == 1
+    email_utils._read_attachment.cache_clear()
@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import Session
+
+import main
+from database import engine, init_db
+from migrate_roles import migrate_roles, unmigrated
+from models import User, UserRole, select_users, select_users_with_role
+
+
+def test_migrate_roles_copies_csv_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    User.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"name": "A", "email": "a@x.io", "mobile": "1", "hashed_password": "h", "roles": "farmer"},
+            {"name": "B", "email": "b@x.io", "mobile": "1", "hashed_password": "h", "roles": " researcher,farmer "},
+            {"name": "C", "email": "c@x.io", "mobile": "1", "hashed_password": "h", "roles": ""},
+        ])
+
+    with engine.begin() as conn:
+        assert migrate_roles(conn, batch_size=2, dry_run=True) == {"users": 3, "roles": 4}
+        assert unmigrated(conn)
+    with engine.begin() as conn:
+        assert migrate_roles(conn, batch_size=2) == {"users": 3, "roles": 4}
+    with engine.begin() as conn:
+        assert migrate_roles(conn, batch_size=2) == {"users": 0, "roles": 0}
+        assert not unmigrated(conn)
+
+    with Session(engine) as db:
+        users = db.scalars(select_users().order_by(User.id)).unique().all()
+        assert [u.roles for u in users] == ["farmer", "farmer,researcher", "farmer"]
+        assert [u.email for u in db.scalars(select_users_with_role("researcher")).unique()] == ["b@x.io"]
+
+
+def test_concurrent_migrations_skip_rows_already_written(tmp_path):
+    # Two workers read the same pending users; the one that writes second must not fail
+    engine = create_engine(f"sqlite:///{tmp_path / 'race.db'}")
+    User.__table__.create(engine)
+    UserRole.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"name": "A", "email": "a@x.io", "mobile": "1", "hashed_password": "h", "roles": "farmer"}])
+    raced = []
+
+    def race(conn, cursor, statement, *a):
+        if statement.startswith("SELECT users.id") and not raced:
+            raced.append(statement)
+            # the other worker's insert lands between our read and our write
+            cursor.connection.execute("INSERT INTO user_roles (user_id, role) VALUES (1, 'farmer')")
+
+    with engine.connect() as conn:
+        event.listen(conn, "after_cursor_execute", race)
+        assert migrate_roles(conn) == {"users": 1, "roles": 1}
+        event.remove(conn, "after_cursor_execute", race)
+        conn.commit()
+    with engine.connect() as conn:
+        assert conn.execute(select(UserRole.__table__)).all() == [(1, "farmer")]
+
+
+def test_role_listing_is_one_indexed_query(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    User.metadata.create_all(engine, tables=[User.__table__, UserRole.__table__])
+    with Session(engine) as db:
+        for i in range(20):
+            u = User(name=f"U{i}", email=f"u{i}@x.io", mobile="1", hashed_password="h")
+            u.add_role("farmer")
+            if i % 4 == 0:
+                u.add_role("researcher")
+            db.add(u)
+        db.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    with Session(engine) as db:
+        researchers = db.scalars(select_users_with_role("researcher")).unique().all()
+        assert [u.roles for u in researchers] == ["farmer,researcher"] * 5
+    assert len(statements) == 1
+
+    with engine.connect() as conn:
+        sql = str(select_users_with_role("researcher").compile(engine, compile_kwargs={"literal_binds": True}))
+        plan = " ".join(str(r) for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+    assert "ix_user_roles_role_user (role=?)" in plan and "SCAN users" not in plan
+
+
+def test_register_second_role_appends_in_user_roles():
+    async def run():
+        await init_db()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://t") as c:
+            body = {"name": "D", "email": "dual@example.com", "mobile": "1", "password": "pw", "requested_role": "researcher"}
+            assert (await c.post("/register", json=body)).json()["roles"] == "researcher"
+            r = await c.post("/register", json={**body, "requested_role": "farmer"})
+            assert r.json()["roles"] == "farmer,researcher"
+            assert (await c.post("/register", json=body)).json()["roles"] == "farmer,researcher"
+            assert (await c.post("/register", json={**body, "requested_role": "admin"})).status_code == 400
+
+    asyncio.run(run())
+
+
+def test_register_keeps_unmigrated_users_csv_roles():
+    legacy = {"name": "L", "mobile": "1", "hashed_password": "h"}
+
+    async def run():
+        await init_db()
+        with engine.begin() as conn:
+            conn.execute(insert(User.__table__), [
+                {**legacy, "email": "both@legacy.io", "roles": "farmer,researcher"},
+                {**legacy, "email": "farmer@legacy.io", "roles": "farmer"},
+            ])
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://t") as c:
+            body = {"name": "L", "mobile": "1", "password": "pw", "requested_role": "farmer"}
+            r = await c.post("/register", json={**body, "email": "both@legacy.io"})
+            assert r.json()["roles"] == "farmer,researcher"
+            r = await c.post("/register", json={**body, "email": "farmer@legacy.io", "requested_role": "researcher"})
+            assert r.json()["roles"] == "farmer,researcher"
+
+    asyncio.run(run())
+    with Session(engine) as db:
+        users = {u.email: u for u in db.scalars(select_users().where(User.email.like("%@legacy.io"))).unique()}
+        assert users["both@legacy.io"].role_links == [] and users["both@legacy.io"].roles == "farmer,researcher"
+        assert [link.role for link in users["farmer@legacy.io"].role_links] == ["farmer", "researcher"]
+        assert users["farmer@legacy.io"].legacy_roles == "farmer,researcher"